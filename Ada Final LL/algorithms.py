@@ -1,6 +1,10 @@
 from collections import deque, defaultdict
+import random
+from concurrent.futures import ProcessPoolExecutor
+import heapq
 import logging 
-from custom_graph import CustomGraph 
+import numpy as np
+from custom_graph import CustomGraph, UndirectedView
 
 # --- Algoritmos Básicos ---
 def bfs_shortest_path(graph, start_node, end_node):
@@ -20,6 +24,194 @@ def bfs_shortest_path(graph, start_node, end_node):
                 queue.append((neighbor, path + [neighbor]))
     return None
 
+def bidirectional_bfs_shortest_path(graph, start_node, end_node):
+    """
+    Camino más corto (en número de aristas) buscando simultáneamente desde ambos extremos.
+    Guarda un mapa de padres por lado en lugar de copiar el camino en cada entrada de la cola, y
+    recorre directamente el almacenamiento de vecinos (iter_neighbors/iter_predecessors) sin crear sets.
+    En grafos dirigidos la búsqueda hacia atrás sigue los predecesores, de modo que el camino
+    respeta la dirección de las aristas. Devuelve la lista de nodos del camino o None.
+    """
+    if start_node == end_node:
+        return [start_node]
+    if start_node not in graph.get_nodes() or end_node not in graph.get_nodes():
+        return None
+
+    parents_fwd = {start_node: None} # nodo -> nodo previo desde start_node
+    parents_bwd = {end_node: None}   # nodo -> nodo siguiente hacia end_node
+    frontier_fwd, frontier_bwd = [start_node], [end_node]
+    depth_fwd = {start_node: 0}
+    depth_bwd = {end_node: 0}
+
+    while frontier_fwd and frontier_bwd:
+        # Expandir un nivel completo del lado con la frontera más pequeña
+        if len(frontier_fwd) <= len(frontier_bwd):
+            frontier, parents, depth, other_depth, expand = frontier_fwd, parents_fwd, depth_fwd, depth_bwd, graph.iter_neighbors
+        else:
+            frontier, parents, depth, other_depth, expand = frontier_bwd, parents_bwd, depth_bwd, depth_fwd, graph.iter_predecessors
+
+        next_frontier = []
+        best_meeting, best_length = None, None
+        for current_node in frontier:
+            next_depth = depth[current_node] + 1
+            for neighbor in expand(current_node):
+                if neighbor not in parents:
+                    parents[neighbor] = current_node
+                    depth[neighbor] = next_depth
+                    next_frontier.append(neighbor)
+                if neighbor in other_depth:
+                    # Se tocan las dos búsquedas: se completa el nivel y se toma el encuentro más corto
+                    length = depth[neighbor] + other_depth[neighbor]
+                    if best_length is None or length < best_length:
+                        best_meeting, best_length = neighbor, length
+
+        if best_meeting is not None:
+            return _join_bidirectional_path(parents_fwd, parents_bwd, best_meeting)
+
+        if frontier is frontier_fwd:
+            frontier_fwd = next_frontier
+        else:
+            frontier_bwd = next_frontier
+    return None
+
+def _join_bidirectional_path(parents_fwd, parents_bwd, meeting_node):
+    """Reconstruye start -> meeting_node -> end siguiendo los punteros a padres de ambas búsquedas."""
+    path = []
+    node = meeting_node
+    while node is not None:
+        path.append(node)
+        node = parents_fwd[node]
+    path.reverse()
+    node = parents_bwd[meeting_node]
+    while node is not None:
+        path.append(node)
+        node = parents_bwd[node]
+    return path
+
+# --- Caminos ponderados ---
+
+def astar_shortest_path(graph, start_node, end_node, heuristic=None):
+    """
+    Camino de menor peso entre start_node y end_node (pesos no negativos, adj da {vecino: peso}).
+    Con heuristic(node) -> cota inferior de la distancia restante hasta end_node se comporta como A*;
+    sin heurística es Dijkstra. Devuelve (camino, distancia) o (None, inf) si no hay camino.
+    """
+    if start_node not in graph.get_nodes() or end_node not in graph.get_nodes():
+        return None, float('inf')
+    h = heuristic if heuristic is not None else (lambda node: 0.0)
+    dist = {start_node: 0.0}
+    parents = {start_node: None}
+    closed = set()
+    heap = [(h(start_node), 0.0, start_node)]
+    while heap:
+        _, d, node = heapq.heappop(heap)
+        if node in closed:
+            continue
+        if node == end_node:
+            path = []
+            while node is not None:
+                path.append(node)
+                node = parents[node]
+            return path[::-1], d
+        closed.add(node)
+        for neighbor, weight in graph.adj[node].items():
+            if neighbor in closed:
+                continue
+            new_d = d + weight
+            if new_d < dist.get(neighbor, float('inf')):
+                dist[neighbor] = new_d
+                parents[neighbor] = node
+                heapq.heappush(heap, (new_d + h(neighbor), new_d, neighbor))
+    return None, float('inf')
+
+def dijkstra_shortest_path(graph, start_node, end_node):
+    """Dijkstra (A* sin heurística). Devuelve (camino, distancia) o (None, inf)."""
+    return astar_shortest_path(graph, start_node, end_node)
+
+# --- BFS por lotes sobre arrays CSR ---
+
+def bfs_tree_csr(indptr, indices, source_index, target_indices=None):
+    """
+    BFS de una sola fuente sobre arrays CSR (índices internos 0..n-1), expandiendo cada nivel de forma
+    vectorizada. Devuelve (dist, parent): arrays int32 de tamaño n con la distancia en saltos desde la
+    fuente (-1 si es inalcanzable) y el predecesor en el árbol BFS (-1 para la fuente e inalcanzables).
+    Si se pasan target_indices, la búsqueda se detiene en cuanto todos ellos tienen distancia.
+    """
+    n = len(indptr) - 1
+    dist = np.full(n, -1, dtype=np.int32)
+    parent = np.full(n, -1, dtype=np.int32)
+    dist[source_index] = 0
+    if target_indices is not None:
+        target_indices = np.asarray(target_indices, dtype=np.int64)
+    frontier = np.array([source_index], dtype=np.int64)
+    depth = 0
+    while len(frontier):
+        if target_indices is not None and (dist[target_indices] >= 0).all():
+            break
+        depth += 1
+        starts = indptr[frontier]
+        counts = indptr[frontier + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            break
+        # Posición en `indices` de cada vecino de la frontera, sin bucle en Python
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        neighbors = indices[offsets]
+        owners = np.repeat(frontier, counts)
+        unvisited = dist[neighbors] == -1
+        neighbors, first = np.unique(neighbors[unvisited], return_index=True)
+        dist[neighbors] = depth
+        parent[neighbors] = owners[unvisited][first]
+        frontier = neighbors.astype(np.int64, copy=False)
+    return dist, parent
+
+def path_from_parents(parent, target_index):
+    """Reconstruye el camino (índices internos) desde la fuente hasta target_index siguiendo `parent`."""
+    path = [int(target_index)]
+    node = parent[target_index]
+    while node != -1:
+        path.append(int(node))
+        node = parent[node]
+    path.reverse()
+    return path
+
+_bfs_worker_csr = None # (indptr, indices) compartidos por cada proceso del pool
+
+def _init_bfs_worker(indptr, indices):
+    global _bfs_worker_csr
+    _bfs_worker_csr = (indptr, indices)
+
+def _bfs_paths_task(source_index, target_indices):
+    """Tarea del pool: un BFS por fuente; devuelve solo las distancias y caminos a los destinos pedidos."""
+    indptr, indices = _bfs_worker_csr
+    return _bfs_paths(indptr, indices, source_index, target_indices)
+
+def _bfs_paths(indptr, indices, source_index, target_indices):
+    dist, parent = bfs_tree_csr(indptr, indices, source_index, target_indices)
+    paths = [path_from_parents(parent, t) if dist[t] >= 0 else None for t in target_indices]
+    return source_index, dist[target_indices], paths
+
+def batch_bfs_paths(indptr, indices, queries, n_workers=1):
+    """
+    Resuelve muchas consultas de camino con un solo BFS por fuente distinta.
+    `queries` es {source_index: [target_index, ...]}. Con n_workers > 1 las fuentes se reparten
+    en un pool de procesos. Devuelve {source_index: (distancias_a_destinos, caminos)}.
+    """
+    results = {}
+    if n_workers and n_workers > 1 and len(queries) > 1:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_bfs_worker,
+                                 initargs=(indptr, indices)) as executor:
+            futures = [executor.submit(_bfs_paths_task, source, np.asarray(targets, dtype=np.int64))
+                       for source, targets in queries.items()]
+            for future in futures:
+                source, distances, paths = future.result()
+                results[source] = (distances, paths)
+    else:
+        for source, targets in queries.items():
+            _, distances, paths = _bfs_paths(indptr, indices, source, np.asarray(targets, dtype=np.int64))
+            results[source] = (distances, paths)
+    return results
+
 def calculate_density(graph_undirected): # Asume grafo no dirigido para la fórmula común
     num_nodes = graph_undirected.number_of_nodes()
     # Para grafo no dirigido, m_unique = graph_undirected.number_of_edges() / 2
@@ -50,6 +242,71 @@ def get_connected_components(graph_undirected):
             components.append(component)
     return components
 
+def connected_component_labels(num_nodes, src, dst):
+    """
+    Componentes conexas (débiles: se ignora la dirección) de los nodos 0..n-1 a partir de arrays de
+    aristas, sin construir una copia no dirigida: union-find vectorizado de enganche y compresión.
+    Devuelve un array int32 con la etiqueta (0..k-1) de la componente de cada nodo.
+    """
+    _, labels = spanning_forest_arrays(num_nodes, src, dst)
+    _, dense_labels = np.unique(labels, return_inverse=True)
+    return dense_labels.astype(np.int32)
+
+def strongly_connected_component_labels(indptr, indices):
+    """
+    Componentes fuertemente conexas (Tarjan iterativo, con pila explícita: sin recursión) de un grafo
+    dirigido en CSR con nodos 0..n-1. Devuelve un array int32 con la etiqueta (0..k-1) de cada nodo.
+    """
+    n = len(indptr) - 1
+    ptr = indptr.tolist()
+    nbrs = indices.tolist()
+    index = [-1] * n # Orden de descubrimiento
+    lowlink = [0] * n
+    on_stack = [False] * n
+    labels = np.full(n, -1, dtype=np.int32)
+    scc_stack = []
+    num_components = 0
+    counter = 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        # Cada entrada de la pila de llamadas es [nodo, siguiente posición de vecino por visitar]
+        call_stack = [[root, ptr[root]]]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        scc_stack.append(root)
+        on_stack[root] = True
+        while call_stack:
+            frame = call_stack[-1]
+            node, pos = frame
+            if pos < ptr[node + 1]:
+                frame[1] = pos + 1
+                neighbor = nbrs[pos]
+                if index[neighbor] == -1:
+                    index[neighbor] = lowlink[neighbor] = counter
+                    counter += 1
+                    scc_stack.append(neighbor)
+                    on_stack[neighbor] = True
+                    call_stack.append([neighbor, ptr[neighbor]])
+                elif on_stack[neighbor] and index[neighbor] < lowlink[node]:
+                    lowlink[node] = index[neighbor]
+                continue
+            # Todos los vecinos procesados: cerrar el nodo
+            call_stack.pop()
+            if call_stack:
+                parent = call_stack[-1][0]
+                if lowlink[node] < lowlink[parent]:
+                    lowlink[parent] = lowlink[node]
+            if lowlink[node] == index[node]:
+                while True:
+                    member = scc_stack.pop()
+                    on_stack[member] = False
+                    labels[member] = num_components
+                    if member == node:
+                        break
+                num_components += 1
+    return labels
+
 def local_clustering_coefficient(graph_undirected, node_id):
     neighbors = graph_undirected.get_neighbors(node_id)
     degree = len(neighbors) # Grado no ponderado
@@ -88,6 +345,20 @@ def _calculate_modularity(graph_undirected, partition, m_formula):
         q += (term1 - term2)
     return q
 
+def _modularity_from_totals(sigma_in, sigma_tot, m_formula):
+    """
+    Modularidad global a partir de los totales por comunidad, en O(#comunidades).
+    Usa la misma escala que _calculate_modularity sobre el grafo original no dirigido:
+    sigma_in = suma de pesos de aristas internas (cada arista u-v cuenta en ambos sentidos),
+    sigma_tot = suma de degree(node, weighted=True) de sus nodos.
+    """
+    if m_formula == 0: return 0.0
+    q = 0.0
+    for comm_id, sum_tot_c in sigma_tot.items():
+        if sum_tot_c == 0 and sigma_in[comm_id] == 0: continue # Comunidad vacía
+        q += sigma_in[comm_id] / (2 * m_formula) - (sum_tot_c / (2 * m_formula))**2
+    return q
+
 def _build_community_graph(original_graph_undirected, partition):
     aggregated_graph = CustomGraph()
     community_ids = set(partition.values())
@@ -106,11 +377,35 @@ def _build_community_graph(original_graph_undirected, partition):
     logging.info(f"_build_community_graph: Grafo agregado con {aggregated_graph.number_of_nodes()} nodos.")
     return aggregated_graph
 
-def detect_communities_louvain(graph_input):
+def _unit_weight_view(graph_undirected):
+    """Copia de una vista no dirigida (UndirectedView o CSRGraph) con todas las aristas a peso 1."""
+    if hasattr(graph_undirected, 'edge_arrays'): # CSRGraph
+        src, dst, _ = graph_undirected.edge_arrays()
+        return type(graph_undirected).from_edge_arrays(src, dst, np.ones(len(src)), nodes=graph_undirected.node_ids)
+    return UndirectedView(graph_undirected.graph,
+                          {u: dict.fromkeys(neighbors, 1.0) for u, neighbors in graph_undirected.adj.items()})
+
+def detect_communities_louvain(graph_input, max_passes=30, tolerance=1e-7, random_state=None,
+                               active_queue=False, min_moved_fraction=0.0, min_pass_gain=0.0, should_stop=None,
+                               weighted=True):
+    """
+    Louvain manual sobre CustomGraph. Devuelve la partición {node: community_id}.
+    Controles de convergencia de la Fase 1 (por defecto, el comportamiento original):
+      - max_passes: límite de pasadas por nivel; tolerance: ganancia mínima de un movimiento y de un nivel.
+      - random_state: si no es None, cada pasada visita los nodos en orden aleatorio con esa semilla.
+      - active_queue: en cada pasada solo se revisitan los nodos cuyo vecindario cambió en la anterior.
+      - min_moved_fraction / min_pass_gain: la Fase 1 termina si una pasada mueve menos de esa fracción
+        de nodos o el ΔQ de la pasada no la supera.
+      - should_stop: si devuelve True (comprobado en cada pasada), se termina con la mejor partición hasta entonces.
+    Con weighted=False cada arista pesa 1 (los pesos del grafo, p. ej. km, no se leen como fuerza del vínculo).
+    """
     if not graph_input or graph_input.number_of_nodes() == 0: return {}
+    rng = random.Random(random_state)
 
     # `active_graph` es el grafo en el que se trabaja en el nivel actual (original o agregado)
-    active_graph = graph_input.to_undirected() 
+    active_graph = graph_input.undirected_view() # Vista cacheada: no copia el grafo de entrada
+    if not weighted:
+        active_graph = _unit_weight_view(active_graph)
     
     # `node_to_overall_community` mapea nodos del grafo ORIGINAL a la ID de comunidad del nivel más alto actual
     node_to_overall_community = {node: node for node in graph_input.get_nodes()}
@@ -119,14 +414,22 @@ def detect_communities_louvain(graph_input):
     # `best_overall_partition_on_original` almacena la partición del grafo original que dio la mejor modularidad
     best_overall_partition_on_original = node_to_overall_community.copy()
 
-    m_original_formula = sum(w for _,_,w in graph_input.to_undirected().get_edges(data=True)) / 2.0
+    m_original_formula = sum(w for _,_,w in active_graph.get_edges(data=True)) / 2.0
     if m_original_formula == 0 and graph_input.number_of_nodes() > 0: # Grafo sin aristas
         return {node: i for i, node in enumerate(graph_input.get_nodes())}
     if m_original_formula == 0: return {}
 
+    # Σ_in/Σ_tot de cada nodo de `active_graph` en la escala del grafo original, para obtener la
+    # modularidad global sin recalcularla sobre todas las aristas: al agregar, cada comunidad hereda
+    # los totales de sus miembros (su peso interno ya no aparece como arista en el grafo agregado).
+    base_internal_w = {node: 0.0 for node in active_graph.get_nodes()}
+    base_total_degree_w = {node: active_graph.degree(node, weighted=True) for node in active_graph.get_nodes()}
 
     level = 0
     while True: # Bucle de niveles
+        if should_stop is not None and should_stop():
+            logging.info("Louvain: detenido a petición.")
+            break
         level += 1
         logging.info(f"Louvain: Iniciando Nivel {level}")
         num_nodes_active_graph = active_graph.number_of_nodes()
@@ -138,15 +441,27 @@ def detect_communities_louvain(graph_input):
         if m2_this_level == 0: break 
 
         comm_total_degree_w = {node: active_graph.degree(node, weighted=True) for node in active_graph.get_nodes()}
-        comm_internal_links_w = {node: 0.0 for node in active_graph.get_nodes()} # Σ_in para cada com (nodo individual)
+        # Σ_in y Σ_tot globales (escala del grafo original) de cada comunidad del nivel actual
+        comm_internal_links_w = {node: base_internal_w[node] + active_graph.adj[node].get(node, 0.0) for node in active_graph.get_nodes()}
+        comm_global_degree_w = base_total_degree_w.copy()
 
         # Fase 1: Optimización de Modularidad Local
         moves_fase1 = 1
         passes_fase1 = 0
-        while moves_fase1 > 0 and passes_fase1 < 30: # Límite de pasadas
+        active_nodes = set(active_graph.get_nodes()) if active_queue else None
+        while moves_fase1 > 0 and passes_fase1 < max_passes: # Límite de pasadas
+            if should_stop is not None and should_stop():
+                break
             moves_fase1 = 0
             passes_fase1 += 1
-            nodes_visit_fase1 = list(active_graph.get_nodes()) # Podría aleatorizarse
+            pass_gain = 0.0
+            nodes_visit_fase1 = list(active_graph.get_nodes())
+            if random_state is not None:
+                rng.shuffle(nodes_visit_fase1)
+            if active_nodes is not None:
+                # Solo los nodos activados en la pasada anterior (vecinos de nodos que se movieron)
+                nodes_visit_fase1 = [node for node in nodes_visit_fase1 if node in active_nodes]
+                active_nodes = set()
 
             for node_i in nodes_visit_fase1:
                 orig_comm_i = partition_this_level[node_i]
@@ -194,7 +509,7 @@ def detect_communities_louvain(graph_input):
                         max_dq = delta_q
                         best_target_comm = target_comm
                 
-                if best_target_comm != orig_comm_i and max_dq > 1e-7:
+                if best_target_comm != orig_comm_i and max_dq > tolerance:
                     # Mover nodo y actualizar comm_total_degree_w y comm_internal_links_w
                     # (comm_internal_links_w no se usa directamente en el cálculo de ΔQ aquí, pero es para Q global)
                     
@@ -204,16 +519,28 @@ def detect_communities_louvain(graph_input):
                     
                     # Actualizar comm_internal_links_w (Σ_in para cada comunidad)
                     # Cuando node_i se mueve de orig_comm_i a best_target_comm:
-                    # - orig_comm_i pierde los enlaces internos que node_i tenía dentro de ella.
-                    # - best_target_comm gana los enlaces que node_i ahora forma internamente con ella.
-                    comm_internal_links_w[orig_comm_i] -= 2 * k_i_to_original_comm_internal_w # k_i_to_original_comm_internal_w fue calculado antes del bucle de target_comm
-                    comm_internal_links_w[best_target_comm] += 2 * k_i_links_to_neigh_comms.get(best_target_comm, 0.0) # k_i_links_to_neigh_comms[best_target_comm] son los enlaces de i a la nueva comunidad
+                    # - orig_comm_i pierde el peso interno propio de node_i (auto-bucle y nodos originales
+                    #   agregados en él) y los enlaces, en ambos sentidos, con el resto de sus miembros.
+                    # - best_target_comm gana ese peso propio y los enlaces que node_i forma con ella.
+                    self_w_i = base_internal_w[node_i] + active_graph.adj[node_i].get(node_i, 0.0)
+                    links_to_rest_of_orig = k_i_to_original_comm_internal_w - active_graph.adj[node_i].get(node_i, 0.0)
+                    comm_internal_links_w[orig_comm_i] -= self_w_i + 2 * links_to_rest_of_orig
+                    comm_internal_links_w[best_target_comm] += self_w_i + 2 * k_i_links_to_neigh_comms.get(best_target_comm, 0.0)
+                    comm_global_degree_w[orig_comm_i] -= base_total_degree_w[node_i]
+                    comm_global_degree_w[best_target_comm] += base_total_degree_w[node_i]
                     
                     partition_this_level[node_i] = best_target_comm
                     moves_fase1 += 1
+                    pass_gain += max_dq
+                    if active_nodes is not None:
+                        active_nodes.update(active_graph.adj[node_i])
             
             logging.debug(f"Louvain Nivel {level}, Fase 1, Pass {passes_fase1}: {moves_fase1} nodos movidos.") # Changed to debug
             if moves_fase1 == 0: break
+            pass_gain *= 2 / m2_this_level # ΔQ real de la pasada (misma escala que louvain_csr)
+            if moves_fase1 / num_nodes_active_graph < min_moved_fraction or pass_gain <= min_pass_gain:
+                logging.debug(f"Louvain Nivel {level}: Fase 1 detenida por umbral (movidos {moves_fase1}, ganancia {pass_gain:.2e}).")
+                break
 
         # Fase 1 completada para este nivel. Actualizar mapeo global.
         if level == 1:
@@ -225,10 +552,10 @@ def detect_communities_louvain(graph_input):
                 new_overall_community_map[original_node] = partition_this_level[prev_level_comm_id]
             node_to_overall_community = new_overall_community_map
         
-        current_global_modularity = _calculate_modularity(graph_input.to_undirected(), node_to_overall_community, m_original_formula)
+        current_global_modularity = _modularity_from_totals(comm_internal_links_w, comm_global_degree_w, m_original_formula)
         logging.info(f"Louvain Nivel {level}: Modularity global actual: {current_global_modularity:.6f}")
 
-        if current_global_modularity - overall_best_modularity <= 1e-7 : # Tolerancia pequeña
+        if current_global_modularity - overall_best_modularity <= tolerance : # Tolerancia pequeña
             logging.info(f"Louvain: Convergencia global. Mejor modularity: {overall_best_modularity:.6f}")
             break 
         
@@ -252,6 +579,9 @@ def detect_communities_louvain(graph_input):
              break
         
         active_graph = new_active_graph
+        # Los nodos del grafo agregado heredan los totales globales de su comunidad
+        base_internal_w = {node: comm_internal_links_w[node] for node in active_graph.get_nodes()}
+        base_total_degree_w = {node: comm_global_degree_w[node] for node in active_graph.get_nodes()}
         # La partición para el nuevo `active_graph` (agregado) se reinicia para la siguiente Fase 1.
         # Las estructuras comm_total_degree_w y comm_internal_links_w se recalcularán.
 
@@ -269,15 +599,18 @@ class UnionFind:
 
 
     def find(self, node):
-        """Encuentra el representante del conjunto del nodo con compresión de caminos."""
+        """Encuentra el representante del conjunto del nodo con compresión de caminos (iterativa)."""
         if node not in self.parent: # Nodo nuevo añadido dinámicamente?
             self.parent[node] = node
             self.num_nodes[node] = 1
             return node
-        if self.parent[node] == node:
-            return node
-        self.parent[node] = self.find(self.parent[node]) 
-        return self.parent[node]
+        root = node
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Segunda pasada: apuntar todo el camino directamente a la raíz (sin recursión)
+        while self.parent[node] != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
 
     def union(self, node1, node2):
         """Une los conjuntos de node1 y node2 usando unión por tamaño."""
@@ -344,3 +677,150 @@ def minimum_spanning_tree_kruskal(graph_undirected_weighted):
     # El número de aristas en el mst será num_edges_in_mst * 2 porque añadimos u,v y v,u
     logging.info(f"Kruskal: MST/MSF construido con {mst.number_of_nodes()} nodos y {num_edges_in_mst} aristas únicas.")
     return mst
+
+# --- MST sobre arrays de aristas (índices internos 0..n-1) ---
+
+class ArrayUnionFind:
+    """
+    Union-Find para los nodos 0..n-1 sobre arrays int32 (parent/size), con find iterativo
+    (compresión por mitades) y unión por tamaño. Sin recursión, apto para cadenas muy largas.
+    find/union sirven para consultas sueltas; para recorrer muchas aristas, union_edges hace el bucle
+    sobre listas de Python (el acceso escalar a un array de NumPy es varias veces más lento) y vuelca
+    el resultado a los arrays al terminar.
+    """
+    def __init__(self, num_nodes):
+        self.parent = np.arange(num_nodes, dtype=np.int32)
+        self.size = np.ones(num_nodes, dtype=np.int32)
+
+    def find(self, node):
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(self, node1, node2):
+        """Une los conjuntos de node1 y node2. Devuelve False si ya estaban unidos."""
+        root1, root2 = self.find(node1), self.find(node2)
+        if root1 == root2:
+            return False
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+        self.parent[root2] = root1
+        self.size[root1] += self.size[root2]
+        return True
+
+    def union_edges(self, edge_ids, src, dst, max_unions=None, block_size=1 << 20, should_stop=None):
+        """
+        Une, en orden, los extremos de las aristas edge_ids (posiciones en src/dst) y devuelve las
+        posiciones de las que unieron dos conjuntos. Se detiene al llegar a max_unions uniones o, entre
+        bloques, si should_stop() devuelve True.
+        """
+        parent, size = self.parent.tolist(), self.size.tolist()
+        selected = []
+        if max_unions is None:
+            max_unions = len(parent) - 1
+        for start in range(0, len(edge_ids), block_size): # Por bloques para no materializar listas enormes
+            if should_stop is not None and should_stop():
+                break
+            block = edge_ids[start:start + block_size]
+            for edge, u, v in zip(block.tolist(), src[block].tolist(), dst[block].tolist()):
+                while parent[u] != u:
+                    parent[u] = u = parent[parent[u]]
+                while parent[v] != v:
+                    parent[v] = v = parent[parent[v]]
+                if u == v:
+                    continue
+                if size[u] < size[v]:
+                    u, v = v, u
+                parent[v] = u
+                size[u] += size[v]
+                selected.append(edge)
+            if len(selected) >= max_unions:
+                break
+        self.parent[:] = parent
+        self.size[:] = size
+        return selected
+
+def _compress_labels(parent):
+    """Salto de punteros: hace que cada nodo apunte directamente a la raíz de su árbol."""
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            return parent
+        parent = grandparent
+
+def spanning_forest_arrays(num_nodes, src, dst, should_stop=None):
+    """
+    Bosque de expansión (sin pesos) por enganche y compresión vectorizados, sin ordenar aristas.
+    En cada ronda, cada componente con aristas hacia una componente de etiqueta menor se engancha a ella
+    por la primera de esas aristas (que pasa al bosque); después se comprimen las etiquetas con salto de
+    punteros. Como siempre se engancha a una etiqueta menor, no se forman ciclos.
+    Si should_stop() devuelve True entre rondas, se devuelve el bosque parcial.
+    Devuelve (posiciones en src/dst de las aristas del bosque, etiqueta de componente de cada nodo).
+    """
+    labels = np.arange(num_nodes, dtype=np.int64)
+    edge_ids = np.arange(len(src), dtype=np.int64)
+    u, v = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+    forest = []
+    while len(edge_ids) and not (should_stop is not None and should_stop()):
+        lu, lv = labels[u], labels[v]
+        cross = lu != lv
+        u, v, edge_ids, lu, lv = u[cross], v[cross], edge_ids[cross], lu[cross], lv[cross]
+        if len(edge_ids) == 0:
+            break
+        high, low = np.maximum(lu, lv), np.minimum(lu, lv)
+        hooked_roots, first = np.unique(high, return_index=True) # Primera arista de cada raíz enganchada
+        labels[hooked_roots] = low[first]
+        forest.append(edge_ids[first])
+        labels = _compress_labels(labels)
+    forest_edges = np.sort(np.concatenate(forest)) if forest else np.empty(0, dtype=np.int64)
+    return forest_edges, labels
+
+def minimum_spanning_forest_arrays(num_nodes, src, dst, weights=None, should_stop=None):
+    """
+    Kruskal sobre arrays: ordena las aristas por peso con np.argsort (estable) y las recorre con
+    ArrayUnionFind.union_edges. Cada arista no dirigida debe aparecer una sola vez en src/dst.
+    Si todas las aristas pesan lo mismo (grafos no ponderados), cualquier bosque de expansión es mínimo
+    y se usa spanning_forest_arrays sin ordenar. should_stop() permite abandonar el recorrido (bosque parcial).
+    Devuelve las posiciones (en src/dst/weights) de las aristas del bosque de expansión mínima.
+    """
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    not_loop = np.flatnonzero(src != dst)
+    if weights is None or len(not_loop) == 0 or np.all(weights[not_loop] == weights[not_loop[0]]):
+        forest_edges, _ = spanning_forest_arrays(num_nodes, src[not_loop], dst[not_loop], should_stop)
+        return not_loop[forest_edges]
+
+    order = not_loop[np.argsort(np.asarray(weights)[not_loop], kind='stable')]
+    selected = ArrayUnionFind(num_nodes).union_edges(order, src, dst, max_unions=num_nodes - 1, should_stop=should_stop)
+    return np.asarray(selected, dtype=np.int64)
+
+def minimum_spanning_forest_prim(indptr, indices, weights):
+    """
+    Prim (con heap y borrado perezoso) sobre un grafo no dirigido simétrico en CSR, arrancando desde
+    cada nodo aún no visitado para cubrir todas las componentes.
+    Devuelve las posiciones (en `indices`/`weights`) de las aristas del bosque de expansión mínima.
+    """
+    n = len(indptr) - 1
+    ptr = indptr.tolist()
+    nbrs = indices.tolist()
+    ws = weights.tolist()
+    visited = [False] * n
+    selected = []
+    for root in range(n):
+        if visited[root]:
+            continue
+        visited[root] = True
+        heap = [(ws[pos], pos, nbrs[pos]) for pos in range(ptr[root], ptr[root + 1])]
+        heapq.heapify(heap)
+        while heap:
+            _, pos, node = heapq.heappop(heap)
+            if visited[node]:
+                continue
+            visited[node] = True
+            selected.append(pos)
+            for next_pos in range(ptr[node], ptr[node + 1]):
+                if not visited[nbrs[next_pos]]:
+                    heapq.heappush(heap, (ws[next_pos], next_pos, nbrs[next_pos]))
+    return np.asarray(selected, dtype=np.int64)
@@ -0,0 +1,183 @@
+import math
+import time
+import logging
+from statistics import NormalDist
+import numpy as np
+
+# Muestras que se generan y evalúan juntas entre cada comprobación del presupuesto de tiempo
+_SAMPLE_BATCH = 20000
+
+def _z_value(confidence):
+    """Cuantil de la normal estándar para un intervalo bilateral con ese nivel de confianza."""
+    return NormalDist().inv_cdf(0.5 + confidence / 2.0)
+
+def _proportion_estimate(hits, samples, confidence):
+    """Proporción estimada con su intervalo de confianza normal (acotado a [0, 1])."""
+    p = hits / samples if samples else 0.0
+    half_width = _z_value(confidence) * math.sqrt(p * (1.0 - p) / samples) if samples else 1.0
+    return {'estimate': p, 'ci_low': max(0.0, p - half_width), 'ci_high': min(1.0, p + half_width),
+            'samples': samples}
+
+def _row_search(indptr, indices, u, v):
+    """
+    Busca, para cada par (u[i], v[i]), la posición de v[i] entre los vecinos (ordenados) de u[i] con una
+    búsqueda binaria vectorizada dentro de cada fila del CSR, sin construir claves para todo el grafo.
+    Devuelve (posición de inserción, encontrado).
+    """
+    lo = indptr[u].astype(np.int64)
+    hi = indptr[u + 1].astype(np.int64)
+    last = max(len(indices) - 1, 0)
+    while True:
+        searching = lo < hi
+        if not searching.any():
+            break
+        mid = (lo + hi) // 2
+        go_right = searching & (indices[np.minimum(mid, last)] < v)
+        lo = np.where(go_right, mid + 1, lo)
+        hi = np.where(searching & ~go_right, mid, hi)
+    found = (lo < indptr[u + 1]) & (indices[np.minimum(lo, last)] == v) if len(indices) else np.zeros(len(lo), dtype=bool)
+    return lo, found
+
+def _undirected_degrees(indptr, indices, pred_indptr, pred_indices, nodes):
+    """
+    Grado no dirigido sin lazos de `nodes` a partir del CSR dirigido (sucesores y predecesores):
+    |sucesores ∪ predecesores| sin el propio nodo. Solo recorre las filas de los nodos pedidos.
+    """
+    out_counts = indptr[nodes + 1] - indptr[nodes]
+    in_counts = pred_indptr[nodes + 1] - pred_indptr[nodes]
+    owner = np.repeat(np.arange(len(nodes)), out_counts)
+    edge_pos = np.repeat(indptr[nodes] - (np.cumsum(out_counts) - out_counts), out_counts) + np.arange(len(owner))
+    # Sucesores que también son predecesores (aristas recíprocas, y el lazo si lo hay): cuentan una vez
+    reciprocal = _row_search(pred_indptr, pred_indices, nodes[owner], indices[edge_pos])[1]
+    shared = np.bincount(owner[reciprocal], minlength=len(nodes))
+    has_loop = _row_search(indptr, indices, nodes, nodes)[1]
+    return out_counts + in_counts - shared - has_loop
+
+def _neighbour_at(indptr, indices, pred_indptr, pred_indices, nodes, k):
+    """
+    Elemento k de la lista de vecinos con repeticiones de cada nodo (sucesores y después predecesores).
+    Devuelve (vecino, canónico): un vecino es canónico si no es el propio nodo y, si viene de los
+    predecesores, no es también sucesor. Cada vecino no dirigido tiene exactamente una posición canónica.
+    """
+    out_counts = indptr[nodes + 1] - indptr[nodes]
+    from_out = k < out_counts
+    from_in = ~from_out
+    neighbours = np.empty(len(nodes), dtype=np.int64)
+    neighbours[from_out] = indices[indptr[nodes[from_out]] + k[from_out]]
+    neighbours[from_in] = pred_indices[pred_indptr[nodes[from_in]] + k[from_in] - out_counts[from_in]]
+    canonical = neighbours != nodes
+    canonical[from_in] &= ~_row_search(indptr, indices, nodes[from_in], neighbours[from_in])[1]
+    return neighbours, canonical
+
+def _draw_neighbour_pairs(indptr, indices, pred_indptr, pred_indices, centers, rng):
+    """
+    Una propuesta de cuña por centro (con al menos dos entradas en su lista de vecinos): dos posiciones
+    distintas al azar de sus sucesores + predecesores. Aceptada (ambas canónicas), la pareja es uniforme
+    entre los pares ordenados de vecinos no dirigidos distintos. Devuelve (aceptada, cerrada).
+    """
+    total = (indptr[centers + 1] - indptr[centers]) + (pred_indptr[centers + 1] - pred_indptr[centers])
+    first = rng.integers(0, total)
+    second = rng.integers(0, total - 1)
+    second += second >= first # Segunda posición distinta de la primera, uniforme entre las demás
+    x, x_canonical = _neighbour_at(indptr, indices, pred_indptr, pred_indices, centers, first)
+    y, y_canonical = _neighbour_at(indptr, indices, pred_indptr, pred_indices, centers, second)
+    accepted = x_canonical & y_canonical
+    x, y = x[accepted], y[accepted]
+    closed = _row_search(indptr, indices, x, y)[1] | _row_search(indptr, indices, y, x)[1]
+    return accepted, closed
+
+def _run_until(deadline, min_batches, draw_batch):
+    """Llama a draw_batch() en bloques de muestras hasta agotar el tiempo (al menos min_batches veces)."""
+    batches = 0
+    while batches < min_batches or time.perf_counter() < deadline:
+        draw_batch()
+        batches += 1
+
+def estimate_average_clustering(indptr, indices, pred_indptr, pred_indices, time_budget_s=1.0, confidence=0.95, rng=None):
+    """
+    Estima el coeficiente de clustering promedio de la versión no dirigida de un grafo dirigido en CSR
+    (sucesores indptr/indices y predecesores pred_indptr/pred_indices, con vecinos ordenados), sin
+    construirla: se elige un nodo uniforme y, si tiene grado >= 2, dos de sus vecinos al azar (se repite
+    la propuesta hasta que sale una pareja válida); la fracción de cuñas cerradas es un estimador
+    insesgado del promedio (los nodos de grado < 2 cuentan 0).
+    Devuelve {'estimate', 'ci_low', 'ci_high', 'samples'}.
+    """
+    deadline = time.perf_counter() + time_budget_s
+    rng = rng if rng is not None else np.random.default_rng()
+    n = len(indptr) - 1
+    if n == 0:
+        return _proportion_estimate(0, 0, confidence)
+    counts = [0, 0] # [cuñas cerradas, nodos muestreados]
+
+    def draw_batch():
+        centers = rng.integers(0, n, _SAMPLE_BATCH)
+        centers = centers[_undirected_degrees(indptr, indices, pred_indptr, pred_indices, centers) >= 2]
+        while len(centers):
+            accepted, closed = _draw_neighbour_pairs(indptr, indices, pred_indptr, pred_indices, centers, rng)
+            counts[0] += int(closed.sum())
+            centers = centers[~accepted]
+        counts[1] += _SAMPLE_BATCH
+
+    _run_until(deadline, 1, draw_batch)
+    return _proportion_estimate(counts[0], counts[1], confidence)
+
+def estimate_transitivity(indptr, indices, pred_indptr, pred_indices, time_budget_s=1.0, confidence=0.95, rng=None):
+    """
+    Estima la transitividad global de la versión no dirigida de un grafo dirigido en CSR por muestreo
+    de cuñas uniforme, sin calcular grados no dirigidos: el centro se propone con probabilidad
+    proporcional a D(D-1), con D = grado de entrada + salida (cota barata del grado no dirigido), y dos
+    posiciones distintas de su lista de vecinos; las propuestas con algún vecino no canónico se
+    rechazan, así que las aceptadas son cuñas uniformes. Devuelve {'estimate', 'ci_low', 'ci_high', 'samples'}.
+    """
+    deadline = time.perf_counter() + time_budget_s
+    rng = rng if rng is not None else np.random.default_rng()
+    directed_degrees = (np.diff(indptr) + np.diff(pred_indptr)).astype(np.float64)
+    cumulative_pairs = np.cumsum(directed_degrees * (directed_degrees - 1))
+    if len(cumulative_pairs) == 0 or cumulative_pairs[-1] == 0:
+        return _proportion_estimate(0, 0, confidence)
+    counts = [0, 0] # [cuñas cerradas, cuñas aceptadas]
+
+    def draw_batch():
+        centers = np.searchsorted(cumulative_pairs, rng.random(_SAMPLE_BATCH) * cumulative_pairs[-1], side='right')
+        accepted, closed = _draw_neighbour_pairs(indptr, indices, pred_indptr, pred_indices, centers, rng)
+        counts[0] += int(closed.sum())
+        counts[1] += int(accepted.sum())
+
+    _run_until(deadline, 1, draw_batch)
+    return _proportion_estimate(counts[0], counts[1], confidence)
+
+def estimate_degree_stats(degree_of, num_nodes, time_budget_s=0.5, confidence=0.95, rng=None, max_degree_bins=50):
+    """
+    Estima el grado medio y la distribución de grados por muestreo uniforme de nodos.
+    `degree_of(indices)` devuelve el grado de los nodos con esos índices internos (0..n-1).
+    Devuelve {'mean': {'estimate', 'ci_low', 'ci_high', 'samples'}, 'distribution': {grado: proporción estimada},
+    'distribution_ci': {grado: semiancho del intervalo}}; los grados >= max_degree_bins se agrupan en el último.
+    """
+    deadline = time.perf_counter() + time_budget_s
+    rng = rng if rng is not None else np.random.default_rng()
+    if num_nodes == 0:
+        return {'mean': {'estimate': 0.0, 'ci_low': 0.0, 'ci_high': 0.0, 'samples': 0}, 'distribution': {}, 'distribution_ci': {}}
+    sums = [0, 0.0, 0.0] # [muestras, Σ grado, Σ grado²]
+    histogram = np.zeros(max_degree_bins + 1, dtype=np.int64)
+
+    def draw_batch():
+        sampled = np.asarray(degree_of(rng.integers(0, num_nodes, _SAMPLE_BATCH)), dtype=np.float64)
+        sums[0] += len(sampled)
+        sums[1] += sampled.sum()
+        sums[2] += (sampled ** 2).sum()
+        histogram[:] += np.bincount(np.minimum(sampled, max_degree_bins).astype(np.int64), minlength=max_degree_bins + 1)
+
+    _run_until(deadline, 1, draw_batch)
+    samples, total, total_sq = sums
+    mean = float(total / samples)
+    std = math.sqrt(max(total_sq / samples - mean ** 2, 0.0))
+    half_width = _z_value(confidence) * std / math.sqrt(samples)
+    proportions = histogram / samples
+    proportion_ci = _z_value(confidence) * np.sqrt(proportions * (1.0 - proportions) / samples)
+    present = np.flatnonzero(histogram)
+    logging.info(f"Estadísticas aproximadas de grado: {samples} nodos muestreados")
+    return {
+        'mean': {'estimate': mean, 'ci_low': mean - half_width, 'ci_high': mean + half_width, 'samples': samples},
+        'distribution': {int(d): float(proportions[d]) for d in present},
+        'distribution_ci': {int(d): float(proportion_ci[d]) for d in present},
+    }
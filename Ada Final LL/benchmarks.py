@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de rendimiento - Análisis de Red Social
+Compara las implementaciones originales con las optimizadas sobre los archivos de datos reales.
+Uso: python benchmarks.py {edge-list,shortest-path,batch-paths,louvain,louvain-parallel,mst,clustering} [opciones]
+"""
+
+import gc
+import os
+import sys
+import time
+import logging
+import argparse
+import numpy as np
+
+import algorithms
+import louvain_csr
+import triangles_csr
+from custom_graph import CustomGraph
+from csr_graph import CSRGraph
+from graph_analyzer import GraphAnalyzer
+from loader import load_user_data, build_edge_list
+from config import USER_FILE
+
+DEFAULT_USER_PATH = os.path.join(os.path.dirname(__file__), '..', USER_FILE)
+
+def _sample_node_ids(num_rows, sample_size, seed=42):
+    """Devuelve los IDs de nodo a considerar (todos, o una muestra aleatoria reproducible)."""
+    if sample_size is None or sample_size >= num_rows:
+        return np.arange(num_rows, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(num_rows, sample_size, replace=False))
+
+def _build_graph_row_loop(user_df, nodes_to_consider):
+    """Construcción original: bucle por fila con split/isdigit y add_edge por arista."""
+    graph = CustomGraph()
+    for i, adj_row in enumerate(user_df.iter_rows(named=True)):
+        adj_str = adj_row['adj_list']
+        if i in nodes_to_consider:
+            graph.add_node(i)
+            if adj_str:
+                neighbors_str_list = adj_str.replace(',', ' ').split()
+                for neighbor_id in [int(n) for n in neighbors_str_list if n.isdigit()]:
+                    if neighbor_id in nodes_to_consider:
+                        graph.add_node(neighbor_id)
+                        graph.add_edge(i, neighbor_id)
+    return graph
+
+def _build_graph_from_edges(edges_df, node_ids):
+    """Construcción vectorizada: carga en bloque de la lista de aristas ya parseada."""
+    graph = CustomGraph()
+    graph.add_nodes_from(node_ids.tolist())
+    graph.add_edges_from(edges_df["src"].to_numpy(), edges_df["dst"].to_numpy())
+    return graph
+
+def benchmark_edge_list(user_path=DEFAULT_USER_PATH, sample_size=None, seed=42):
+    """Mide el bucle por fila frente a la construcción vectorizada sobre el mismo archivo."""
+    user_df = load_user_data(user_path)
+    if user_df is None:
+        raise FileNotFoundError(f"No se pudo cargar {user_path}")
+    node_ids = _sample_node_ids(user_df.height, sample_size, seed)
+
+    start = time.perf_counter()
+    row_graph = _build_graph_row_loop(user_df, set(node_ids.tolist()))
+    row_loop_s = time.perf_counter() - start
+    row_edges = sorted(row_graph.get_edges())
+    del row_graph # Liberar antes de medir para que ambas rutas partan del mismo estado de memoria
+    gc.collect()
+
+    start = time.perf_counter()
+    edges_df = build_edge_list(user_df, node_ids)
+    parse_s = time.perf_counter() - start
+    vec_graph = _build_graph_from_edges(edges_df, node_ids)
+    vectorized_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    CSRGraph.from_edge_arrays(edges_df["src"].to_numpy(), edges_df["dst"].to_numpy(), nodes=node_ids)
+    csr_s = parse_s + time.perf_counter() - start
+
+    results = {
+        'rows': user_df.height,
+        'nodes': vec_graph.number_of_nodes(),
+        'edges': vec_graph.number_of_edges(),
+        'row_loop_s': row_loop_s,
+        'vectorized_parse_s': parse_s,
+        'vectorized_total_s': vectorized_s,
+        'vectorized_csr_total_s': csr_s,
+        'speedup_dict': row_loop_s / vectorized_s if vectorized_s > 0 else float('inf'),
+        'speedup_csr': row_loop_s / csr_s if csr_s > 0 else float('inf'),
+        'same_edges': row_edges == sorted(vec_graph.get_edges()),
+    }
+    return results
+
+def _load_full_graph(user_path, graph_backend='dict'):
+    """Construye el grafo completo (todas las filas del archivo de usuarios) con el backend indicado."""
+    user_df = load_user_data(user_path)
+    if user_df is None:
+        raise FileNotFoundError(f"No se pudo cargar {user_path}")
+    node_ids = np.arange(user_df.height, dtype=np.int64)
+    edges_df = build_edge_list(user_df, node_ids)
+    if graph_backend == 'csr':
+        return CSRGraph.from_edge_arrays(edges_df["src"].to_numpy(), edges_df["dst"].to_numpy(), nodes=node_ids)
+    return _build_graph_from_edges(edges_df, node_ids)
+
+def benchmark_shortest_path(user_path=DEFAULT_USER_PATH, num_pairs=20, seed=42, graph_backend='dict'):
+    """Compara el BFS original con el BFS bidireccional sobre pares aleatorios de nodos del grafo completo."""
+    graph = _load_full_graph(user_path, graph_backend)
+    rng = np.random.default_rng(seed)
+    nodes = np.fromiter(graph.get_nodes(), dtype=np.int64, count=graph.number_of_nodes())
+    pairs = rng.choice(nodes, size=(num_pairs, 2)).tolist()
+
+    bfs_times, bidir_times, lengths = [], [], []
+    same_lengths = True
+    for start_node, end_node in pairs:
+        start = time.perf_counter()
+        path_bfs = algorithms.bfs_shortest_path(graph, start_node, end_node)
+        bfs_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        path_bidir = algorithms.bidirectional_bfs_shortest_path(graph, start_node, end_node)
+        bidir_times.append(time.perf_counter() - start)
+
+        len_bfs = len(path_bfs) - 1 if path_bfs else None
+        len_bidir = len(path_bidir) - 1 if path_bidir else None
+        same_lengths &= len_bfs == len_bidir
+        lengths.append(len_bidir)
+
+    found = [length for length in lengths if length is not None]
+    return {
+        'nodes': graph.number_of_nodes(),
+        'edges': graph.number_of_edges(),
+        'pairs': num_pairs,
+        'pairs_with_path': len(found),
+        'mean_path_length': float(np.mean(found)) if found else 0.0,
+        'bfs_mean_s': float(np.mean(bfs_times)),
+        'bfs_max_s': float(np.max(bfs_times)),
+        'bidirectional_mean_s': float(np.mean(bidir_times)),
+        'bidirectional_max_s': float(np.max(bidir_times)),
+        'speedup': float(np.sum(bfs_times) / np.sum(bidir_times)) if np.sum(bidir_times) > 0 else float('inf'),
+        'same_lengths': same_lengths,
+    }
+
+def benchmark_batch_paths(user_path=DEFAULT_USER_PATH, num_sources=5, targets_per_source=100, seed=42, n_workers=1):
+    """Compara un BFS bidireccional por par con el API por lotes (un BFS por origen distinto)."""
+    user_df = load_user_data(user_path)
+    if user_df is None:
+        raise FileNotFoundError(f"No se pudo cargar {user_path}")
+    analyzer = GraphAnalyzer(graph_backend='csr')
+    node_ids = np.arange(user_df.height, dtype=np.int64)
+    edges_df = build_edge_list(user_df, node_ids)
+    analyzer.graph = analyzer._build_graph(node_ids, edges_df["src"].to_numpy(), edges_df["dst"].to_numpy())
+    rng = np.random.default_rng(seed)
+    sources = rng.choice(node_ids, num_sources, replace=False)
+    pairs = [(int(s), int(t)) for s in sources for t in rng.choice(node_ids, targets_per_source)]
+
+    start = time.perf_counter()
+    per_pair = {(s, t): algorithms.bidirectional_bfs_shortest_path(analyzer.graph, s, t) for s, t in pairs}
+    per_pair_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = analyzer.batch_shortest_paths(pairs, n_workers=n_workers)
+    batch_s = time.perf_counter() - start
+
+    length = lambda path: len(path) - 1 if path else None
+    return {
+        'nodes': analyzer.graph.number_of_nodes(),
+        'edges': analyzer.graph.number_of_edges(),
+        'queries': len(pairs),
+        'distinct_sources': num_sources,
+        'per_pair_bidirectional_s': per_pair_s,
+        'batch_s': batch_s,
+        'speedup': per_pair_s / batch_s if batch_s > 0 else float('inf'),
+        'same_lengths': all(length(per_pair[pair]) == length(batch[pair]) for pair in pairs),
+    }
+
+def _partition_modularity(csr, partition):
+    """Modularidad estándar de una partición {node_id: community_id} sobre la versión no dirigida del grafo."""
+    _, community = np.unique(np.asarray([partition[node] for node in csr.node_ids.tolist()]), return_inverse=True)
+    indptr, indices, weights = louvain_csr._undirected_arrays(csr)
+    degrees = np.bincount(louvain_csr._row_of_edges(indptr), weights=weights, minlength=len(indptr) - 1)
+    return louvain_csr._modularity(indptr, indices, weights, degrees, community, float(weights.sum()))
+
+def benchmark_louvain(user_path=DEFAULT_USER_PATH, skip_dict=False):
+    """Compara el Louvain original sobre dicts con el Louvain sobre arrays CSR (tiempo y modularidad)."""
+    csr = _load_full_graph(user_path, 'csr')
+    results = {'nodes': csr.number_of_nodes(), 'edges': csr.number_of_edges()}
+
+    start = time.perf_counter()
+    partition_csr = louvain_csr.detect_communities_louvain_csr(csr)
+    results['csr_s'] = time.perf_counter() - start
+    results['csr_communities'] = len(set(partition_csr.values()))
+    results['csr_modularity'] = _partition_modularity(csr, partition_csr)
+
+    if not skip_dict:
+        src, dst, weights = csr.edge_arrays()
+        graph = CustomGraph()
+        graph.add_nodes_from(csr.node_ids.tolist())
+        graph.add_edges_from(src, dst, weights)
+        start = time.perf_counter()
+        partition_dict = algorithms.detect_communities_louvain(graph)
+        results['dict_s'] = time.perf_counter() - start
+        results['dict_communities'] = len(set(partition_dict.values()))
+        results['dict_modularity'] = _partition_modularity(csr, partition_dict)
+        results['speedup'] = results['dict_s'] / results['csr_s'] if results['csr_s'] > 0 else float('inf')
+    return results
+
+def benchmark_louvain_parallel(user_path=DEFAULT_USER_PATH, worker_counts=(1, 2, 4, 8)):
+    """
+    Modularidad y tiempo de louvain_csr según el número de procesos de la fase local.
+    Con 1 proceso se usa la versión secuencial; con más, la de clases de color en paralelo.
+    """
+    csr = _load_full_graph(user_path, 'csr')
+    results = {'nodes': csr.number_of_nodes(), 'edges': csr.number_of_edges(), 'cpus': os.cpu_count()}
+    for workers in worker_counts:
+        start = time.perf_counter()
+        partition = louvain_csr.detect_communities_louvain_csr(csr, n_workers=workers)
+        elapsed = time.perf_counter() - start
+        results[f'workers_{workers}_s'] = elapsed
+        results[f'workers_{workers}_modularity'] = _partition_modularity(csr, partition)
+        results[f'workers_{workers}_communities'] = len(set(partition.values()))
+        results[f'workers_{workers}_speedup'] = results[f'workers_{worker_counts[0]}_s'] / elapsed if elapsed > 0 else float('inf')
+    return results
+
+def benchmark_mst(user_path=DEFAULT_USER_PATH, seed=42):
+    """Compara el Kruskal original (dicts) con el motor sobre arrays, con pesos unitarios y aleatorios."""
+    analyzer = GraphAnalyzer(graph_backend='dict')
+    analyzer.graph = _load_full_graph(user_path, 'dict')
+    results = {'nodes': analyzer.graph.number_of_nodes(), 'edges': analyzer.graph.number_of_edges()}
+
+    start = time.perf_counter()
+    mst_arrays = analyzer.calculate_minimum_spanning_tree('kruskal')
+    results['arrays_unit_s'] = time.perf_counter() - start
+    start = time.perf_counter()
+    mst_dict = analyzer.calculate_minimum_spanning_tree('kruskal_dict')
+    results['dict_unit_s'] = time.perf_counter() - start
+    results['same_edge_count'] = mst_arrays.number_of_edges() == mst_dict.number_of_edges()
+
+    # Pesos aleatorios sobre las mismas aristas no dirigidas: ambos deben dar el mismo peso total
+    undirected = analyzer.get_csr_graph().to_undirected()
+    src, dst, _ = undirected.edge_arrays()
+    once = src < dst
+    src, dst = undirected.indices_of(src[once]), undirected.indices_of(dst[once])
+    weights = np.random.default_rng(seed).integers(1, 100, len(src)).astype(np.float64)
+    start = time.perf_counter()
+    forest = algorithms.minimum_spanning_forest_arrays(undirected.number_of_nodes(), src, dst, weights)
+    results['arrays_weighted_s'] = time.perf_counter() - start
+    weighted_graph = CustomGraph()
+    weighted_graph.add_nodes_from(range(undirected.number_of_nodes()))
+    weighted_graph.add_edges_from(np.concatenate([src, dst]), np.concatenate([dst, src]), np.concatenate([weights, weights]))
+    start = time.perf_counter()
+    mst_dict = algorithms.minimum_spanning_tree_kruskal(weighted_graph)
+    results['dict_weighted_s'] = time.perf_counter() - start
+    dict_total = sum(w for u, v, w in mst_dict.get_edges(data=True) if u < v)
+    results['same_total_weight'] = bool(np.isclose(weights[forest].sum(), dict_total))
+    return results
+
+def benchmark_clustering(user_path=DEFAULT_USER_PATH, sample_size=20000, seed=42, n_workers=1):
+    """
+    Clustering: el recorrido original por pares de vecinos (sobre una muestra, ya que en el grafo
+    completo no termina en un tiempo razonable) vs. el recuento de triángulos sobre arrays.
+    """
+    user_df = load_user_data(user_path)
+    if user_df is None:
+        raise FileNotFoundError(f"No se pudo cargar {user_path}")
+    node_ids = _sample_node_ids(user_df.height, sample_size, seed)
+    edges_df = build_edge_list(user_df, node_ids)
+    graph = _build_graph_from_edges(edges_df, node_ids)
+    csr = CSRGraph.from_custom_graph(graph)
+    results = {'sample_nodes': graph.number_of_nodes(), 'sample_edges': graph.number_of_edges()}
+
+    start = time.perf_counter()
+    results['dict_average'] = algorithms.average_clustering_coefficient(graph.undirected_view())
+    results['dict_s'] = time.perf_counter() - start
+    start = time.perf_counter()
+    stats = triangles_csr.clustering_csr(csr, n_workers=n_workers)
+    results['triangles_s'] = time.perf_counter() - start
+    results['triangles_average'] = stats['average_clustering']
+    results['speedup'] = results['dict_s'] / results['triangles_s'] if results['triangles_s'] > 0 else float('inf')
+
+    full_csr = _load_full_graph(user_path, 'csr')
+    start = time.perf_counter()
+    stats = triangles_csr.clustering_csr(full_csr, n_workers=n_workers)
+    results['full_triangles_s'] = time.perf_counter() - start
+    results['full_triangles'] = int(stats['triangles'].sum()) // 3
+    results['full_average'] = stats['average_clustering']
+    results['full_transitivity'] = stats['transitivity']
+    return results
+
+def _print_results(title, results):
+    print(f"\n{title}")
+    for key, value in results.items():
+        if isinstance(value, float):
+            print(f"   • {key}: {value:.4f}")
+        else:
+            print(f"   • {key}: {value}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stdout)
+    parser = argparse.ArgumentParser(description="Benchmarks de la aplicación de análisis de red social.")
+    parser.add_argument("benchmark", choices=["edge-list", "shortest-path", "batch-paths", "louvain", "louvain-parallel", "mst", "clustering"])
+    parser.add_argument("--user-file", default=DEFAULT_USER_PATH)
+    parser.add_argument("--sample", type=int, default=None, help="Número de nodos a muestrear (por defecto, todos).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--pairs", type=int, default=20, help="Pares de nodos aleatorios (shortest-path).")
+    parser.add_argument("--backend", choices=["dict", "csr"], default="dict")
+    parser.add_argument("--sources", type=int, default=5, help="Orígenes distintos (batch-paths).")
+    parser.add_argument("--targets", type=int, default=100, help="Destinos por origen (batch-paths).")
+    parser.add_argument("--workers", type=int, default=1, help="Procesos del pool (batch-paths, clustering).")
+    parser.add_argument("--worker-counts", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Números de procesos a comparar (louvain-parallel).")
+    parser.add_argument("--skip-dict", action="store_true", help="No ejecutar el Louvain original sobre dicts (louvain).")
+    args = parser.parse_args()
+
+    if args.benchmark == "edge-list":
+        _print_results("Construcción del grafo: bucle por fila vs. Polars vectorizado",
+                       benchmark_edge_list(args.user_file, args.sample, args.seed))
+    elif args.benchmark == "shortest-path":
+        _print_results(f"Camino más corto: BFS original vs. BFS bidireccional (backend {args.backend})",
+                       benchmark_shortest_path(args.user_file, args.pairs, args.seed, args.backend))
+    elif args.benchmark == "batch-paths":
+        _print_results("Caminos por lotes: BFS bidireccional por par vs. un BFS por origen",
+                       benchmark_batch_paths(args.user_file, args.sources, args.targets, args.seed, args.workers))
+    elif args.benchmark == "louvain":
+        _print_results("Comunidades: Louvain sobre dicts vs. Louvain sobre arrays CSR",
+                       benchmark_louvain(args.user_file, args.skip_dict))
+    elif args.benchmark == "louvain-parallel":
+        _print_results("Comunidades: Louvain CSR secuencial vs. fase local en paralelo",
+                       benchmark_louvain_parallel(args.user_file, tuple(args.worker_counts)))
+    elif args.benchmark == "mst":
+        _print_results("MST: Kruskal sobre dicts vs. Kruskal sobre arrays",
+                       benchmark_mst(args.user_file, args.seed))
+    elif args.benchmark == "clustering":
+        _print_results("Clustering: pares de vecinos sobre dicts vs. recuento de triángulos sobre arrays",
+                       benchmark_clustering(args.user_file, args.sample or 20000, args.seed, args.workers))
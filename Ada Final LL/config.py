@@ -14,10 +14,63 @@ WINDOW_HEIGHT = 900
 # ADVERTENCIA: Visualizar demasiados nodos puede ser extremadamente lento o bloquear la aplicación.
 MAX_NODES_DISPLAY = None 
 
+# Modo de dibujo de los nodos en el mapa:
+#   "server": servidor HTTP local; el navegador pide solo las celdas/nodos de la vista (agregado por zoom).
+#   "fast": HTML temporal con un único array de JS (FastMarkerCluster), colores por tabla de comunidades y
+#           popups al hacer clic. Por encima de MAP_MAX_POINTS nodos se agregan en una rejilla.
+#   "markers": HTML temporal con un CircleMarker y su popup por nodo (solo para grafos pequeños).
+MAP_RENDER_MODE = "server"
+MAP_MAX_POINTS = 200000
+
+# Modo "server": zoom desde el que se muestran nodos individuales (antes, celdas con el nº de nodos y la
+# comunidad dominante) y máximo de filas por respuesta, que acota los bytes de cada vista.
+MAP_NODE_ZOOM = 12
+MAP_VIEW_MAX_ITEMS = 5000
+
+# Conjuntos de aristas (MST) en el mapa: una sola geometría MultiLineString. Por debajo de este zoom se
+# dibujan versiones simplificadas (extremos ajustados a una rejilla de ~2 píxeles); 0 = siempre completa.
+MAP_EDGE_SIMPLIFY_ZOOM = 10
+
 # Muestreo de datos inicial. 
 # Esta es la variable MÁS IMPORTANTE. Cámbiala a 'None' para leer y procesar todos los datos.
 SAMPLE_SIZE = 10000
 
 # Límite de nodos para el subgrafo del camino más corto.
 # Al ponerlo en 'None', eliminas el límite para esta función específica,
-MAX_PATH_NODES = None # Antes estaba en 1000
\ No newline at end of file
+MAX_PATH_NODES = None # Antes estaba en 1000
+
+# Backend del grafo: "dict" (CustomGraph, mutable) o "csr" (CSRGraph, inmutable y compacto en memoria).
+GRAPH_BACKEND = "dict"
+
+# Pesos de las aristas: "hops" (todas pesan 1) o "haversine" (distancia de círculo máximo en km entre
+# las ubicaciones de los dos nodos). Con "haversine" el camino más corto usa A* y el MST es la red
+# troncal geográfica de menor longitud.
+EDGE_WEIGHTS = "hops"
+
+# Tamaño de bloque (bytes) al leer el archivo de usuarios en streaming.
+# Acota el pico de memoria de la carga independientemente del tamaño del archivo.
+USER_CHUNK_BYTES = 64 * 1024 * 1024
+
+# Semilla del muestreo. Con una semilla fija la muestra es reproducible y el grafo puede
+# reutilizarse desde el snapshot binario en el siguiente arranque. 'None' = muestra distinta cada vez.
+SAMPLE_SEED = 42
+
+# Guardar/reutilizar snapshots binarios (junto a los archivos de datos) para evitar re-parsear el texto.
+USE_SNAPSHOT = True
+
+# Algoritmo de detección de comunidades: "louvain" (implementación sobre dicts) o
+# "louvain_csr" (arrays CSR con nodos reetiquetados; recomendado para el grafo completo).
+COMMUNITY_ALGORITHM = "louvain_csr"
+
+# Procesos para la fase local de "louvain_csr" en grafos grandes. 1 = versión secuencial.
+COMMUNITY_WORKERS = 1
+
+# Estadísticas aproximadas por muestreo (clustering, transitividad y grados con intervalo de confianza)
+# en lugar de las exactas. Útil con el grafo completo (SAMPLE_SIZE = None). Se puede cambiar desde la interfaz.
+APPROXIMATE_STATS = False
+
+# Presupuesto de tiempo (segundos) de las estadísticas aproximadas: mejor estimación en ese tiempo.
+STATS_TIME_BUDGET_S = 2.0
+
+# Hilos del planificador de trabajos de la GUI (carga, comunidades, caminos, MST, estadísticas).
+JOB_WORKERS = 2
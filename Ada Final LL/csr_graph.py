@@ -0,0 +1,392 @@
+from collections.abc import Mapping
+import numpy as np
+
+# Orden de los arrays que definen un CSRGraph (mismo orden que los argumentos del constructor)
+CSR_ARRAY_NAMES = ('node_ids', 'indptr', 'indices', 'weights', 'pred_indptr', 'pred_indices', 'pred_weights')
+
+def degree_counts(node_ids, src, dst):
+    """
+    Grados de entrada y salida (arrays int64 alineados con `node_ids`, que debe estar ordenado) a partir
+    de arrays de aristas src[i] -> dst[i], contando una sola vez las aristas repetidas (como el grafo).
+    Devuelve (in_degree, out_degree).
+    """
+    node_ids = np.asarray(node_ids, dtype=np.int64)
+    n = len(node_ids)
+    if len(src) == 0 or n == 0:
+        return np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+    src_idx = np.searchsorted(node_ids, np.asarray(src, dtype=np.int64))
+    dst_idx = np.searchsorted(node_ids, np.asarray(dst, dtype=np.int64))
+    unique_keys = np.unique(src_idx * n + dst_idx)
+    return np.bincount(unique_keys % n, minlength=n), np.bincount(unique_keys // n, minlength=n)
+
+class _CSRNodeView:
+    """
+    Vista de solo lectura sobre los nodos de un CSRGraph.
+    Soporta `in`, `len` e iteración igual que el set de CustomGraph, sin materializarlo.
+    """
+    _ITER_CHUNK = 65536
+
+    def __init__(self, graph):
+        self._graph = graph
+
+    def __contains__(self, node_id):
+        return self._graph._index_of(node_id) >= 0
+
+    def __iter__(self):
+        node_ids = self._graph.node_ids
+        for start in range(0, len(node_ids), self._ITER_CHUNK):
+            yield from node_ids[start:start + self._ITER_CHUNK].tolist()
+
+    def __len__(self):
+        return len(self._graph.node_ids)
+
+    def __repr__(self):
+        return f"_CSRNodeView({len(self)} nodos)"
+
+
+class _CSRAdjacencyView(Mapping):
+    """
+    Vista de solo lectura con la misma forma que `CustomGraph.adj`/`pred`: {u: {v: peso}}.
+    El dict interno de cada nodo se construye al pedirlo; nodos desconocidos devuelven {}
+    (igual que leer un defaultdict, pero sin mutar nada).
+    """
+    def __init__(self, graph, indptr, indices, weights):
+        self._graph = graph
+        self._indptr = indptr
+        self._indices = indices
+        self._weights = weights
+
+    def __getitem__(self, node_id):
+        idx = self._graph._index_of(node_id)
+        if idx < 0:
+            return {}
+        start, end = self._indptr[idx], self._indptr[idx + 1]
+        neighbor_ids = self._graph.node_ids[self._indices[start:end]].tolist()
+        return dict(zip(neighbor_ids, self._weights[start:end].tolist()))
+
+    def __contains__(self, node_id):
+        return self._graph._index_of(node_id) >= 0
+
+    def __iter__(self):
+        return iter(self._graph.get_nodes())
+
+    def __len__(self):
+        return self._graph.number_of_nodes()
+
+
+class CSRGraph:
+    """
+    Grafo dirigido inmutable en formato CSR (compressed sparse row).
+    Expone la misma API de consulta que CustomGraph, pero guarda las aristas en arrays de NumPy:
+      - node_ids: IDs originales de los nodos, ordenados (el índice interno de un nodo es su posición).
+      - indptr/indices/weights: sucesores de cada nodo (equivalente a `adj`).
+      - pred_indptr/pred_indices/pred_weights: predecesores de cada nodo (equivalente a `pred`).
+    Los vecinos de cada nodo quedan ordenados por índice interno.
+    """
+    version = 0 # Inmutable: la versión nunca cambia (misma interfaz que CustomGraph.version)
+
+    def __init__(self, node_ids, indptr, indices, weights, pred_indptr, pred_indices, pred_weights):
+        self.node_ids = node_ids
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.pred_indptr = pred_indptr
+        self.pred_indices = pred_indices
+        self.pred_weights = pred_weights
+        # Si los IDs son exactamente 0..n-1 el índice interno coincide con el ID y no hace falta buscar
+        n = len(node_ids)
+        self._dense_ids = n == 0 or (int(node_ids[0]) == 0 and int(node_ids[-1]) == n - 1)
+        self._undirected = None
+        self.adj = _CSRAdjacencyView(self, indptr, indices, weights)
+        self.pred = _CSRAdjacencyView(self, pred_indptr, pred_indices, pred_weights)
+
+    # --- Construcción ---
+
+    @classmethod
+    def from_edge_arrays(cls, src, dst, weights=None, nodes=None):
+        """
+        Construye el grafo a partir de arrays de aristas (src[i] -> dst[i]).
+        `nodes` permite incluir nodos aislados. Las aristas repetidas se colapsan
+        conservando el último peso, como hace CustomGraph.add_edge.
+        """
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        if weights is None:
+            weights = np.ones(len(src), dtype=np.float64)
+        else:
+            weights = np.asarray(weights)
+        if len(src) != len(dst) or len(src) != len(weights):
+            raise ValueError("src, dst y weights deben tener la misma longitud.")
+
+        id_parts = [src, dst]
+        if nodes is not None:
+            id_parts.append(np.asarray(nodes, dtype=np.int64))
+        total_ids = sum(len(part) for part in id_parts)
+        max_id = max((int(part.max()) for part in id_parts if len(part)), default=-1)
+        min_id = min((int(part.min()) for part in id_parts if len(part)), default=0)
+        if min_id >= 0 and max_id < 4 * total_ids:
+            # IDs densos (caso habitual: filas 0..N-1): mapa directo ID -> índice sin ordenar
+            present = np.zeros(max_id + 1, dtype=bool)
+            for part in id_parts:
+                present[part] = True
+            node_ids = np.flatnonzero(present).astype(np.int64)
+            index_dtype = np.int32 if len(node_ids) < np.iinfo(np.int32).max else np.int64
+            id_to_index = np.cumsum(present, dtype=index_dtype) - 1
+            src_idx, dst_idx = id_to_index[src], id_to_index[dst]
+        else:
+            node_ids = np.unique(np.concatenate(id_parts))
+            index_dtype = np.int32 if len(node_ids) < np.iinfo(np.int32).max else np.int64
+            src_idx = np.searchsorted(node_ids, src).astype(index_dtype, copy=False)
+            dst_idx = np.searchsorted(node_ids, dst).astype(index_dtype, copy=False)
+
+        # Ordenar por (src, dst) de forma estable (clave combinada en int64) y quedarse
+        # con la última aparición de cada par
+        n = len(node_ids)
+        keys = src_idx.astype(np.int64) * n + dst_idx
+        order = np.argsort(keys, kind='stable')
+        keys, src_idx, dst_idx, weights = keys[order], src_idx[order], dst_idx[order], weights[order]
+        if len(keys) > 1:
+            keep = np.ones(len(keys), dtype=bool)
+            keep[:-1] = keys[:-1] != keys[1:]
+            src_idx, dst_idx, weights = src_idx[keep], dst_idx[keep], weights[keep]
+
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src_idx, minlength=n), out=indptr[1:])
+
+        # Como las aristas ya están ordenadas por src, un orden estable por dst deja los predecesores ordenados
+        pred_order = np.argsort(dst_idx, kind='stable')
+        pred_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(dst_idx, minlength=n), out=pred_indptr[1:])
+
+        return cls(node_ids, indptr, dst_idx, weights,
+                   pred_indptr, src_idx[pred_order], weights[pred_order])
+
+    @classmethod
+    def from_custom_graph(cls, graph):
+        """Convierte un CustomGraph (dict de dicts) a CSRGraph."""
+        num_edges = graph.number_of_edges()
+        src = np.empty(num_edges, dtype=np.int64)
+        dst = np.empty(num_edges, dtype=np.int64)
+        weights = np.empty(num_edges, dtype=np.float64)
+        pos = 0
+        for u, neighbors_dict in graph.adj.items():
+            k = len(neighbors_dict)
+            if k == 0:
+                continue
+            src[pos:pos + k] = u
+            dst[pos:pos + k] = list(neighbors_dict.keys())
+            weights[pos:pos + k] = list(neighbors_dict.values())
+            pos += k
+        nodes = np.fromiter(graph.get_nodes(), dtype=np.int64, count=graph.number_of_nodes())
+        return cls.from_edge_arrays(src, dst, weights, nodes=nodes)
+
+    # --- Utilidades internas ---
+
+    def _index_of(self, node_id):
+        """Devuelve el índice interno del nodo o -1 si no está en el grafo."""
+        n = len(self.node_ids)
+        try:
+            node_id = int(node_id)
+        except (TypeError, ValueError):
+            return -1
+        if self._dense_ids:
+            return node_id if 0 <= node_id < n else -1
+        idx = int(np.searchsorted(self.node_ids, node_id))
+        if idx < n and self.node_ids[idx] == node_id:
+            return idx
+        return -1
+
+    def indices_of(self, node_ids):
+        """Versión vectorizada de _index_of: array int64 con el índice interno de cada nodo (-1 si no existe)."""
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        n = len(self.node_ids)
+        if self._dense_ids:
+            return np.where((node_ids >= 0) & (node_ids < n), node_ids, -1)
+        idx = np.searchsorted(self.node_ids, node_ids)
+        found = idx < n
+        found[found] = self.node_ids[idx[found]] == node_ids[found]
+        return np.where(found, idx, -1)
+
+    # --- API de consulta (compatible con CustomGraph) ---
+
+    def add_node(self, node_id):
+        raise TypeError("CSRGraph es inmutable; construya un CustomGraph para modificar el grafo.")
+
+    def add_edge(self, u, v, weight=1.0):
+        raise TypeError("CSRGraph es inmutable; construya un CustomGraph para modificar el grafo.")
+
+    def get_nodes(self):
+        """Devuelve una vista (soporta `in`, `len` e iteración) de todos los nodos."""
+        return _CSRNodeView(self)
+
+    def edge_arrays(self):
+        """Devuelve (src, dst, weights) como arrays de NumPy con los IDs originales."""
+        src_idx = np.repeat(np.arange(len(self.node_ids)), np.diff(self.indptr))
+        return self.node_ids[src_idx], self.node_ids[self.indices], self.weights
+
+    def get_edges(self, data=False):
+        """
+        Devuelve una lista de todas las aristas.
+        Si data es True, devuelve tuplas (u, v, weight).
+        Sino, devuelve tuplas (u,v).
+        """
+        src, dst, weights = self.edge_arrays()
+        if data:
+            return list(zip(src.tolist(), dst.tolist(), weights.tolist()))
+        return list(zip(src.tolist(), dst.tolist()))
+
+    def get_edge_weight(self, u, v):
+        """Devuelve el peso de la arista (u,v). Lanza KeyError si la arista no existe."""
+        u_idx, v_idx = self._index_of(u), self._index_of(v)
+        if u_idx >= 0 and v_idx >= 0:
+            start, end = self.indptr[u_idx], self.indptr[u_idx + 1]
+            pos = start + int(np.searchsorted(self.indices[start:end], v_idx))
+            if pos < end and self.indices[pos] == v_idx:
+                return float(self.weights[pos])
+        raise KeyError(f"Arista ({u},{v}) no encontrada.")
+
+    def get_neighbors(self, node_id):
+        """Devuelve un conjunto de sucesores (nodos) del nodo_id."""
+        idx = self._index_of(node_id)
+        if idx < 0:
+            return set()
+        return set(self.node_ids[self.indices[self.indptr[idx]:self.indptr[idx + 1]]].tolist())
+
+    def get_predecessors(self, node_id):
+        """Devuelve un conjunto de predecesores (nodos) del nodo_id."""
+        idx = self._index_of(node_id)
+        if idx < 0:
+            return set()
+        return set(self.node_ids[self.pred_indices[self.pred_indptr[idx]:self.pred_indptr[idx + 1]]].tolist())
+
+    def iter_neighbors(self, node_id):
+        """Devuelve los sucesores del nodo_id como lista, leída directamente del array de índices."""
+        idx = self._index_of(node_id)
+        if idx < 0:
+            return []
+        return self.node_ids[self.indices[self.indptr[idx]:self.indptr[idx + 1]]].tolist()
+
+    def iter_predecessors(self, node_id):
+        """Devuelve los predecesores del nodo_id como lista, leída directamente del array de índices."""
+        idx = self._index_of(node_id)
+        if idx < 0:
+            return []
+        return self.node_ids[self.pred_indices[self.pred_indptr[idx]:self.pred_indptr[idx + 1]]].tolist()
+
+    def degree(self, node_id, weighted=False):
+        """
+        Devuelve el grado total (entrada + salida) del nodo_id.
+        Si weighted es True, devuelve la suma de pesos de las aristas (fuerza).
+        """
+        if self._index_of(node_id) < 0:
+            return 0
+        return self.in_degree(node_id, weighted=weighted) + self.out_degree(node_id, weighted=weighted)
+
+    def in_degree(self, node_id, weighted=False):
+        """
+        Devuelve el grado de entrada del nodo_id.
+        Si weighted es True, devuelve la suma de pesos de las aristas entrantes.
+        """
+        idx = self._index_of(node_id)
+        if idx < 0:
+            return 0
+        start, end = self.pred_indptr[idx], self.pred_indptr[idx + 1]
+        if weighted:
+            return float(self.pred_weights[start:end].sum())
+        return int(end - start)
+
+    def out_degree(self, node_id, weighted=False):
+        """
+        Devuelve el grado de salida del nodo_id.
+        Si weighted es True, devuelve la suma de pesos de las aristas salientes.
+        """
+        idx = self._index_of(node_id)
+        if idx < 0:
+            return 0
+        start, end = self.indptr[idx], self.indptr[idx + 1]
+        if weighted:
+            return float(self.weights[start:end].sum())
+        return int(end - start)
+
+    def degree_arrays(self):
+        """Grados (total, entrada, salida) de todos los nodos como arrays int64 alineados con node_ids."""
+        in_degree = np.diff(self.pred_indptr)
+        out_degree = np.diff(self.indptr)
+        return in_degree + out_degree, in_degree, out_degree
+
+    def number_of_nodes(self):
+        """Devuelve el número total de nodos."""
+        return len(self.node_ids)
+
+    def number_of_edges(self):
+        """Devuelve el número total de aristas."""
+        return len(self.indices)
+
+    def to_undirected(self):
+        """
+        Devuelve la versión no dirigida (simétrica) de este grafo.
+        Como el grafo es inmutable, se construye una sola vez y se reutiliza.
+        Si u -> v y v -> u tienen pesos distintos, prevalece el de la arista original u -> v.
+        """
+        if self._undirected is None:
+            src, dst, weights = self.edge_arrays()
+            # Las aristas originales van al final para que prevalezcan al colapsar duplicados
+            self._undirected = CSRGraph.from_edge_arrays(
+                np.concatenate([dst, src]), np.concatenate([src, dst]),
+                np.concatenate([weights, weights]), nodes=self.node_ids)
+            self._undirected._undirected = self._undirected
+        return self._undirected
+
+    def undirected_view(self):
+        """Igual que to_undirected(): al ser inmutable, la versión simétrica ya se cachea sin copias extra."""
+        return self.to_undirected()
+
+    def get_node_attributes(self, node_id, locations_map):
+        """
+        Obtiene atributos básicos de un nodo.
+        Similar a get_node_info pero sin la parte de comunidad por ahora.
+        """
+        if self._index_of(node_id) < 0:
+            return None
+
+        info = {
+            'id': node_id,
+            'location': locations_map.get(node_id, (0,0)),
+            'degree': self.degree(node_id),
+            'in_degree': self.in_degree(node_id),
+            'out_degree': self.out_degree(node_id),
+            'neighbors': list(self.get_neighbors(node_id)),
+        }
+        return info
+
+    def memory_usage(self):
+        """
+        Devuelve el uso de memoria de los arrays del grafo:
+        {'total_bytes': ..., 'bytes_per_edge': ...}. Comparable con CustomGraph.memory_usage().
+        """
+        arrays = (self.node_ids, self.indptr, self.indices, self.weights,
+                  self.pred_indptr, self.pred_indices, self.pred_weights)
+        total_bytes = sum(a.nbytes for a in arrays)
+        num_edges = self.number_of_edges()
+        return {
+            'total_bytes': total_bytes,
+            'bytes_per_edge': total_bytes / num_edges if num_edges else 0.0,
+        }
+
+if __name__ == '__main__':
+    from custom_graph import CustomGraph
+
+    cg = CustomGraph()
+    cg.add_edge(1, 2)
+    cg.add_edge(1, 3)
+    cg.add_edge(2, 3)
+    cg.add_edge(3, 1) # Ciclo
+
+    csr = CSRGraph.from_custom_graph(cg)
+    print(f"Nodos: {set(csr.get_nodes())}")
+    print(f"Aristas: {csr.get_edges()}")
+    print(f"Vecinos de 1: {csr.get_neighbors(1)}")
+    print(f"Predecesores de 1: {csr.get_predecessors(1)}")
+    print(f"Grado de 1: {csr.degree(1)}")
+    print(f"Memoria CustomGraph: {cg.memory_usage()}")
+    print(f"Memoria CSRGraph: {csr.memory_usage()}")
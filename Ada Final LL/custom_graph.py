@@ -1,4 +1,84 @@
+import gc
+import sys
 from collections import defaultdict
+from contextlib import contextmanager
+
+@contextmanager
+def _gc_paused():
+    """
+    Pausa el recolector de basura cíclico durante cargas masivas: se dispara repetidamente al
+    crear millones de dicts y domina el tiempo de carga, aunque ninguno de ellos forma ciclos.
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+class UndirectedView:
+    """
+    Vista no dirigida de solo lectura de un CustomGraph, con la misma API de consulta.
+    Guarda una única adyacencia simétrica {u: {v: peso}} (sin `pred` ni conjunto de nodos propios:
+    ambos se comparten con el grafo de origen). La crea y cachea CustomGraph.undirected_view().
+    """
+    def __init__(self, graph, symmetric_adj):
+        self.graph = graph
+        self.nodes = graph.nodes
+        self.adj = symmetric_adj
+        self.pred = symmetric_adj # En un grafo no dirigido los predecesores son los sucesores
+        self.version = graph.version
+
+    def get_nodes(self):
+        return self.nodes
+
+    def get_edges(self, data=False):
+        """Aristas de la vista; cada arista no dirigida aparece en ambos sentidos."""
+        if data:
+            return [(u, v, weight) for u, neighbors_dict in self.adj.items() for v, weight in neighbors_dict.items()]
+        return [(u, v) for u, neighbors_dict in self.adj.items() for v in neighbors_dict]
+
+    def get_edge_weight(self, u, v):
+        if u not in self.adj or v not in self.adj[u]:
+            raise KeyError(f"Arista ({u},{v}) no encontrada.")
+        return self.adj[u][v]
+
+    def get_neighbors(self, node_id):
+        neighbors_dict = self.adj.get(node_id)
+        return set(neighbors_dict) if neighbors_dict is not None else set()
+
+    get_predecessors = get_neighbors
+
+    def iter_neighbors(self, node_id):
+        neighbors_dict = self.adj.get(node_id)
+        return neighbors_dict.keys() if neighbors_dict is not None else ()
+
+    iter_predecessors = iter_neighbors
+
+    def out_degree(self, node_id, weighted=False):
+        neighbors_dict = self.adj.get(node_id)
+        if neighbors_dict is None:
+            return 0
+        return sum(neighbors_dict.values()) if weighted else len(neighbors_dict)
+
+    in_degree = out_degree
+
+    def degree(self, node_id, weighted=False):
+        """Grado entrada + salida, igual que CustomGraph sobre el grafo simétrico de to_undirected()."""
+        return 2 * self.out_degree(node_id, weighted=weighted)
+
+    def number_of_nodes(self):
+        return len(self.nodes)
+
+    def number_of_edges(self):
+        return sum(len(neighbors_dict) for neighbors_dict in self.adj.values())
+
+    def to_undirected(self):
+        return self
+
+    def undirected_view(self):
+        return self
 
 class CustomGraph:
     """
@@ -8,11 +88,14 @@ class CustomGraph:
         self.adj = defaultdict(dict) # Diccionario para sucesores: {u: {v1: weight1, v2: weight2}}
         self.pred = defaultdict(dict) # Diccionario para predecesores: {v: {u1: weight1, u2: weight2}}
         self.nodes = set()            # Conjunto de todos los nodos en el grafo
+        self.version = 0              # Se incrementa en cada modificación (invalida resultados cacheados)
+        self._undirected_view = None  # UndirectedView cacheada para la versión en que se construyó
 
     def add_node(self, node_id):
         """Añade un nodo al grafo."""
         if node_id not in self.nodes:
             self.nodes.add(node_id)
+            self.version += 1
             # Asegura que el nodo exista como clave en adj y pred
             _ = self.adj[node_id] 
             _ = self.pred[node_id]
@@ -25,6 +108,32 @@ class CustomGraph:
         
         self.adj[u][v] = weight
         self.pred[v][u] = weight
+        self.version += 1
+
+    def add_nodes_from(self, node_ids):
+        """Añade varios nodos al grafo."""
+        with _gc_paused():
+            for node_id in node_ids:
+                self.add_node(node_id)
+
+    def add_edges_from(self, src, dst, weights=None):
+        """
+        Añade en bloque las aristas src[i] -> dst[i] (listas o arrays de NumPy) con pesos opcionales.
+        Equivale a llamar add_edge por arista, sin la sobrecarga de add_node en cada una.
+        """
+        src = src.tolist() if hasattr(src, 'tolist') else list(src)
+        dst = dst.tolist() if hasattr(dst, 'tolist') else list(dst)
+        if weights is None:
+            weights = [1.0] * len(src)
+        elif hasattr(weights, 'tolist'):
+            weights = weights.tolist()
+        with _gc_paused():
+            self.add_nodes_from(set(src).union(dst))
+            adj, pred = self.adj, self.pred
+            for u, v, weight in zip(src, dst, weights):
+                adj[u][v] = weight
+                pred[v][u] = weight
+        self.version += 1
 
     def get_nodes(self):
         """Devuelve un conjunto de todos los nodos."""
@@ -64,6 +173,16 @@ class CustomGraph:
             return set()
         return set(self.pred[node_id].keys()) # Solo los nodos
 
+    def iter_neighbors(self, node_id):
+        """Itera los sucesores del nodo_id sin copiarlos a un set (vista de las claves de adj)."""
+        neighbors_dict = self.adj.get(node_id)
+        return neighbors_dict.keys() if neighbors_dict is not None else ()
+
+    def iter_predecessors(self, node_id):
+        """Itera los predecesores del nodo_id sin copiarlos a un set (vista de las claves de pred)."""
+        predecessors_dict = self.pred.get(node_id)
+        return predecessors_dict.keys() if predecessors_dict is not None else ()
+
     def degree(self, node_id, weighted=False):
         """
         Devuelve el grado total (entrada + salida) del nodo_id.
@@ -115,12 +234,32 @@ class CustomGraph:
         for u in self.nodes:
             undirected_graph.add_node(u)
         
+        # Se conservan los pesos; si u -> v y v -> u pesan distinto, cada sentido mantiene el de su arista original
         for u, neighbors in self.adj.items():
-            for v in neighbors:
-                undirected_graph.add_edge(u, v)
-                undirected_graph.add_edge(v, u) # Asegura la reciprocidad
+            for v, weight in neighbors.items():
+                undirected_graph.add_edge(u, v, weight)
+                undirected_graph.add_edge(v, u, self.adj.get(v, {}).get(u, weight)) # Asegura la reciprocidad
         return undirected_graph
 
+    def undirected_view(self):
+        """
+        Devuelve una vista no dirigida de solo lectura (UndirectedView) con el mismo contenido que
+        to_undirected() pero sin crear otro CustomGraph: una sola adyacencia simétrica, construida
+        una vez y reutilizada hasta que el grafo se modifique.
+        """
+        cached = self._undirected_view
+        if cached is not None and cached.version == self.version:
+            return cached
+        symmetric_adj = {u: {} for u in self.nodes}
+        # Mismo recorrido que to_undirected(), para conservar el orden de los vecinos
+        with _gc_paused():
+            for u, neighbors in self.adj.items():
+                for v, weight in neighbors.items():
+                    symmetric_adj[u][v] = weight
+                    symmetric_adj[v][u] = self.adj.get(v, {}).get(u, weight)
+        self._undirected_view = UndirectedView(self, symmetric_adj)
+        return self._undirected_view
+
     def get_node_attributes(self, node_id, locations_map):
         """
         Obtiene atributos básicos de un nodo.
@@ -139,6 +278,23 @@ class CustomGraph:
         }
         return info
 
+    def memory_usage(self):
+        """
+        Estima la memoria ocupada por las estructuras del grafo (dicts, claves y pesos):
+        {'total_bytes': ..., 'bytes_per_edge': ...}. Es aproximado: no descuenta objetos compartidos.
+        """
+        total_bytes = sys.getsizeof(self.nodes) + sys.getsizeof(self.adj) + sys.getsizeof(self.pred)
+        total_bytes += sum(sys.getsizeof(node) for node in self.nodes)
+        for structure in (self.adj, self.pred):
+            for neighbors_dict in structure.values():
+                total_bytes += sys.getsizeof(neighbors_dict)
+                total_bytes += sum(sys.getsizeof(v) + sys.getsizeof(w) for v, w in neighbors_dict.items())
+        num_edges = self.number_of_edges()
+        return {
+            'total_bytes': total_bytes,
+            'bytes_per_edge': total_bytes / num_edges if num_edges else 0.0,
+        }
+
 if __name__ == '__main__':
     # Ejemplo de uso básico
     cg = CustomGraph()
@@ -3,160 +3,279 @@ from collections import defaultdict, deque
 import heapq # Puede ser útil para Dijkstra o Prim
 # from sklearn.cluster import KMeans # Comentado
 import logging
+import threading
+import time
 import polars as pl
 from custom_graph import CustomGraph
+from csr_graph import CSRGraph, CSR_ARRAY_NAMES, degree_counts
+from location_store import LocationStore, SpatialIndex, haversine_km_scalar
+from loader import load_location_data, build_edge_list, iter_user_edge_batches, DEFAULT_CHUNK_BYTES
+import snapshot
 import algorithms # Importar el nuevo módulo de algoritmos
+import louvain_csr
+import triangles_csr
+import approx_stats
+
+_ENGINE_DEFAULT = object() # random_state no indicado: se usa el del motor (LOUVAIN_ENGINE_DEFAULTS)
 
 class GraphAnalyzer:
-    def __init__(self):
-        self.locations = {} # Diccionario: {node_id: (lat, lng)}
+    def __init__(self, graph_backend='dict', edge_weights='hops'):
+        self.locations = LocationStore() # Arrays lat/lng indexados por node_id (se consulta como {node_id: (lat, lng)})
+        self.graph_backend = graph_backend # 'dict' (CustomGraph) o 'csr' (CSRGraph inmutable)
+        self.edge_weights = edge_weights # 'hops' (peso 1) o 'haversine' (km de círculo máximo, float32)
         self.graph = CustomGraph() # Usar la clase de grafo personalizada
         self.communities = {} # Diccionario: {community_id: {'nodes': set(), 'center_lat': ..., 'center_lng': ...}}
         self.mst = None # Atributo para almacenar el Árbol de Expansión Mínima (CustomGraph)
+        self._derived_cache = {} # {nombre: (grafo de origen, versión, resultado)}: resultados derivados del grafo
+        self._derived_lock = threading.Lock() # La GUI consulta la caché desde varios hilos del planificador
+        self.graph_version = 0 # Se incrementa con cada grafo cargado (clave de los resultados memorizados en la GUI)
+        self._community_label_cache = None # (dict de comunidades, IDs de nodo ordenados, etiquetas, IDs de comunidad)
 
-    def _is_valid_location(self, lat, lng):
-        """
-        Verifica si las coordenadas están dentro de rangos geográficos válidos
-        y filtra algunas áreas oceánicas o irreales comunes.
-        """
-        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
-            return False
-        # Filtros heurísticos para áreas oceánicas o de datos anómalos
-        if -30 < lat < 30 and 160 < lng < -120: # Pacífico Central
-            return False
-        if -30 < lat < 30 and -40 < lng < -10: # Atlántico Central
-            return False
-        if -30 < lat < 10 and 60 < lng < 100: # Océano Índico
-            return False
-        return True
-        
-    def load_data(self, locations_df: pl.DataFrame, user_df: pl.DataFrame, sample_size=None):
+    def load_data(self, locations_df: pl.DataFrame, user_df: pl.DataFrame, sample_size=None, seed=None):
         """
         Carga y procesa los datos de ubicación y usuario para construir el grafo.
         Ahora recibe DataFrames de Polars ya cargados.
         """
         logging.info("Iniciando procesamiento de DataFrames en GraphAnalyzer...")
+        nodes_to_consider_for_graph = self._select_graph_nodes(locations_df, sample_size, seed)
 
-        self.locations = {}
-        valid_node_ids = set()
-
-        # Procesar locations_df
-        # Asumiendo que locations_df tiene columnas 'lat' y 'long'
-        # Y que el índice de la fila (0-indexed) corresponde al ID de usuario/nodo
-        for i, row_values in enumerate(locations_df.iter_rows()):
-            # locations_df tiene columnas: "id", "lat", "long" en ese orden.
-            # row_values será una tupla: (id_val, lat_val, long_val)
-            # El índice 'i' de enumerate corresponde al 'id_val' y es el ID del nodo.
-            node_id = i # o row_values[0], ambos deben ser iguales. Usar i es más directo.
-            lat = row_values[1] 
-            lng = row_values[2]
-            
-            if self._is_valid_location(lat, lng):
-                self.locations[node_id] = (lat, lng) # Guardar como (lat, lng)
-                valid_node_ids.add(i)
-        
-        logging.info(f"Ubicaciones válidas procesadas: {len(self.locations)}.")
+        # Construir el grafo a partir de una lista de aristas vectorizada (src/dst) en Polars.
+        # El índice de fila de user_df es el ID original del nodo: el origen es siempre una fila existente,
+        # pero el destino puede ser cualquier nodo considerado, aunque no tenga fila (como en streaming).
+        graph_node_ids = nodes_to_consider_for_graph[nodes_to_consider_for_graph < user_df.height]
+        edges_df = build_edge_list(user_df, nodes_to_consider_for_graph)
+        src, dst = edges_df["src"].to_numpy(), edges_df["dst"].to_numpy()
+        weights = self._edge_weights_for(src, dst)
+        self.graph = self._build_graph(graph_node_ids, src, dst, weights)
+        self._store_load_csr(graph_node_ids, src, dst, weights)
+        all_node_ids = np.union1d(graph_node_ids, dst) # Nodos del grafo: filas y destinos sin fila
+        self._store_degrees(all_node_ids, *degree_counts(all_node_ids, src, dst))
+
+        logging.info(f"Grafo construido con {self.graph.number_of_nodes()} nodos y {self.graph.number_of_edges()} aristas.")
+        self.communities = {} # Reset communities on new data load
+        self.get_spatial_index() # Índice espacial de los nodos cargados
+        self.graph_version += 1
+
+    def load_data_streaming(self, locations_df: pl.DataFrame, user_filepath: str, sample_size=None, seed=None,
+                            chunk_bytes=DEFAULT_CHUNK_BYTES, progress_callback=None):
+        """
+        Igual que load_data, pero lee el archivo de usuarios en bloques y va construyendo el grafo
+        a medida que llegan los lotes de aristas, sin cargar el archivo completo en memoria.
+        `progress_callback(bytes_leidos, bytes_totales)` permite mostrar el progreso en la GUI.
+        """
+        logging.info("Iniciando construcción del grafo en streaming en GraphAnalyzer...")
+        nodes_to_consider_for_graph = self._select_graph_nodes(locations_df, sample_size, seed)
+
+        graph = CustomGraph() if self.graph_backend != 'csr' else None
+        src_batches, dst_batches, weight_batches = [], [], []
+        # Grados acumulados por lote (cada fila, y por tanto cada arista, llega en un único lote)
+        in_degree = np.zeros(len(nodes_to_consider_for_graph), dtype=np.int64)
+        out_degree = np.zeros(len(nodes_to_consider_for_graph), dtype=np.int64)
+        rows_read = 0
+        for batch in iter_user_edge_batches(user_filepath, nodes_to_consider_for_graph, chunk_bytes, progress_callback):
+            rows_read = batch.row_end
+            # Se acumulan las aristas ya filtradas: CSRGraph es inmutable y se construye al final, y con
+            # el backend 'dict' sirven para dejar también listo el CSR de los algoritmos vectorizados
+            src_batches.append(batch.src)
+            dst_batches.append(batch.dst)
+            if graph is not None:
+                batch_weights = self._edge_weights_for(batch.src, batch.dst)
+                graph.add_edges_from(batch.src, batch.dst, batch_weights)
+                weight_batches.append(batch_weights)
+                batch_in, batch_out = degree_counts(nodes_to_consider_for_graph, batch.src, batch.dst)
+                in_degree += batch_in
+                out_degree += batch_out
+
+        graph_node_ids = nodes_to_consider_for_graph[nodes_to_consider_for_graph < rows_read]
+        src = np.concatenate(src_batches) if src_batches else np.empty(0, dtype=np.int64)
+        dst = np.concatenate(dst_batches) if dst_batches else np.empty(0, dtype=np.int64)
+        if graph is not None:
+            graph.add_nodes_from(graph_node_ids.tolist())
+            self.graph = graph
+            weights = None if not weight_batches or weight_batches[0] is None else np.concatenate(weight_batches)
+            self._store_load_csr(graph_node_ids, src, dst, weights)
+            # Nodos del grafo: filas leídas y también los vecinos sin fila (todos están en nodes_to_consider_for_graph)
+            all_node_ids = np.asarray(sorted(graph.get_nodes()), dtype=np.int64)
+            positions = np.searchsorted(nodes_to_consider_for_graph, all_node_ids)
+            self._store_degrees(all_node_ids, in_degree[positions], out_degree[positions])
+        else:
+            self.graph = self._build_graph(graph_node_ids, src, dst)
+            self._store_degrees(self.graph.node_ids, *self.graph.degree_arrays()[1:])
+
+        logging.info(f"Grafo construido con {self.graph.number_of_nodes()} nodos y {self.graph.number_of_edges()} aristas.")
+        self.communities = {} # Reset communities on new data load
+        self.get_spatial_index() # Índice espacial de los nodos cargados
+        self.graph_version += 1
 
-        # Procesar user_df (listas de adyacencia)
-        self.graph = CustomGraph() # Reiniciar el grafo
+    def load_from_files(self, location_filepath: str, user_filepath: str, sample_size=None, seed=None,
+                        use_snapshot=True, chunk_bytes=DEFAULT_CHUNK_BYTES, progress_callback=None):
+        """
+        Construye el grafo directamente desde los archivos de texto, reutilizando un snapshot binario
+        (arrays .npy mapeados en memoria) si los archivos, sample_size y seed no han cambiado.
+        Si no hay snapshot válido se parsean los archivos en streaming y se guarda uno nuevo.
+        """
+        snapshot_dir = f"{user_filepath}.graph_snapshot"
+        # Sin semilla la muestra no es reproducible: solo se cachea el grafo completo o con semilla fija
+        cacheable = use_snapshot and (sample_size is None or seed is not None)
+        if cacheable:
+            snapshot_key = snapshot.snapshot_key([location_filepath, user_filepath], sample_size=sample_size, seed=seed,
+                                                   edge_weights=self.edge_weights)
+            loaded = snapshot.load_arrays(snapshot_dir, snapshot_key)
+            if loaded is not None:
+                self._restore_from_snapshot_arrays(loaded[0])
+                logging.info(f"Grafo restaurado desde snapshot con {self.graph.number_of_nodes()} nodos y {self.graph.number_of_edges()} aristas.")
+                return
+
+        location_df = load_location_data(location_filepath, use_snapshot=use_snapshot)
+        if location_df is None:
+            raise ValueError("Error al cargar el archivo de ubicaciones.")
+        self.load_data_streaming(location_df, user_filepath, sample_size, seed, chunk_bytes, progress_callback)
+        if cacheable:
+            snapshot.save_arrays(snapshot_dir, snapshot_key, self._snapshot_arrays())
+
+    def _snapshot_arrays(self):
+        """Arrays que describen el estado cargado (ubicaciones y grafo en CSR) para guardarlos en un snapshot."""
+        csr = self.get_csr_graph()
+        arrays = {f"graph_{name}": getattr(csr, name) for name in CSR_ARRAY_NAMES}
+        if self.edge_weights == 'haversine':
+            # Las distancias se guardan en float32 aunque el grafo 'dict' las tenga como float de Python
+            arrays['graph_weights'] = arrays['graph_weights'].astype(np.float32, copy=False)
+            arrays['graph_pred_weights'] = arrays['graph_pred_weights'].astype(np.float32, copy=False)
+        arrays['loc_lat'] = self.locations.lat
+        arrays['loc_lng'] = self.locations.lng
+        arrays['loc_valid'] = self.locations.valid
+        return arrays
+
+    def _restore_from_snapshot_arrays(self, arrays):
+        """Reconstruye ubicaciones y grafo desde los arrays de un snapshot (sin copiar si el backend es 'csr')."""
+        self.locations = LocationStore(arrays['loc_lat'], arrays['loc_lng'], arrays['loc_valid'])
+        csr = CSRGraph(*(arrays[f"graph_{name}"] for name in CSR_ARRAY_NAMES))
+        if self.graph_backend == 'csr':
+            self.graph = csr
+        else:
+            src, dst, weights = csr.edge_arrays()
+            self.graph = self._build_graph(csr.node_ids, src, dst, weights)
+            self._store_derived('csr', csr) # Reutilizar el CSR del snapshot para los algoritmos vectorizados
+        self._store_degrees(csr.node_ids, *csr.degree_arrays()[1:])
+        self.communities = {}
+        self.get_spatial_index() # Índice espacial de los nodos cargados
+        self.graph_version += 1
+
+    def _select_graph_nodes(self, locations_df: pl.DataFrame, sample_size=None, seed=None):
+        """
+        Procesa las ubicaciones (rellena self.locations) y aplica el muestreo (reproducible si se da `seed`).
+        Devuelve un array ordenado con los IDs de nodo a incluir en el grafo.
+        """
+        # Procesar locations_df en una sola pasada vectorizada
+        # El índice de la fila (0-indexed) corresponde al ID de usuario/nodo
+        self.locations = LocationStore.from_dataframe(locations_df)
+        valid_node_ids = self.locations.ids()
+        logging.info(f"Ubicaciones válidas procesadas: {len(self.locations)}.")
 
         # Determinar el conjunto final de nodos a incluir en el grafo
         nodes_to_consider_for_graph = valid_node_ids # Por defecto, todos los nodos con ubicación válida
 
         if sample_size is not None and len(valid_node_ids) > sample_size:
             logging.info(f"Se aplicará un muestreo para limitar el grafo a aproximadamente {sample_size} nodos.")
-            # Tomar una muestra aleatoria de los nodos que tienen ubicaciones válidas
-            # Convertir set a list para np.random.choice
-            potential_nodes_list = list(valid_node_ids)
-            # Asegurarse de no pedir más muestras de las disponibles
-            actual_sample_size = min(sample_size, len(potential_nodes_list))
-            sampled_node_ids = set(np.random.choice(potential_nodes_list, actual_sample_size, replace=False))
-            nodes_to_consider_for_graph = sampled_node_ids
+            # Tomar una muestra aleatoria (dependiente solo de la semilla) de los nodos con ubicación válida
+            rng = np.random.default_rng(seed)
+            nodes_to_consider_for_graph = np.sort(rng.choice(valid_node_ids, sample_size, replace=False))
             logging.info(f"Muestreo realizado. Se considerarán {len(nodes_to_consider_for_graph)} nodos para el grafo.")
 
-            # Filtrar self.locations para que solo contenga los nodos muestreados
-            self.locations = {node_id: loc for node_id, loc in self.locations.items() if node_id in nodes_to_consider_for_graph}
-            logging.info(f"Diccionario de ubicaciones filtrado a {len(self.locations)} entradas post-muestreo.")
+            # Filtrar las ubicaciones para que solo contengan los nodos muestreados
+            self.locations = self.locations.restrict_to(nodes_to_consider_for_graph)
+            logging.info(f"Ubicaciones filtradas a {len(self.locations)} entradas post-muestreo.")
 
-        # Construir el grafo
-        # Iterar sobre el user_df original. El índice 'i' es el ID original del nodo.
-        for i, adj_row in enumerate(user_df.iter_rows(named=True)): # Asumiendo que 'adj_list' es el nombre de la columna
-            current_node_original_id = i 
-            adj_str = adj_row['adj_list']
+        return nodes_to_consider_for_graph.astype(np.int64, copy=False)
 
-            if current_node_original_id in nodes_to_consider_for_graph:
-                self.graph.add_node(current_node_original_id) # Añadir nodo al grafo
+    def _edge_weights_for(self, src, dst):
+        """Pesos de las aristas según self.edge_weights: None (peso 1) o distancia haversine en km (float32)."""
+        if self.edge_weights == 'haversine':
+            return self.locations.edge_lengths_km(src, dst)
+        if self.edge_weights != 'hops':
+            logging.warning(f"Tipo de peso de arista '{self.edge_weights}' no reconocido. Se usará peso 1.")
+        return None
 
-                if adj_str: # Asegurarse de que la cadena no esté vacía
-                    try:
-                        neighbors_str_list = adj_str.replace(',', ' ').split()
-                        original_neighbor_ids = [int(n) for n in neighbors_str_list if n.isdigit()]
-                        
-                        for neighbor_id in original_neighbor_ids:
-                            # Añadir arista solo si el vecino también está en el conjunto de nodos a considerar
-                            if neighbor_id in nodes_to_consider_for_graph:
-                                self.graph.add_node(neighbor_id) # Asegurar que el vecino también esté como nodo
-                                self.graph.add_edge(current_node_original_id, neighbor_id)
-                    except ValueError as ve:
-                        logging.warning(f"Error al parsear lista de adyacencia para el nodo {current_node_original_id}: {ve}. Línea: '{adj_str}'")
-            
-        logging.info(f"Grafo construido con {self.graph.number_of_nodes()} nodos y {self.graph.number_of_edges()} aristas.")
-        self.communities = {} # Reset communities on new data load
+    def _store_load_csr(self, node_ids, src, dst, weights):
+        """
+        Con el backend 'dict', guarda ya en la carga el CSR construido desde los mismos arrays de aristas,
+        para que get_csr_graph() no tenga que convertir después los dicts (p. ej. dentro del presupuesto
+        de get_approximate_stats).
+        """
+        if not isinstance(self.graph, CSRGraph):
+            self._store_derived('csr', CSRGraph.from_edge_arrays(src, dst, weights, nodes=node_ids))
 
-    def detect_communities(self, algorithm='louvain', random_state=42):
+    def _build_graph(self, node_ids, src, dst, weights=None):
         """
-        Detecta comunidades en el grafo y calcula el centro geográfico para cada una.
-        Soporta 'louvain' (requiere python-louvain) o 'kmeans' (más simple, basado en geolocalización).
+        Construye el grafo en bloque desde arrays de aristas usando el backend configurado.
+        Si no se pasan pesos, se calculan según self.edge_weights.
         """
+        if weights is None:
+            weights = self._edge_weights_for(src, dst)
+        if self.graph_backend == 'csr':
+            return CSRGraph.from_edge_arrays(src, dst, weights, nodes=node_ids)
+        if self.graph_backend != 'dict':
+            logging.warning(f"Backend de grafo '{self.graph_backend}' no reconocido. Se usará 'dict'.")
+        graph = CustomGraph()
+        graph.add_nodes_from(node_ids.tolist())
+        graph.add_edges_from(src, dst, weights)
+        return graph
+
+    # Valores de random_state / active_queue de cada motor de Louvain cuando no se indican: el motor sobre
+    # dicts conserva su comportamiento original (orden natural, recorrido completo) y el CSR usa la cola activa.
+    LOUVAIN_ENGINE_DEFAULTS = {'louvain': {'random_state': None, 'active_queue': False},
+                               'louvain_csr': {'random_state': 42, 'active_queue': True}}
+
+    def detect_communities(self, algorithm='louvain', random_state=_ENGINE_DEFAULT, n_workers=1, max_passes=30,
+                           tolerance=1e-7, active_queue=None, min_moved_fraction=0.0, min_pass_gain=0.0):
+        """Detecta comunidades con compute_communities (mismos parámetros) y las guarda en self.communities."""
+        self.communities = self.compute_communities(
+            algorithm, random_state, n_workers, max_passes, tolerance, active_queue, min_moved_fraction, min_pass_gain)
+
+    def compute_communities(self, algorithm='louvain', random_state=_ENGINE_DEFAULT, n_workers=1, max_passes=30,
+                            tolerance=1e-7, active_queue=None, min_moved_fraction=0.0, min_pass_gain=0.0,
+                            should_stop=None):
+        """
+        Detecta comunidades en el grafo y calcula el centro geográfico para cada una, sin modificar el
+        analizador: devuelve {community_id: {'nodes', 'size', 'center_lat', 'center_lng'}}.
+        Soporta 'louvain' (implementación manual sobre dicts), 'louvain_csr' (misma idea sobre arrays CSR)
+        o 'kmeans' (más simple, basado en geolocalización).
+        n_workers > 1 ejecuta en paralelo la fase local de 'louvain_csr'.
+        Controles de convergencia de Louvain: random_state (orden de visita aleatorio reproducible; None =
+        orden natural), max_passes y tolerance, active_queue (revisitar solo los nodos cuyo vecindario
+        cambió) y los umbrales de parada por pasada min_moved_fraction y min_pass_gain.
+        Si no se indican random_state ni active_queue se usan los de LOUVAIN_ENGINE_DEFAULTS: 'louvain' da
+        exactamente la misma partición que antes de estos controles.
+        should_stop(): si se indica y devuelve True (p. ej. trabajo cancelado en la GUI), Louvain termina
+        en la siguiente pasada con lo calculado hasta entonces.
+        Louvain usa siempre peso 1 por arista: con edge_weights='haversine' los km sirven para caminos y MST,
+        pero leídos como fuerza del vínculo harían que las amistades más lejanas pesaran más.
+        """
+        engine_defaults = self.LOUVAIN_ENGINE_DEFAULTS.get(algorithm, {})
+        if random_state is _ENGINE_DEFAULT:
+            random_state = engine_defaults.get('random_state')
+        if active_queue is None:
+            active_queue = engine_defaults.get('active_queue', False)
         if not self.graph.number_of_nodes() > 0:
             logging.warning("No hay nodos en el grafo para detectar comunidades.")
-            self.communities = {}
-            return
+            return {}
 
         logging.info(f"Detectando comunidades usando el algoritmo: {algorithm}...")
-        self.communities = {} # Limpiar comunidades anteriores
+        communities = {}
 
         if algorithm == 'louvain':
-            partition = algorithms.detect_communities_louvain(self.graph) # Llamar a la implementación manual
+            partition = algorithms.detect_communities_louvain( # Llamar a la implementación manual
+                self.graph, max_passes=max_passes, tolerance=tolerance, random_state=random_state,
+                active_queue=active_queue, min_moved_fraction=min_moved_fraction, min_pass_gain=min_pass_gain,
+                should_stop=should_stop, weighted=False)
             
             if not partition:
                 logging.warning("Louvain manual no devolvió una partición válida.")
-                self.communities = {}
-                return
+                return {}
 
-            # Agrupar nodos por comunidad y calcular centro geográfico
-            # Esta parte de la lógica se puede reutilizar si la 'partition' tiene el formato {node: community_id}
-            community_nodes_map = defaultdict(list)
-            for node, comm_id in partition.items():
-                community_nodes_map[comm_id].append(node)
+            communities = self._build_communities(partition)
             
-            for comm_id, nodes_in_comm in community_nodes_map.items():
-                nodes_with_location = [node for node in nodes_in_comm if node in self.locations]
-                
-                if nodes_with_location:
-                    lats = [self.locations[node][0] for node in nodes_with_location]
-                    lngs = [self.locations[node][1] for node in nodes_with_location]
-                    
-                    center_lat = np.mean(lats) if lats else 0.0
-                    center_lng = np.mean(lngs) if lngs else 0.0
-                    
-                    self.communities[comm_id] = {
-                        'nodes': set(nodes_in_comm),
-                        'size': len(nodes_in_comm),
-                        'center_lat': center_lat,
-                        'center_lng': center_lng
-                    }
-                else:
-                    # Aún crear la comunidad pero sin centro geo si no hay nodos con ubicación
-                    self.communities[comm_id] = {
-                        'nodes': set(nodes_in_comm),
-                        'size': len(nodes_in_comm),
-                        'center_lat': None,
-                        'center_lng': None
-                    }
-                    logging.warning(f"Comunidad {comm_id} (Louvain manual) no tiene nodos con ubicaciones válidas para calcular el centro.")
-            
-            logging.info(f"Detección de comunidades Louvain (manual placeholder) completada. Encontradas {len(self.communities)} comunidades.")
+            logging.info(f"Detección de comunidades Louvain (manual placeholder) completada. Encontradas {len(communities)} comunidades.")
             # try:
             #     # import community as co # python-louvain library # ESTO SE ELIMINARÁ
             #     # partition = co.best_partition(self.graph.to_undirected_nx()) # Louvain works on undirected graphs
@@ -197,6 +316,15 @@ class GraphAnalyzer:
             #     self.communities = {}
             pass # Fin del bloque Louvain
         
+        elif algorithm == 'louvain_csr':
+            # Louvain sobre arrays CSR con nodos reetiquetados a 0..n-1 (mucho más rápido en grafos grandes)
+            partition = louvain_csr.detect_communities_louvain_csr(
+                self.get_csr_graph(), max_passes=max_passes, min_modularity_gain=tolerance, n_workers=n_workers,
+                random_state=random_state, active_queue=active_queue, min_moved_fraction=min_moved_fraction,
+                min_pass_gain=min_pass_gain, should_stop=should_stop, weighted=False)
+            communities = self._build_communities(partition)
+            logging.info(f"Detección de comunidades Louvain CSR completada. Encontradas {len(communities)} comunidades.")
+
         elif algorithm == 'kmeans':
             # K-means no es un algoritmo de detección de comunidades basado en la estructura de red típicamente.
             # Se mantendrá comentado o se eliminará si no es un requisito principal.
@@ -204,11 +332,52 @@ class GraphAnalyzer:
             
         else:
             logging.warning(f"Algoritmo de comunidad '{algorithm}' no reconocido o no implementado manualmente aún.")
+        return communities
+
+    def _build_communities(self, partition):
+        """
+        Agrupa los nodos de una partición {node: community_id} y calcula el centro geográfico de cada
+        comunidad con sumas vectorizadas (bincount) sobre los arrays de ubicaciones.
+        """
+        nodes = np.fromiter(partition.keys(), dtype=np.int64, count=len(partition))
+        comm_ids = list(partition.values())
+        unique_comms, comm_index = np.unique(np.asarray(comm_ids), return_inverse=True)
+        num_comms = len(unique_comms)
+
+        has_location = self.locations.has_location(nodes)
+        located_nodes, located_comms = nodes[has_location], comm_index[has_location]
+        counts_with_location = np.bincount(located_comms, minlength=num_comms)
+        lat_sums = np.bincount(located_comms, weights=self.locations.lat[located_nodes], minlength=num_comms)
+        lng_sums = np.bincount(located_comms, weights=self.locations.lng[located_nodes], minlength=num_comms)
+
+        # Nodos de cada comunidad, agrupados ordenando por índice de comunidad
+        order = np.argsort(comm_index, kind='stable')
+        boundaries = np.cumsum(np.bincount(comm_index, minlength=num_comms))[:-1]
+        nodes_per_comm = np.split(nodes[order], boundaries)
+
+        communities = {}
+        for k, comm_id in enumerate(unique_comms.tolist()):
+            nodes_in_comm = nodes_per_comm[k].tolist()
+            if counts_with_location[k] > 0:
+                center_lat = lat_sums[k] / counts_with_location[k]
+                center_lng = lng_sums[k] / counts_with_location[k]
+            else:
+                # Aún crear la comunidad pero sin centro geo si no hay nodos con ubicación
+                center_lat = center_lng = None
+                logging.warning(f"Comunidad {comm_id} (Louvain manual) no tiene nodos con ubicaciones válidas para calcular el centro.")
+            communities[comm_id] = {
+                'nodes': set(nodes_in_comm),
+                'size': len(nodes_in_comm),
+                'center_lat': center_lat,
+                'center_lng': center_lng
+            }
+        return communities
 
     def find_shortest_path(self, start_node, end_node):
         """
         Encuentra el camino más corto entre dos nodos.
-        Este método será reemplazado por una implementación manual de BFS/Dijkstra.
+        Con pesos 'haversine' es el camino físicamente más corto (A* con heurística de distancia
+        haversine al destino); si no, el de menos saltos (BFS bidireccional).
         """
         if start_node not in self.graph.get_nodes() or end_node not in self.graph.get_nodes(): # Usa CustomGraph
             logging.warning(f"Uno o ambos nodos ({start_node}, {end_node}) no existen en el grafo.")
@@ -224,16 +393,131 @@ class GraphAnalyzer:
         #    return None
         # logging.info(f"Búsqueda de camino más corto manual para {start_node} -> {end_node} (AÚN NO IMPLEMENTADO).")
         # return None # Temporalmente devuelve None
-        path = algorithms.bfs_shortest_path(self.graph, start_node, end_node)
+        if self.edge_weights == 'haversine':
+            return self.find_weighted_shortest_path(start_node, end_node)
+        path = algorithms.bidirectional_bfs_shortest_path(self.graph, start_node, end_node)
+        if path:
+            logging.info(f"Camino encontrado (BFS bidireccional) entre {start_node} y {end_node}: {path}")
+        else:
+            logging.warning(f"No se encontró camino (BFS bidireccional) entre {start_node} y {end_node}.")
+        return path
+
+    def find_weighted_shortest_path(self, start_node, end_node):
+        """
+        Camino de menor distancia geográfica (suma de pesos) con A*: la distancia haversine de cada nodo
+        al destino es una cota inferior admisible cuando los pesos son distancias haversine.
+        """
+        heuristic_fn = None # Sin pesos geográficos (o sin ubicación del destino): Dijkstra
+        if self.edge_weights == 'haversine' and end_node in self.locations:
+            end_lat, end_lng = self.locations[end_node]
+            lat, lng = self.locations.lat, self.locations.lng
+            def heuristic_fn(node):
+                return haversine_km_scalar(float(lat[node]), float(lng[node]), end_lat, end_lng)
+        path, distance = algorithms.astar_shortest_path(self.graph, start_node, end_node, heuristic_fn)
         if path:
-            logging.info(f"Camino encontrado (BFS manual) entre {start_node} y {end_node}: {path}")
+            logging.info(f"Camino encontrado (A*) entre {start_node} y {end_node}: {len(path) - 1} aristas, {distance:.2f} km.")
         else:
-            logging.warning(f"No se encontró camino (BFS manual) entre {start_node} y {end_node}.")
+            logging.warning(f"No se encontró camino (A*) entre {start_node} y {end_node}.")
         return path
 
+    def _store_derived(self, name, value, graph=None, version=None):
+        """
+        Guarda un resultado derivado del grafo `graph` en su versión `version` (por defecto, el grafo actual):
+        válido mientras no se sustituya ni se modifique.
+        """
+        with self._derived_lock:
+            if graph is None:
+                graph, version = self.graph, self.graph.version
+            self._derived_cache[name] = (graph, version, value)
+        return value
+
+    def _derived(self, name, compute):
+        """
+        Devuelve el resultado cacheado `name` si se calculó sobre el grafo actual en su versión actual;
+        si no, lo recalcula con compute() y lo cachea. El cálculo se hace fuera del candado y se guarda
+        asociado al grafo que había al empezar: si se carga otro grafo mientras tanto, no lo suplanta.
+        """
+        with self._derived_lock:
+            graph, version = self.graph, self.graph.version
+            cached = self._derived_cache.get(name)
+            if cached is not None and cached[0] is graph and cached[1] == version:
+                return cached[2]
+        return self._store_derived(name, compute(), graph, version)
+
+    def get_csr_graph(self):
+        """
+        Devuelve el grafo en formato CSR para los algoritmos vectorizados: el propio grafo si el backend
+        es 'csr', o una conversión cacheada mientras self.graph no cambie.
+        """
+        if isinstance(self.graph, CSRGraph):
+            return self.graph
+        return self._derived('csr', lambda: CSRGraph.from_custom_graph(self.graph))
+
+    def single_source_bfs(self, source_node):
+        """
+        Ejecuta un único BFS desde source_node sobre el grafo CSR.
+        Devuelve (node_ids, dist, parent): dist[i] es la distancia en saltos hasta node_ids[i] (-1 si es
+        inalcanzable) y parent[i] el índice interno del predecesor en el árbol BFS (-1 si no tiene).
+        Devuelve None si el nodo no existe.
+        """
+        csr = self.get_csr_graph()
+        source_index = csr._index_of(source_node)
+        if source_index < 0:
+            logging.warning(f"El nodo {source_node} no existe en el grafo.")
+            return None
+        dist, parent = algorithms.bfs_tree_csr(csr.indptr, csr.indices, source_index)
+        return csr.node_ids, dist, parent
+
+    def get_hop_distance_histogram(self, source_node):
+        """Histograma de distancias en saltos desde source_node: counts[d] = nº de nodos a distancia d."""
+        result = self.single_source_bfs(source_node)
+        if result is None:
+            return np.zeros(0, dtype=np.int64)
+        dist = result[1]
+        return np.bincount(dist[dist >= 0])
+
+    def find_shortest_paths(self, start_node, end_nodes):
+        """
+        Caminos más cortos desde start_node a cada nodo de end_nodes con un solo BFS.
+        Devuelve {end_node: camino o None}.
+        """
+        return {end: path for (_, end), path in self.batch_shortest_paths([(start_node, end) for end in end_nodes]).items()}
+
+    def batch_shortest_paths(self, pairs, n_workers=1):
+        """
+        Resuelve una lista de pares (origen, destino) ejecutando un BFS por origen distinto; con
+        n_workers > 1 los orígenes se reparten en un pool de procesos.
+        Devuelve {(origen, destino): camino o None}.
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return {}
+        csr = self.get_csr_graph()
+        pair_array = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        source_idx = csr.indices_of(pair_array[:, 0])
+        target_idx = csr.indices_of(pair_array[:, 1])
+
+        queries = defaultdict(list)
+        for s_idx, t_idx in zip(source_idx.tolist(), target_idx.tolist()):
+            if s_idx >= 0 and t_idx >= 0:
+                queries[s_idx].append(t_idx)
+        results = algorithms.batch_bfs_paths(csr.indptr, csr.indices, queries, n_workers)
+        logging.info(f"{len(pairs)} consultas de camino resueltas con {len(queries)} BFS.")
+
+        # Traducir los caminos de índices internos a IDs de nodo
+        paths_by_source = {source: dict(zip(queries[source], paths)) for source, (_, paths) in results.items()}
+        node_ids = csr.node_ids
+        output = {}
+        for (start, end), s_idx, t_idx in zip(pairs, source_idx.tolist(), target_idx.tolist()):
+            path = paths_by_source.get(s_idx, {}).get(t_idx)
+            output[(start, end)] = node_ids[path].tolist() if path is not None else None
+        return output
+
     def get_path_distance(self, path):
-        """Calcula la distancia de un camino (número de aristas)."""
+        """Calcula la distancia de un camino (número de aristas, o suma de km si los pesos son 'haversine')."""
         if path and len(path) > 1:
+            if self.edge_weights == 'haversine':
+                return float(sum(self.graph.get_edge_weight(u, v) for u, v in zip(path, path[1:])))
             return len(path) - 1
         return 0
 
@@ -261,86 +545,278 @@ class GraphAnalyzer:
                 
         return info
     
+    def _store_degrees(self, node_ids, in_degree, out_degree):
+        """Guarda los arrays de grado calculados al construir el grafo (válidos hasta que cambie)."""
+        return self._store_derived('degrees', {'node_ids': node_ids, 'degree': in_degree + out_degree,
+                                               'in_degree': in_degree, 'out_degree': out_degree})
+
+    def get_degree_arrays(self):
+        """
+        Grados de todos los nodos como arrays int64: {'node_ids', 'degree', 'in_degree', 'out_degree'}.
+        Se calculan al construir el grafo; si el grafo se modifica después, se recalculan desde el CSR.
+        """
+        def compute():
+            csr = self.get_csr_graph()
+            return {'node_ids': csr.node_ids, **dict(zip(('degree', 'in_degree', 'out_degree'), csr.degree_arrays()))}
+        return self._derived('degrees', compute)
+
+    def get_average_degree(self):
+        """Grado medio (entrada + salida) de los nodos del grafo."""
+        degree = self.get_degree_arrays()['degree']
+        return float(degree.mean()) if len(degree) else 0.0
+
+    def get_degree_histogram(self, kind='degree'):
+        """
+        Distribución de grados: counts[d] = nº de nodos con grado d.
+        `kind` es 'degree' (entrada + salida), 'in_degree' u 'out_degree'.
+        """
+        return np.bincount(self.get_degree_arrays()[kind])
+
     def get_top_connected_nodes(self, n=10):
-        """Obtener los nodos más conectados (por grado)"""
-        if not self.graph.number_of_nodes() > 0: # Usa CustomGraph
+        """Obtener los nodos más conectados (por grado): lista de (node_id, grado) de mayor a menor."""
+        degrees = self.get_degree_arrays()
+        degree = degrees['degree']
+        if len(degree) == 0 or n <= 0:
             return []
-        
-        # Obtener todos los grados y luego ordenar
-        degrees = []
-        for node in self.graph.get_nodes(): # Usa CustomGraph
-            degrees.append((node, self.graph.degree(node))) # Usa CustomGraph
-            
-        degrees.sort(key=lambda x: x[1], reverse=True)
-        return degrees[:n]
+        # Selección parcial O(N) del n-ésimo mayor grado; se ordenan solo los nodos que lo alcanzan (todos
+        # los empatados en el corte, para desempatar por ID igual que un orden completo) y se recorta a n
+        if n < len(degree):
+            kth_degree = degree[np.argpartition(-degree, n - 1)[n - 1]]
+            top = np.flatnonzero(degree >= kth_degree)
+        else:
+            top = np.arange(len(degree))
+        top = top[np.lexsort((degrees['node_ids'][top], -degree[top]))][:n]
+        return list(zip(degrees['node_ids'][top].tolist(), degree[top].tolist()))
     
     def get_density(self):
         """Devuelve la densidad del grafo."""
         return algorithms.calculate_density(self.graph)
 
+    def get_component_labels(self):
+        """
+        Etiqueta (int32, 0..k-1) de la componente conexa (ignorando la dirección) de cada nodo, alineada
+        con get_csr_graph().node_ids. Se calcula con union-find sobre los arrays de aristas, sin copia
+        no dirigida, y se cachea hasta que el grafo cambie.
+        """
+        def compute():
+            csr = self.get_csr_graph()
+            num_nodes = len(csr.node_ids)
+            src = np.repeat(np.arange(num_nodes, dtype=np.int64), np.diff(csr.indptr))
+            return algorithms.connected_component_labels(num_nodes, src, csr.indices)
+        return self._derived('component_labels', compute)
+
+    def get_component_sizes(self):
+        """Tamaño de cada componente conexa: sizes[c] = nº de nodos con etiqueta c."""
+        return self._derived('component_sizes', lambda: np.bincount(self.get_component_labels()))
+
+    def get_strongly_connected_component_labels(self):
+        """Etiqueta (int32) de la componente fuertemente conexa de cada nodo del grafo dirigido (cacheada)."""
+        def compute():
+            csr = self.get_csr_graph()
+            return algorithms.strongly_connected_component_labels(csr.indptr, csr.indices)
+        return self._derived('scc_labels', compute)
+
+    def get_number_strongly_connected_components(self):
+        """Devuelve el número de componentes fuertemente conexas del grafo dirigido."""
+        labels = self.get_strongly_connected_component_labels()
+        return int(labels.max()) + 1 if len(labels) else 0
+
     def get_number_connected_components(self):
         """Devuelve el número de componentes conectados (para grafo no dirigido)."""
-        undirected_graph = self.graph.to_undirected()
-        components = algorithms.get_connected_components(undirected_graph)
-        return len(components)
+        return len(self.get_component_sizes())
 
     def get_largest_connected_component_size(self):
         """Devuelve el tamaño del componente conectado más grande (para grafo no dirigido)."""
-        undirected_graph = self.graph.to_undirected()
-        components = algorithms.get_connected_components(undirected_graph)
-        if not components:
+        sizes = self.get_component_sizes()
+        if len(sizes) == 0:
             return 0
-        return max(len(c) for c in components)
+        return int(sizes.max())
+
+    def get_clustering_stats(self, n_workers=1):
+        """
+        Triángulos y coeficientes de clustering (para grafo no dirigido) calculados por recuento de
+        triángulos sobre el CSR y cacheados hasta que el grafo cambie:
+        {'triangles', 'local_clustering', 'average_clustering', 'transitivity'}, con los arrays
+        alineados con get_csr_graph().node_ids.
+        """
+        return self._derived('clustering', lambda: triangles_csr.clustering_csr(self.get_csr_graph(), n_workers=n_workers))
 
     def get_average_clustering_coefficient(self):
         """Devuelve el coeficiente de clustering promedio (para grafo no dirigido)."""
-        undirected_graph = self.graph.to_undirected()
-        return algorithms.average_clustering_coefficient(undirected_graph)
+        return self.get_clustering_stats()['average_clustering']
+
+    def get_transitivity(self):
+        """Devuelve la transitividad global (fracción de tripletas conectadas que cierran un triángulo)."""
+        return self.get_clustering_stats()['transitivity']
+
+    def get_approximate_stats(self, time_budget_s=2.0, confidence=0.95, seed=None):
+        """
+        Estadísticas aproximadas por muestreo, con intervalo de confianza, dentro de un presupuesto de
+        tiempo (para grafos grandes en los que las exactas bloquearían): clustering promedio y
+        transitividad por muestreo de cuñas, grado medio y distribución de grados por muestreo de nodos.
+        El presupuesto cuenta desde la llamada: los estimadores trabajan sobre el CSR dirigido (sin
+        construir la versión no dirigida) y cada uno recibe lo que queda hasta su plazo.
+        Devuelve {'average_clustering', 'transitivity', 'degree', 'confidence'}; cada estimación lleva 'ci_low'/'ci_high'.
+        """
+        start = time.perf_counter()
+        csr = self.get_csr_graph()
+        rng = np.random.default_rng(seed)
+        indptr, indices, pred_indptr, pred_indices = csr.indptr, csr.indices, csr.pred_indptr, csr.pred_indices
+
+        def degree_of(indices): # Grado entrada + salida, como CustomGraph.degree
+            return (indptr[indices + 1] - indptr[indices]) + (pred_indptr[indices + 1] - pred_indptr[indices])
+
+        def remaining(fraction): # Reparto del presupuesto: el clustering es la estimación más ruidosa, el grado la más barata
+            return max(0.0, start + fraction * time_budget_s - time.perf_counter())
+
+        stats = {'confidence': confidence}
+        stats['average_clustering'] = approx_stats.estimate_average_clustering(
+            indptr, indices, pred_indptr, pred_indices, remaining(0.5), confidence, rng)
+        stats['transitivity'] = approx_stats.estimate_transitivity(
+            indptr, indices, pred_indptr, pred_indices, remaining(0.8), confidence, rng)
+        stats['degree'] = approx_stats.estimate_degree_stats(degree_of, csr.number_of_nodes(), remaining(1.0), confidence, rng)
+        return stats
 
     def calculate_minimum_spanning_tree(self, algorithm_type='kruskal'):
+        """Calcula el MST con compute_minimum_spanning_tree, lo guarda en self.mst y lo devuelve."""
+        self.mst = self.compute_minimum_spanning_tree(algorithm_type)
+        return self.mst
+
+    def compute_minimum_spanning_tree(self, algorithm_type='kruskal', should_stop=None):
         """
-        Calcula el Árbol de Expansión Mínima (MST) del grafo.
-        El grafo se considera no dirigido y las aristas con peso 1.
+        Calcula el Árbol de Expansión Mínima (MST) del grafo y lo devuelve sin modificar el analizador.
+        El grafo se considera no dirigido, con los pesos de sus aristas (1, o km si son 'haversine').
+        'kruskal' (argsort + union-find int32) y 'prim' usan los arrays CSR y devuelven el MST como CSRGraph;
+        'kruskal_dict' conserva la implementación original sobre CustomGraph.
+        should_stop(): si se indica y devuelve True, 'kruskal' deja de recorrer aristas (bosque parcial).
         """
         if self.graph.number_of_nodes() == 0:
             logging.warning("No hay nodos en el grafo para calcular el MST.")
-            self.mst = CustomGraph() # MST vacío
-            return self.mst
+            return CustomGraph() # MST vacío
 
-        undirected_graph = self.graph.to_undirected()
-        
-        if algorithm_type == 'kruskal':
-            # Asumimos que kruskal en algorithms.py puede manejar un grafo CustomGraph no ponderado
-            # o que se adapta para tomar pesos si CustomGraph los soporta en el futuro.
+        if algorithm_type in ('kruskal', 'prim'):
+            # Con pesos 'haversine' el MST es la red troncal geográfica de menor longitud total
+            logging.info(f"Calculando MST usando {algorithm_type} sobre arrays...")
+            undirected = self.get_csr_graph().undirected_view()
+            if algorithm_type == 'kruskal':
+                src, dst, weights = undirected.edge_arrays()
+                once = src < dst # Cada arista no dirigida una sola vez
+                src, dst, weights = src[once], dst[once], weights[once]
+                idx_src, idx_dst = undirected.indices_of(src), undirected.indices_of(dst)
+                forest = algorithms.minimum_spanning_forest_arrays(undirected.number_of_nodes(), idx_src, idx_dst, weights,
+                                                                   should_stop=should_stop)
+                u, v, w = src[forest], dst[forest], weights[forest]
+            else:
+                forest = algorithms.minimum_spanning_forest_prim(undirected.indptr, undirected.indices, undirected.weights)
+                rows = np.repeat(np.arange(undirected.number_of_nodes()), np.diff(undirected.indptr))
+                u, v = undirected.node_ids[rows[forest]], undirected.node_ids[undirected.indices[forest]]
+                w = undirected.weights[forest]
+            mst = CSRGraph.from_edge_arrays(np.concatenate([u, v]), np.concatenate([v, u]),
+                                            np.concatenate([w, w]), nodes=undirected.node_ids)
+        elif algorithm_type == 'kruskal_dict':
             logging.info("Calculando MST usando Kruskal (manual placeholder)...")
-            self.mst = algorithms.minimum_spanning_tree_kruskal(undirected_graph)
-        # elif algorithm_type == 'prim':
-            # self.mst = algorithms.minimum_spanning_tree_prim(undirected_graph) # Si se implementa Prim
+            mst = algorithms.minimum_spanning_tree_kruskal(self.graph.undirected_view())
         else:
             logging.warning(f"Algoritmo MST '{algorithm_type}' no reconocido o no implementado.")
-            self.mst = CustomGraph() # Devuelve un grafo vacío si el algoritmo no es válido
+            mst = CustomGraph() # Devuelve un grafo vacío si el algoritmo no es válido
         
-        if self.mst and self.mst.number_of_edges() > 0:
-            logging.info(f"MST calculado con {self.mst.number_of_nodes()} nodos y {self.mst.number_of_edges()} aristas.")
-        elif self.mst:
+        if mst and mst.number_of_edges() > 0:
+            logging.info(f"MST calculado con {mst.number_of_nodes()} nodos y {mst.number_of_edges()} aristas.")
+        elif mst:
             logging.info("MST calculado, pero resultó en un grafo vacío (posiblemente el grafo original estaba vacío o desconectado de una manera particular para Kruskal).")
         
-        return self.mst
+        return mst
     
+    def get_community_labels(self, node_ids):
+        """
+        Comunidad de cada nodo de `node_ids` como índice en community_ids (-1 si no tiene), junto con
+        community_ids: array ordenado con los IDs de comunidad. Devuelve (labels, community_ids).
+        La tabla nodo -> comunidad se construye una vez por resultado de detect_communities.
+        """
+        cache = self._community_label_cache
+        if cache is None or cache[0] is not self.communities:
+            community_ids = np.array(sorted(self.communities), dtype=np.int64)
+            sizes = [len(self.communities[c]['nodes']) for c in community_ids.tolist()]
+            members = np.fromiter((node for c in community_ids.tolist() for node in self.communities[c]['nodes']),
+                                  dtype=np.int64, count=sum(sizes))
+            member_labels = np.repeat(np.arange(len(community_ids), dtype=np.int64), sizes)
+            order = np.argsort(members)
+            cache = (self.communities, members[order], member_labels[order], community_ids)
+            self._community_label_cache = cache
+        _, members, member_labels, community_ids = cache
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        labels = np.full(len(node_ids), -1, dtype=np.int64)
+        if len(members):
+            pos = np.minimum(np.searchsorted(members, node_ids), len(members) - 1)
+            found = members[pos] == node_ids
+            labels[found] = member_labels[pos[found]]
+        return labels, community_ids
+
+    def get_map_nodes(self):
+        """
+        Nodos del grafo con ubicación válida como arrays paralelos para los mapas:
+        {'node_ids', 'lat', 'lng', 'labels' (índice de comunidad o -1), 'community_ids'}.
+        """
+        node_ids = self.get_degree_arrays()['node_ids']
+        node_ids = node_ids[self.locations.has_location(node_ids)]
+        labels, community_ids = self.get_community_labels(node_ids)
+        return {'node_ids': node_ids, 'lat': self.locations.lat[node_ids], 'lng': self.locations.lng[node_ids],
+                'labels': labels, 'community_ids': community_ids}
+
+    def get_edge_geometry(self, graph):
+        """
+        Aristas de un grafo simétrico `graph` (p. ej. el MST) con ambos extremos ubicados, como arrays
+        paralelos para dibujarlas: {'src', 'dst', 'src_lat', 'src_lng', 'dst_lat', 'dst_lng'}.
+        Cada arista no dirigida aparece una vez (src < dst).
+        """
+        csr = graph if isinstance(graph, CSRGraph) else CSRGraph.from_custom_graph(graph)
+        src, dst, _ = csr.edge_arrays()
+        keep = (src < dst) & self.locations.has_location(src) & self.locations.has_location(dst)
+        src, dst = src[keep], dst[keep]
+        return {'src': src, 'dst': dst, 'src_lat': self.locations.lat[src], 'src_lng': self.locations.lng[src],
+                'dst_lat': self.locations.lat[dst], 'dst_lng': self.locations.lng[dst]}
+
+    def get_spatial_index(self):
+        """
+        Índice espacial (SpatialIndex) de los nodos del grafo con ubicación válida. Se construye al cargar
+        los datos sobre los mismos arrays que get_map_nodes(), de modo que sus posiciones son intercambiables.
+        """
+        def compute():
+            map_nodes = self.get_map_nodes()
+            index = SpatialIndex(map_nodes['node_ids'], map_nodes['lat'], map_nodes['lng'])
+            logging.info(f"Índice espacial construido con {len(index)} nodos ({len(index.cell_keys)} celdas ocupadas).")
+            return index
+        return self._derived('spatial_index', compute)
+
+    def nodes_in_bbox(self, west, south, east, north):
+        """IDs de los nodos dentro del rectángulo lat/lng [west, east] x [south, north]."""
+        return self.get_spatial_index().bbox(west, south, east, north)
+
+    def nodes_within_radius(self, lat, lng, radius_km):
+        """(IDs, distancias en km) de los nodos a menos de radius_km (haversine) del punto, de más cerca a más lejos."""
+        return self.get_spatial_index().radius(lat, lng, radius_km)
+
+    def nearest_nodes(self, lat, lng, k=1):
+        """(IDs, distancias en km) de los k nodos más cercanos al punto."""
+        return self.get_spatial_index().nearest(lat, lng, k)
+
+    def nearest_node(self, lat, lng):
+        """ID del nodo más cercano al punto (None si no hay nodos con ubicación)."""
+        node_ids, _ = self.nearest_nodes(lat, lng, 1)
+        return int(node_ids[0]) if len(node_ids) else None
+
     def analyze_geographic_distribution(self):
         """Analizar distribución geográfica de nodos"""
         if not self.locations:
             return {}
-            
-        lats = [loc[0] for loc in self.locations.values()]
-        lngs = [loc[1] for loc in self.locations.values()]
-        
-        if not lats or not lngs: # Handle case where all locations might be invalid after filtering
-            return {}
+
+        ids = self.locations.ids()
+        lats = self.locations.lat[ids]
+        lngs = self.locations.lng[ids]
 
         return {
-            'lat_range': (min(lats), max(lats)),
-            'lng_range': (min(lngs), max(lngs)),
-            'lat_center': np.mean(lats),
-            'lng_center': np.mean(lngs)
-        }
\ No newline at end of file
+            'lat_range': (float(lats.min()), float(lats.max())),
+            'lng_range': (float(lngs.min()), float(lngs.max())),
+            'lat_center': float(lats.mean()),
+            'lng_center': float(lngs.mean())
+        }
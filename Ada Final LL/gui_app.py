@@ -4,7 +4,6 @@ from tkinter import ttk, messagebox, filedialog, scrolledtext
 # from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg # Eliminado
 # from matplotlib.figure import Figure # Eliminado
 import numpy as np
-import threading
 import logging
 import folium # Añadido para Folium
 from folium.plugins import MarkerCluster, FastMarkerCluster # Para agrupar marcadores
@@ -12,9 +11,12 @@ from folium.plugins import MarkerCluster, FastMarkerCluster # Para agrupar marca
 import webbrowser # Para abrir HTML en navegador
 import os # Para manejo de archivos
 import tempfile # Para archivos HTML temporales
+import re
 
 from graph_analyzer import GraphAnalyzer 
-from loader import load_location_data, load_user_data 
+from job_scheduler import JobScheduler
+import map_layers
+from map_server import MapServer
 import polars as pl
 
 # Asegúrate de que estas importaciones relativas estén configuradas correctamente
@@ -22,10 +24,15 @@ import polars as pl
 # Si gui_app.py está en la raíz, estas líneas pueden necesitar ser ajustadas.
 # Asumo que la estructura es project/python_app/gui_app.py
 from graph_analyzer import GraphAnalyzer
-from config import APP_TITLE, WINDOW_WIDTH, WINDOW_HEIGHT, LOCATION_FILE, USER_FILE, MAX_NODES_DISPLAY, SAMPLE_SIZE
-from loader import load_location_data, load_user_data # Importar las funciones de carga directamente
+from config import APP_TITLE, WINDOW_WIDTH, WINDOW_HEIGHT, LOCATION_FILE, USER_FILE, MAX_NODES_DISPLAY, SAMPLE_SIZE, GRAPH_BACKEND, EDGE_WEIGHTS, USER_CHUNK_BYTES, SAMPLE_SEED, USE_SNAPSHOT, COMMUNITY_ALGORITHM, COMMUNITY_WORKERS, APPROXIMATE_STATS, STATS_TIME_BUDGET_S, JOB_WORKERS, MAP_RENDER_MODE, MAP_MAX_POINTS, MAP_NODE_ZOOM, MAP_VIEW_MAX_ITEMS, MAP_EDGE_SIMPLIFY_ZOOM
+
+# Nodo en los campos de la búsqueda de caminos: "@lat,lng" (el nodo más cercano a esas coordenadas) o un ID
+NODE_REF_PATTERN = re.compile(r'@\s*(-?\d+(?:\.\d*)?)\s*,\s*(-?\d+(?:\.\d*)?)|([^\s,]+)')
 
 class SocialNetworkApp:
+    STATS_HEADER = "ESTADÍSTICAS DEL GRAFO:\n" # Cabecera del panel de estadísticas
+    MST_STYLE = {'color': 'cyan', 'weight': 1.5, 'opacity': 0.7} # Estilo de las aristas del MST en el mapa
+
     def __init__(self, root, location_file_path, user_file_path, sample_size=None): # CAMBIO: Añade nuevos parámetros
         self.root = root
         self.location_file_path = location_file_path # CAMBIO: Guarda la ruta
@@ -37,13 +44,19 @@ class SocialNetworkApp:
         self.root.configure(bg='#2C3E50')
         
         # Inicializar analizador
-        self.analyzer = GraphAnalyzer()
-        self.current_path = []
+        self.analyzer = GraphAnalyzer(graph_backend=GRAPH_BACKEND, edge_weights=EDGE_WEIGHTS)
+        # Todos los cálculos en segundo plano pasan por el planificador (ids, cancelación, memorización)
+        self.scheduler = JobScheduler(max_workers=JOB_WORKERS, dispatch=lambda fn: self.root.after(0, fn))
+        self.current_paths = [] # Caminos más cortos a dibujar (uno por nodo destino)
         self.selected_nodes = []
         
         # Variables de estado
         self.data_loaded = False
         self.communities_detected = False
+        self._stats_job_id = None # Trabajo de generación de estadísticas en curso
+        self.map_server = None # Servidor local del mapa (modo "server"), se arranca al primer dibujo
+        self._map_base = None # (versión del grafo, GridPyramid) del mapa base publicado en el servidor
+        self._map_layers = {} # {capa: contenido publicado} para enviar solo las capas que cambian
         
         # Configurar logging
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -77,9 +90,9 @@ class SocialNetworkApp:
         self.entry_start_node.pack(side=tk.LEFT, padx=2)
         self.entry_start_node.config(state=tk.DISABLED) # Deshabilitado al inicio
 
-        self.end_node_label = tk.Label(control_frame, text="Nodo Fin:", bg='#34495E', fg='white')
+        self.end_node_label = tk.Label(control_frame, text="Nodo(s) Fin:", bg='#34495E', fg='white')
         self.end_node_label.pack(side=tk.LEFT, padx=2)
-        self.entry_end_node = tk.Entry(control_frame, width=10) 
+        self.entry_end_node = tk.Entry(control_frame, width=16) # Acepta varios IDs separados por comas
         self.entry_end_node.pack(side=tk.LEFT, padx=2)
         self.entry_end_node.config(state=tk.DISABLED) # Deshabilitado al inicio
         
@@ -95,6 +108,12 @@ class SocialNetworkApp:
         self.stats_button.pack(side=tk.LEFT, padx=5, pady=5)
         self.stats_button.config(state=tk.DISABLED) # Deshabilitado al inicio
 
+        self.approximate_stats_var = tk.BooleanVar(value=APPROXIMATE_STATS)
+        self.approximate_stats_check = tk.Checkbutton(control_frame, text=f"Aproximadas ({STATS_TIME_BUDGET_S:g} s)",
+                                                      variable=self.approximate_stats_var, bg='#34495E', fg='white',
+                                                      selectcolor='#2874A6', activebackground='#34495E')
+        self.approximate_stats_check.pack(side=tk.LEFT, padx=2)
+
         self.mst_button = tk.Button(control_frame, text="Calcular MST", command=self.calculate_mst_async, **btn_style)
         self.mst_button.pack(side=tk.LEFT, padx=5, pady=5)
         self.mst_button.config(state=tk.DISABLED) # Deshabilitado al inicio
@@ -153,39 +172,49 @@ class SocialNetworkApp:
         self.find_path_button.config(state=tk.DISABLED)
         self.clear_selection_button.config(state=tk.DISABLED)
         self.stats_button.config(state=tk.DISABLED)
+        self.scheduler.cancel_all() # Los trabajos sobre el grafo anterior ya no sirven
+        self._stats_job_id = None
 
         # Usar os.path.join para construir rutas robustas
         script_dir = os.path.dirname(__file__)
         location_filepath = os.path.join(script_dir, '..', LOCATION_FILE)
         user_filepath = os.path.join(script_dir, '..', USER_FILE)
 
-        threading.Thread(target=self._load_data_task, args=(location_filepath, user_filepath)).start()
-
-    def _load_data_task(self, location_file, user_file):
-        """Tarea de carga de datos para ejecutar en un hilo separado."""
-        try:
-            # Cargar los DataFrames usando las funciones del módulo 'loader'
-            location_df = load_location_data(self.location_file_path) # CAMBIO: Usa la ruta pasada
-            user_df = load_user_data(self.user_file_path)           # CAMBIO: Usa la ruta pasada
-
-            if location_df is None or user_df is None:
-                raise ValueError("Error al cargar uno o ambos archivos de datos.")
+        # La carga no se memoriza: los archivos pueden cambiar (el snapshot binario ya evita re-parsearlos)
+        self.scheduler.submit('load', lambda job: self._load_data_task(job, location_filepath, user_filepath),
+                              memoize=False, on_success=lambda _: self._after_data_loaded_success(),
+                              on_error=self._on_load_data_error,
+                              on_progress=lambda job, _: self.update_status(job.message, "info"))
+
+    def _load_data_task(self, job, location_file, user_file):
+        """Tarea de carga de datos para ejecutar en el planificador."""
+        # Cargar ubicaciones y grafo (desde el snapshot binario si los archivos no cambiaron).
+        # El archivo de usuarios se lee en streaming y el grafo se construye bloque a bloque.
+        self.analyzer.load_from_files(self.location_file_path, self.user_file_path, self.sample_size, # CAMBIO: Usa las rutas pasadas
+                                      seed=SAMPLE_SEED, use_snapshot=USE_SNAPSHOT,
+                                      chunk_bytes=USER_CHUNK_BYTES,
+                                      progress_callback=lambda read, total: self._report_load_progress(job, read, total))
+        print(f"DEBUG: Después de la carga, self.analyzer.locations tiene {len(self.analyzer.locations)} entradas.")
+        self.data_loaded = True
+
+    def _on_load_data_error(self, e):
+        self.data_loaded = False
+        self.update_status(f"Error al cargar datos: {e}", "error")
+        self.load_button.config(state=tk.NORMAL) # Re-habilitar botón de carga
 
-            # Pasar los DataFrames al analizador de grafo
-            self.analyzer.load_data(location_df, user_df, self.sample_size) # CAMBIO: Pasa el tamaño de muestreo
-            print(f"DEBUG: Después de la carga, self.analyzer.locations tiene {len(self.analyzer.locations)} entradas.")
+    def _report_load_progress(self, job, bytes_read, total_bytes):
+        """Informa del avance de la lectura en streaming (llamado desde el hilo de carga)."""
+        percent = 100.0 * bytes_read / total_bytes if total_bytes else 100.0
+        message = f"Cargando conexiones de usuarios... {percent:.0f}% ({bytes_read / 1e6:,.0f} / {total_bytes / 1e6:,.0f} MB)"
+        job.report_progress(percent / 100.0, message)
 
-            self.data_loaded = True
-            # Llamar al método de éxito en el hilo principal
-            self.root.after(0, self._after_data_loaded_success)
-        except Exception as e:
-            logging.error(f"Error al cargar datos: {e}")
-            self.data_loaded = False
-            self.root.after(0, lambda: self.update_status(f"Error al cargar datos: {e}", "error"))
-            self.root.after(0, lambda: self.load_button.config(state=tk.NORMAL)) # Re-habilitar botón de carga
+    def _analysis_version(self):
+        """Versión del grafo a la que se asocian los resultados memorizados: grafo cargado y sus modificaciones."""
+        return (self.analyzer.graph_version, self.analyzer.graph.version)
 
     def _after_data_loaded_success(self):
         """Acciones a realizar después de que los datos se hayan cargado exitosamente."""
+        self.scheduler.invalidate(self._analysis_version()) # Los resultados del grafo anterior ya no sirven
         self.update_status(f"Datos cargados exitosamente. Nodos: {self.analyzer.graph.number_of_nodes()}, Aristas: {self.analyzer.graph.number_of_edges()}", "info")
         self.load_button.config(state=tk.NORMAL) # Habilitar de nuevo por si se quiere cargar más datos
 
@@ -207,39 +236,22 @@ class SocialNetworkApp:
             return [0, 0] # Centro global por defecto
 
         # Usar solo una muestra de ubicaciones para calcular el centro si hay muchas
-        sample_locations = list(self.analyzer.locations.values())
-        if len(sample_locations) > 1000:
-            # Filtrar None o tuplas inválidas antes de np.random.choice
-            valid_locations_for_sampling = [loc for loc in sample_locations if isinstance(loc, tuple) and len(loc) == 2]
-            if not valid_locations_for_sampling: return [0,0]
-            if len(valid_locations_for_sampling) < 1000 : # Si hay menos de 1000 válidas, usarlas todas
-                 sample_locations = valid_locations_for_sampling
-            else:
-                indices = np.random.choice(len(valid_locations_for_sampling), 1000, replace=False)
-                sample_locations = [valid_locations_for_sampling[i] for i in indices]
-
-
-        if not sample_locations: # Si después del filtrado no queda nada
-             return [0,0]
-
-        # Filtrar otra vez por si acaso antes de mean
-        lats = [loc[0] for loc in sample_locations if isinstance(loc, tuple) and len(loc) == 2 and loc[0] is not None]
-        lngs = [loc[1] for loc in sample_locations if isinstance(loc, tuple) and len(loc) == 2 and loc[1] is not None]
+        location_ids = self.analyzer.locations.ids()
+        if len(location_ids) > 1000:
+            location_ids = np.random.choice(location_ids, 1000, replace=False)
 
-        if not lats or not lngs: return [0,0]
-
-        avg_lat = np.mean(lats)
-        avg_lng = np.mean(lngs)
+        avg_lat = self.analyzer.locations.lat[location_ids].mean()
+        avg_lng = self.analyzer.locations.lng[location_ids].mean()
         
         if np.isnan(avg_lat) or np.isnan(avg_lng): 
             return [0,0]
             
-        return [avg_lat, avg_lng]
+        return [float(avg_lat), float(avg_lng)]
 
-    def _render_folium_map_to_html_widget(self, path_nodes=None, highlight_communities=None, mst_graph=None):
+    def _render_folium_map_to_html_widget(self, paths=None, highlight_communities=None, mst_graph=None):
         """
         Crea un mapa Folium y lo renderiza en el widget ScrolledHTMLText.
-        path_nodes: una lista de nodos para resaltar como un camino.
+        paths: una lista de caminos (listas de nodos) para resaltar.
         highlight_communities: un dict de comunidades {comm_id: data} para colorear nodos.
         mst_graph: un CustomGraph que representa el MST.
         """
@@ -248,81 +260,103 @@ class SocialNetworkApp:
             # self.map_html_view.set_html("<p>Cargue datos para ver el mapa.</p>") # Eliminado
             return
 
+        if MAP_RENDER_MODE == 'server':
+            self._publish_server_map(paths, highlight_communities, mst_graph)
+            return
+
         map_center = self._get_folium_map_center()
         # Usar tiles de OpenStreetMap por defecto, o CartoDB positron para un look más limpio
         folium_map = folium.Map(location=map_center, zoom_start=2, tiles="CartoDB positron")
 
-        node_positions = {
-            node_id: loc for node_id, loc in self.analyzer.locations.items() 
-            if node_id in self.analyzer.graph.get_nodes() # Solo nodos que están en el grafo
-        }
+        path_nodes = set().union(*paths) if paths else set()
+        color_by_community = bool(highlight_communities) and self.communities_detected
+
+        if MAP_RENDER_MODE == 'fast':
+            # Todos los nodos en un único array de JS (FastMarkerCluster): tamaño acotado por MAP_MAX_POINTS
+            node_positions = self.analyzer.locations # {node_id: (lat, lng)} sin materializar
+            self._add_fast_node_layer(folium_map, color_by_community)
+            for node_id in path_nodes: # Los nodos de los caminos se resaltan aparte (son pocos)
+                if node_id in node_positions:
+                    lat, lng = node_positions[node_id]
+                    folium.CircleMarker(location=[lat, lng], radius=8, color='lime', fill=True, fill_color='lime',
+                                        fill_opacity=0.8,
+                                        popup=folium.Popup(f"Nodo ID: {node_id}<br>Lat: {lat:.8f}, Lng: {lng:.8f}", max_width=200)
+                                        ).add_to(folium_map)
+        else:
+            node_positions = {
+                node_id: loc for node_id, loc in self.analyzer.locations.items() 
+                if node_id in self.analyzer.graph.get_nodes() # Solo nodos que están en el grafo
+            }
+
 
-        # Limitar nodos para visualización
-        nodes_to_display_ids = list(node_positions.keys())
-        if MAX_NODES_DISPLAY and len(nodes_to_display_ids) > MAX_NODES_DISPLAY:
-            nodes_to_display_ids = np.random.choice(nodes_to_display_ids, MAX_NODES_DISPLAY, replace=False)
+            # Limitar nodos para visualización
+            nodes_to_display_ids = list(node_positions.keys())
+            if MAX_NODES_DISPLAY and len(nodes_to_display_ids) > MAX_NODES_DISPLAY:
+                nodes_to_display_ids = np.random.choice(nodes_to_display_ids, MAX_NODES_DISPLAY, replace=False)
         
-        # Crear un FeatureGroup para los marcadores para poder usar MarkerCluster
-        marker_group = folium.FeatureGroup(name="Nodos")
-        # Para mejor rendimiento con muchos marcadores, usar FastMarkerCluster
-        # fast_marker_cluster = FastMarkerCluster(data=[], name="Nodos Agrupados").add_to(folium_map)
-
-
-        # Colores para comunidades (simplificado, se puede mejorar)
-        community_colors = {}
-        if highlight_communities and self.communities_detected:
-            unique_comm_ids = sorted(list(highlight_communities.keys()))
-            # Usar un conjunto simple de colores o generar más si es necesario
-            available_colors = ['red', 'blue', 'green', 'purple', 'orange', 'darkred', 
-                                'lightblue', 'darkgreen', 'cadetblue', 'pink', 'lightgray', 'black']
-            for i, comm_id in enumerate(unique_comm_ids):
-                community_colors[comm_id] = available_colors[i % len(available_colors)]
-
-        for node_id in nodes_to_display_ids:
-            if node_id in node_positions:
-                lat, lng = node_positions[node_id]
+            # Crear un FeatureGroup para los marcadores para poder usar MarkerCluster
+            marker_group = folium.FeatureGroup(name="Nodos")
+            # Para mejor rendimiento con muchos marcadores, usar FastMarkerCluster
+            # fast_marker_cluster = FastMarkerCluster(data=[], name="Nodos Agrupados").add_to(folium_map)
+
+
+            # Colores para comunidades (simplificado, se puede mejorar)
+            community_colors = {}
+            if highlight_communities and self.communities_detected:
+                unique_comm_ids = sorted(list(highlight_communities.keys()))
+                # Usar un conjunto simple de colores o generar más si es necesario
+                available_colors = ['red', 'blue', 'green', 'purple', 'orange', 'darkred', 
+                                    'lightblue', 'darkgreen', 'cadetblue', 'pink', 'lightgray', 'black']
+                for i, comm_id in enumerate(unique_comm_ids):
+                    community_colors[comm_id] = available_colors[i % len(available_colors)]
+
+            for node_id in nodes_to_display_ids:
+                if node_id in node_positions:
+                    lat, lng = node_positions[node_id]
                 
-                # Determinar color y pop-up
-                color = 'blue' # Color por defecto
-                popup_text = f"Nodo ID: {node_id}<br>Lat: {lat:.8f}, Lng: {lng:.8f}"
-
-                if highlight_communities and self.communities_detected:
-                    for comm_id, comm_data in highlight_communities.items():
-                        if node_id in comm_data['nodes']:
-                            color = community_colors.get(comm_id, 'gray')
-                            popup_text += f"<br>Comunidad: {comm_id}"
-                            break
+                    # Determinar color y pop-up
+                    color = 'blue' # Color por defecto
+                    popup_text = f"Nodo ID: {node_id}<br>Lat: {lat:.8f}, Lng: {lng:.8f}"
+
+                    if highlight_communities and self.communities_detected:
+                        for comm_id, comm_data in highlight_communities.items():
+                            if node_id in comm_data['nodes']:
+                                color = community_colors.get(comm_id, 'gray')
+                                popup_text += f"<br>Comunidad: {comm_id}"
+                                break
                 
-                if path_nodes and node_id in path_nodes:
-                    color = 'lime' # Nodos en el camino resaltados
-                    # Podríamos usar un icono diferente o radio más grande para nodos del camino
-                    folium.CircleMarker(
-                        location=[lat, lng],
-                        radius=8,
-                        color=color,
-                        fill=True,
-                        fill_color=color,
-                        fill_opacity=0.8,
-                        popup=folium.Popup(popup_text, max_width=200)
-                    ).add_to(marker_group)
-                else:
-                    folium.CircleMarker(
-                        location=[lat, lng],
-                        radius=3, # Radio más pequeño para nodos normales
-                        color=color,
-                        fill=True,
-                        fill_color=color,
-                        fill_opacity=0.6,
-                        popup=folium.Popup(popup_text, max_width=200)
-                    ).add_to(marker_group)
+                    if path_nodes and node_id in path_nodes:
+                        color = 'lime' # Nodos en el camino resaltados
+                        # Podríamos usar un icono diferente o radio más grande para nodos del camino
+                        folium.CircleMarker(
+                            location=[lat, lng],
+                            radius=8,
+                            color=color,
+                            fill=True,
+                            fill_color=color,
+                            fill_opacity=0.8,
+                            popup=folium.Popup(popup_text, max_width=200)
+                        ).add_to(marker_group)
+                    else:
+                        folium.CircleMarker(
+                            location=[lat, lng],
+                            radius=3, # Radio más pequeño para nodos normales
+                            color=color,
+                            fill=True,
+                            fill_color=color,
+                            fill_opacity=0.6,
+                            popup=folium.Popup(popup_text, max_width=200)
+                        ).add_to(marker_group)
         
-        marker_group.add_to(folium_map)
-        # fast_marker_cluster.add_to(folium_map) # Si se usa FastMarkerCluster
+            marker_group.add_to(folium_map)
+            # fast_marker_cluster.add_to(folium_map) # Si se usa FastMarkerCluster
 
-        # Dibujar camino más corto
-        if path_nodes and len(path_nodes) > 1:
+        # Dibujar caminos más cortos
+        for path in paths or []:
+            if len(path) < 2:
+                continue
             path_coords = []
-            for node_id in path_nodes:
+            for node_id in path:
                 if node_id in node_positions:
                     path_coords.append(node_positions[node_id])
             if path_coords:
@@ -330,14 +364,10 @@ class SocialNetworkApp:
         
         # Dibujar aristas del MST
         if mst_graph:
+            # Todas las aristas en una sola geometría MultiLineString (un único trazado en lugar de uno por arista)
             mst_edges_group = folium.FeatureGroup(name="MST Edges")
-            for u, v in mst_graph.get_edges(): # Asumiendo que get_edges() devuelve las aristas del MST
-                if u in node_positions and v in node_positions:
-                    start_pos = node_positions[u]
-                    end_pos = node_positions[v]
-                    # Dibujar solo una dirección para evitar duplicados visuales si to_undirected duplicó
-                    if u < v: # Simple heurística para dibujar cada arista no dirigida una vez
-                        folium.PolyLine([start_pos, end_pos], color="cyan", weight=1.5, opacity=0.7).add_to(mst_edges_group)
+            folium.GeoJson(map_layers.feature_collection(self._mst_features(mst_graph)),
+                           style_function=lambda feature: feature['properties']['style']).add_to(mst_edges_group)
             mst_edges_group.add_to(folium_map)
             folium.LayerControl().add_to(folium_map) # Añadir control de capas si tenemos MST
 
@@ -370,13 +400,159 @@ class SocialNetworkApp:
         #            logging.warning(f"No se pudo eliminar el archivo temporal del mapa: {e}")
 
 
+    def _add_fast_node_layer(self, folium_map, color_by_community):
+        """
+        Capa de nodos escalable: las coordenadas van en un único array compacto [lat, lng, comunidad, id]
+        que dibuja FastMarkerCluster. El color sale de una tabla pequeña por índice de comunidad y el
+        popup se construye en el navegador al hacer clic. Por encima de MAP_MAX_POINTS nodos se agregan
+        en una rejilla, de modo que el HTML no crece linealmente con el número de nodos.
+        """
+        map_nodes = self.analyzer.get_map_nodes()
+        if color_by_community:
+            labels, community_ids = map_nodes['labels'], map_nodes['community_ids']
+        else:
+            labels, community_ids = np.full(len(map_nodes['node_ids']), -1), []
+        rows = map_layers.compact_point_rows(map_nodes['node_ids'], map_nodes['lat'], map_nodes['lng'], labels,
+                                             max_points=MAP_MAX_POINTS)
+        logging.info(f"Capa de nodos: {len(rows)} puntos para {len(map_nodes['node_ids'])} nodos")
+        folium_map.get_root().html.add_child(folium.Element(map_layers.lookup_tables_script(community_ids)))
+        FastMarkerCluster(data=rows, callback=map_layers.fast_marker_callback_js(), name="Nodos").add_to(folium_map)
+
+    def _publish_server_map(self, paths=None, highlight_communities=None, mst_graph=None):
+        """
+        Modo "server": el mapa base (página y GridPyramid) se construye una vez por carga de datos en el
+        planificador; después solo se envían al servidor las capas que cambian (caminos, MST, colores de
+        las comunidades), sin regenerar el mapa ni abrir otra pestaña si ya hay una abierta.
+        """
+        base_key = self._analysis_version()
+        if self._map_base is None or self._map_base[0] != base_key:
+            self.scheduler.submit(('map_base',), self._build_map_pyramid_task, version=base_key, memoize=False,
+                                  on_success=lambda pyramid: self._after_map_base_built(base_key, pyramid),
+                                  on_error=lambda e: self.update_status(f"Error al generar el mapa: {e}", "error"))
+            return
+        self._sync_map_layers(paths, highlight_communities, mst_graph)
+
+    def _build_map_pyramid_task(self, job):
+        """Agregado de nodos por zoom del mapa base (sin comunidades: se colorean después con _map_labelling_task)."""
+        map_nodes = self.analyzer.get_map_nodes()
+        return map_layers.GridPyramid(map_nodes['node_ids'], map_nodes['lat'], map_nodes['lng'],
+                                      np.full(len(map_nodes['node_ids']), -1),
+                                      node_zoom=MAP_NODE_ZOOM, max_items=MAP_VIEW_MAX_ITEMS,
+                                      spatial_index=self.analyzer.get_spatial_index())
+
+    def _after_map_base_built(self, base_key, pyramid):
+        """Publica el mapa base: esqueleto de Folium (Leaflet) más el JS que pide al servidor la vista y los cambios."""
+        folium_map = folium.Map(location=self._get_folium_map_center(), zoom_start=2, tiles="CartoDB positron",
+                                prefer_canvas=True)
+        folium_map.get_root().html.add_child(folium.Element(map_layers.lookup_tables_script([])))
+        folium_map.get_root().script.add_child(folium.Element(map_layers.viewport_loader_js(folium_map.get_name())))
+        if self.map_server is None:
+            self.map_server = MapServer().start()
+        self.map_server.publish_base(folium_map.get_root().render(), pyramid, map_layers.lookup_tables([]))
+        self._map_base = (base_key, pyramid)
+        self._map_layers = {} # Las capas del mapa base anterior ya no están publicadas
+        self._update_map_visualization() # Publicar las capas del estado actual
+
+    def _sync_map_layers(self, paths, highlight_communities, mst_graph):
+        """Envía al servidor solo las capas cuyo contenido cambió desde la última publicación."""
+        communities = highlight_communities if highlight_communities and self.communities_detected else None
+        pyramid = self._map_base[1]
+        if self._layer_changed('communities', communities):
+            # Las celdas se reetiquetan en el planificador; el servidor sustituye el etiquetado de una vez.
+            # La clave incluye el objeto de comunidades (vivo mientras el trabajo lo retiene): una petición
+            # con otras comunidades no se fusiona con un trabajo en curso que devolvería el etiquetado anterior
+            self.scheduler.submit(('map_labels', id(communities)), lambda job: self._map_labelling_task(pyramid, communities),
+                                  version=self._analysis_version(), memoize=False,
+                                  on_success=lambda result: self._after_map_labelling(pyramid, communities, result),
+                                  on_error=lambda e: self.update_status(f"Error al colorear el mapa: {e}", "error"))
+        if self._layer_changed('paths', tuple(tuple(path) for path in paths) if paths else None):
+            self.map_server.set_overlay('paths', self._paths_overlay(paths) if paths else None)
+        if self._layer_changed('mst', mst_graph):
+            if mst_graph:
+                # La geometría (y su simplificación por zoom) se prepara en el planificador, no en el hilo de Tk
+                self.scheduler.submit(('map_mst', id(mst_graph)), lambda job: self._mst_overlay(mst_graph),
+                                      version=self._analysis_version(), memoize=False,
+                                      on_success=lambda overlay: self._after_mst_overlay(pyramid, mst_graph, overlay),
+                                      on_error=lambda e: self.update_status(f"Error al dibujar el MST: {e}", "error"))
+            else:
+                self.map_server.set_overlay('mst', None)
+        if not self.map_server.has_viewer():
+            webbrowser.open(self.map_server.url, new=0)
+
+    def _map_labelling_task(self, pyramid, communities):
+        """
+        Etiquetado del mapa base para `communities` (None: sin colores) y sus tablas de colores, calculados
+        sin tocar la pirámide publicada. Devuelve (etiquetado, tablas).
+        """
+        map_nodes = self.analyzer.get_map_nodes()
+        if communities is None:
+            labels, community_ids = np.full(len(map_nodes['node_ids']), -1), []
+        else:
+            labels, community_ids = map_nodes['labels'], map_nodes['community_ids']
+        return pyramid.compute_labelling(labels, community_ids), map_layers.lookup_tables(community_ids)
+
+    def _after_map_labelling(self, pyramid, communities, result):
+        """Publica el etiquetado si sigue siendo el de las comunidades pedidas por última vez."""
+        if self._map_layers.get('communities') is not communities:
+            return # Llegó tarde: ya se pidió otro etiquetado (o se publicó otro mapa base)
+        labelling, tables = result
+        self.map_server.set_labelling(pyramid, labelling, tables)
+
+    def _layer_changed(self, name, content):
+        """Registra el contenido publicado de una capa y devuelve si cambió (el mismo objeto o uno igual no cuenta)."""
+        missing = object()
+        previous = self._map_layers.get(name, missing)
+        self._map_layers[name] = content
+        return previous is missing or not (previous is content or previous == content)
+
+    def _paths_overlay(self, paths):
+        """Caminos y sus nodos como GeoJSON."""
+        positions = self.analyzer.locations
+        features = []
+        for path in paths:
+            coords = [positions[node_id] for node_id in path if node_id in positions]
+            if len(path) >= 2 and coords:
+                features.append(map_layers.line_feature(coords, {'color': 'red', 'weight': 2.5, 'opacity': 1}))
+        for node_id in set().union(*paths):
+            if node_id in positions:
+                lat, lng = positions[node_id]
+                features.append(map_layers.point_feature(
+                    lat, lng, {'radius': 8, 'color': 'lime', 'fillColor': 'lime', 'fillOpacity': 0.8},
+                    popup=f"Nodo ID: {node_id}<br>Lat: {lat:.8f}, Lng: {lng:.8f}"))
+        return map_layers.feature_collection(features)
+
+    def _mst_overlay(self, mst_graph):
+        """
+        Aristas del MST para el servidor: (GeoJSON con las versiones simplificadas de los zooms bajos,
+        EdgeSetIndex con el detalle completo, que la página pide por vista desde MAP_EDGE_SIMPLIFY_ZOOM).
+        """
+        edges = self.analyzer.get_edge_geometry(mst_graph)
+        columns = (edges['src_lat'], edges['src_lng'], edges['dst_lat'], edges['dst_lng'])
+        features = map_layers.edge_set_features(*columns, self.MST_STYLE, simplify_below_zoom=MAP_EDGE_SIMPLIFY_ZOOM,
+                                                full_detail=False)
+        segments = map_layers.EdgeSetIndex(*columns, self.MST_STYLE, min_zoom=MAP_EDGE_SIMPLIFY_ZOOM,
+                                           max_segments=MAP_VIEW_MAX_ITEMS)
+        return map_layers.feature_collection(features), segments
+
+    def _after_mst_overlay(self, pyramid, mst_graph, overlay):
+        """Publica la capa del MST si sigue siendo la pedida por última vez sobre el mapa base publicado."""
+        if self._map_layers.get('mst') is not mst_graph or self._map_base is None or self._map_base[1] is not pyramid:
+            return # Llegó tarde: ya se pidió otra capa (o se publicó otro mapa base)
+        geojson, segments = overlay
+        self.map_server.set_overlay('mst', geojson, segments)
+
+    def _mst_features(self, mst_graph, simplify_below_zoom=0):
+        edges = self.analyzer.get_edge_geometry(mst_graph)
+        return map_layers.edge_set_features(edges['src_lat'], edges['src_lng'], edges['dst_lat'], edges['dst_lng'],
+                                            self.MST_STYLE, simplify_below_zoom=simplify_below_zoom)
+
     def _update_map_visualization(self):
         """Actualiza la visualización del mapa Folium (abriendo en navegador)."""
-        path_to_draw = self.current_path if self.current_path else None
+        paths_to_draw = self.current_paths if self.current_paths else None
         communities_to_draw = self.analyzer.communities if self.communities_detected else None
         mst_to_draw = self.analyzer.mst # Obtener el MST calculado desde el analizador
         self._render_folium_map_to_html_widget(
-            path_nodes=path_to_draw, 
+            paths=paths_to_draw, 
             highlight_communities=communities_to_draw,
             mst_graph=mst_to_draw
         )
@@ -389,22 +565,33 @@ class SocialNetworkApp:
         
         self.update_status("Detectando comunidades, esto puede tardar...", "info")
         self.communities_button.config(state=tk.DISABLED)
-        threading.Thread(target=self._detect_communities_task).start()
+        version = self._analysis_version()
+        self.scheduler.submit(('communities', COMMUNITY_ALGORITHM), self._detect_communities_task,
+                              version=version,
+                              on_success=lambda communities: self._after_communities_detected_success(communities, version),
+                              on_error=self._on_communities_error)
 
-    def _detect_communities_task(self):
-        """Tarea de detección de comunidades para ejecutar en un hilo separado."""
-        try:
-            self.analyzer.detect_communities()
-            self.communities_detected = True
-            self.root.after(0, self._after_communities_detected_success)
-        except Exception as e:
-            logging.error(f"Error al detectar comunidades: {e}")
-            self.communities_detected = False
-            self.root.after(0, lambda: self.update_status(f"Error al detectar comunidades: {e}", "error"))
-            self.root.after(0, lambda: self.communities_button.config(state=tk.NORMAL))
+    def _detect_communities_task(self, job):
+        """
+        Tarea de detección de comunidades para ejecutar en el planificador: solo calcula y devuelve las
+        comunidades (el analizador se actualiza en el hilo de la GUI). Se interrumpe si se cancela el trabajo.
+        """
+        return self.analyzer.compute_communities(algorithm=COMMUNITY_ALGORITHM, n_workers=COMMUNITY_WORKERS,
+                                                 should_stop=job.is_cancelled)
+
+    def _on_communities_error(self, e):
+        self.communities_detected = False
+        self.update_status(f"Error al detectar comunidades: {e}", "error")
+        self.communities_button.config(state=tk.NORMAL)
 
-    def _after_communities_detected_success(self):
+    def _after_communities_detected_success(self, communities, version):
         """Acciones a realizar después de que las comunidades se hayan detectado exitosamente."""
+        if version != self._analysis_version(): # Calculadas sobre un grafo que ya no está cargado
+            logging.info("Comunidades descartadas: el grafo cambió mientras se detectaban.")
+            self.communities_button.config(state=tk.NORMAL if self.data_loaded else tk.DISABLED)
+            return
+        self.analyzer.communities = communities # También si el resultado viene memorizado
+        self.communities_detected = True
         self.update_status(f"Comunidades detectadas: {len(self.analyzer.communities)}", "info")
         self.communities_button.config(state=tk.NORMAL)
         self._update_map_visualization()
@@ -417,143 +604,262 @@ class SocialNetworkApp:
             return
 
         try:
-            start_node = int(self.entry_start_node.get())
-            end_node = int(self.entry_end_node.get())
+            start_nodes = self._parse_node_refs(self.entry_start_node.get())
+            # El campo de destino acepta uno o varios nodos separados por comas o espacios
+            end_nodes = self._parse_node_refs(self.entry_end_node.get())
+            if len(start_nodes) != 1:
+                raise ValueError("se necesita exactamente un nodo de inicio")
+            start_node = start_nodes[0]
         except ValueError:
-            self.update_status("Por favor, ingrese IDs de nodo válidos.", "warning")
+            self.update_status("Por favor, ingrese IDs de nodo válidos o coordenadas @lat,lng.", "warning")
+            return
+        if not end_nodes:
+            self.update_status("Por favor, ingrese al menos un nodo de destino.", "warning")
             return
         
         # Comprobar si los nodos existen usando get_nodes() de CustomGraph
         current_graph_nodes = self.analyzer.graph.get_nodes()
-        if start_node not in current_graph_nodes or end_node not in current_graph_nodes:
-            self.update_status("Uno o ambos nodos no existen en el grafo.", "warning")
+        if start_node not in current_graph_nodes or any(end not in current_graph_nodes for end in end_nodes):
+            self.update_status("Uno o más nodos no existen en el grafo.", "warning")
             return
 
-        self.update_status(f"Buscando camino de {start_node} a {end_node}...", "info")
+        self.update_status(f"Buscando camino de {start_node} a {', '.join(map(str, end_nodes))}...", "info")
         self.find_path_button.config(state=tk.DISABLED)
-        threading.Thread(target=self._find_path_task, args=(start_node, end_node)).start()
+        self.scheduler.submit(('paths', start_node, tuple(end_nodes)),
+                              lambda job: self._find_path_task(job, start_node, end_nodes),
+                              version=self._analysis_version(),
+                              on_success=lambda paths: self._after_find_path_success(paths, start_node),
+                              on_error=self._on_find_path_error)
 
-    def _find_path_task(self, start_node, end_node):
-        """Tarea de búsqueda de camino para ejecutar en un hilo separado."""
-        try:
-            path = self.analyzer.find_shortest_path(start_node, end_node)
-            self.root.after(0, lambda: self._after_find_path_success(path, start_node, end_node))
-        except Exception as e:
-            logging.error(f"Error al encontrar el camino: {e}")
-            self.root.after(0, lambda: self.update_status(f"Error al encontrar el camino: {e}", "error"))
-            self.root.after(0, lambda: self.find_path_button.config(state=tk.NORMAL))
-
-    def _after_find_path_success(self, path, start_node, end_node):
-        """Acciones a realizar después de que el camino se haya encontrado exitosamente."""
-        if path:
-            self.current_path = path
-            self.update_status(f"Camino encontrado: {len(path)-1} aristas. Distancia: {self.analyzer.get_path_distance(path):.2f}", "info")
+    def _parse_node_refs(self, text):
+        """
+        Nodos de un campo de la búsqueda de caminos: IDs separados por comas o espacios, o coordenadas
+        "@lat,lng" que se resuelven al nodo más cercano con el índice espacial. Lanza ValueError si no son válidos.
+        """
+        nodes = []
+        for lat, lng, node_id in NODE_REF_PATTERN.findall(text):
+            if node_id:
+                nodes.append(int(node_id))
+                continue
+            nearest = self.analyzer.nearest_node(float(lat), float(lng))
+            if nearest is None:
+                raise ValueError("no hay nodos con ubicación")
+            logging.info(f"Coordenadas ({lat}, {lng}) -> nodo más cercano {nearest}")
+            nodes.append(nearest)
+        return nodes
+
+    def _find_path_task(self, job, start_node, end_nodes):
+        """Tarea de búsqueda de camino para ejecutar en el planificador; devuelve {destino: camino}."""
+        if len(end_nodes) == 1:
+            return {end_nodes[0]: self.analyzer.find_shortest_path(start_node, end_nodes[0])}
+        # Un solo BFS desde el origen sirve a todos los destinos
+        return self.analyzer.find_shortest_paths(start_node, end_nodes)
+
+    def _on_find_path_error(self, e):
+        self.update_status(f"Error al encontrar el camino: {e}", "error")
+        self.find_path_button.config(state=tk.NORMAL)
+
+    def _after_find_path_success(self, paths, start_node):
+        """Acciones a realizar después de que los caminos se hayan encontrado exitosamente."""
+        found = {end: path for end, path in paths.items() if path}
+        self.current_paths = list(found.values())
+        if len(paths) == 1:
+            end_node, path = next(iter(paths.items()))
+            if path:
+                self.update_status(f"Camino encontrado: {len(path)-1} aristas. Distancia: {self.analyzer.get_path_distance(path):.2f}", "info")
+            else:
+                self.update_status(f"No se encontró camino entre {start_node} y {end_node}.", "warning")
+        elif found:
+            distances = [self.analyzer.get_path_distance(path) for path in found.values()]
+            self.update_status(f"Caminos encontrados: {len(found)} de {len(paths)} destinos. "
+                               f"Distancia media: {np.mean(distances):.2f}", "info")
         else:
-            self.current_path = []
-            self.update_status(f"No se encontró camino entre {start_node} y {end_node}.", "warning")
+            self.update_status(f"No se encontró camino desde {start_node} a ninguno de los destinos.", "warning")
         
         self.find_path_button.config(state=tk.NORMAL)
         self._update_map_visualization()
 
     def generate_analysis_async(self):
-        """Generar análisis y estadísticas de forma asíncrona."""
+        """
+        Generar análisis y estadísticas de forma asíncrona: cada métrica se calcula en el planificador y se
+        añade al panel en cuanto termina. Una nueva ejecución (o una nueva carga) cancela la anterior.
+        """
         if not self.data_loaded:
             self.update_status("Por favor, cargue los datos primero para generar estadísticas.", "warning")
             return
-        
+
+        self._cancel_stats_run()
         self.update_status("Generando estadísticas, por favor espere...", "info")
         self.stats_button.config(state=tk.DISABLED)
-        threading.Thread(target=self._generate_analysis_task).start()
+        self._set_stats_text(self.STATS_HEADER)
+        approximate = self.approximate_stats_var.get()
+        sections = self._stats_sections(approximate)
+        self._stats_job_id = self.scheduler.submit(
+            ('stats', approximate, self.communities_detected),
+            lambda job: self._generate_analysis_task(job, sections),
+            version=self._analysis_version(),
+            on_success=self._after_stats_finished, on_error=self._on_stats_error,
+            on_progress=self._on_stats_progress)
+
+    def _cancel_stats_run(self):
+        """Cancela la generación de estadísticas en curso (si la hay); sus resultados pendientes se descartan."""
+        if self._stats_job_id is not None:
+            self.scheduler.cancel(self._stats_job_id)
+            self._stats_job_id = None
+
+    def _generate_analysis_task(self, job, sections):
+        """
+        Tarea de generación de análisis para ejecutar en el planificador. Calcula las secciones en orden y
+        publica cada texto como avance; entre sección y sección comprueba si el trabajo fue cancelado.
+        Devuelve el texto completo (que se memoriza para la versión actual del grafo).
+        """
+        text = ""
+        for i, (name, format_section) in enumerate(sections):
+            if job.is_cancelled():
+                return None
+            job.report_progress(i / len(sections), f"Generando estadísticas: {name}...")
+            section_text = format_section()
+            text += section_text
+            job.report_progress((i + 1) / len(sections), data=section_text)
+        return text
+
+    def _on_stats_progress(self, job, section_text):
+        if section_text is None:
+            self.update_status(job.message, "info")
+        else:
+            self._append_stats_text(section_text)
 
-    def _generate_analysis_task(self):
-        """Tarea de generación de análisis para ejecutar en un hilo separado."""
-        try:
-            # Aquí puedes llamar a métodos del analizador que realicen cálculos pesados
-            # Luego, el resultado se pasa al hilo principal para actualizar la UI
-            self.root.after(0, self._update_stats_display_from_analysis)
-        except Exception as e:
-            logging.error(f"Error al generar análisis: {e}")
-            self.root.after(0, lambda: self.update_status(f"Error al generar análisis: {e}", "error"))
-            self.root.after(0, lambda: self.stats_button.config(state=tk.NORMAL))
-
-    def _update_stats_display_from_analysis(self):
-        """Actualiza el widget de texto de estadísticas con los resultados del análisis."""
-        text_widget = self.stats_text
-        text_widget.config(state=tk.NORMAL)
-        text_widget.delete(1.0, tk.END)
-
-        detailed_stats = "ESTADÍSTICAS DEL GRAFO:\n"
-        detailed_stats += f"• Nodos totales: {self.analyzer.graph.number_of_nodes():,}\n"
-        detailed_stats += f"• Aristas totales: {self.analyzer.graph.number_of_edges():,}\n"
-        
-        # Calcular densidad y otros solo si hay nodos
+    def _on_stats_error(self, e):
+        self._stats_job_id = None
+        self.update_status(f"Error al generar análisis: {e}", "error")
+        self.stats_button.config(state=tk.NORMAL)
+
+    def _after_stats_finished(self, text):
+        # Con un resultado memorizado no hubo avances: el texto completo se pinta de una vez
+        self._stats_job_id = None
+        self._set_stats_text(self.STATS_HEADER + text)
+        self.update_status("Estadísticas generadas.", "info")
+        self.stats_button.config(state=tk.NORMAL) # Re-habilitar botón de estadísticas
+
+    def _set_stats_text(self, text):
+        """Sustituye el contenido del panel de estadísticas (solo desde el hilo principal)."""
+        self.stats_text.config(state=tk.NORMAL)
+        self.stats_text.delete(1.0, tk.END)
+        self.stats_text.insert(tk.END, text)
+        self.stats_text.config(state=tk.DISABLED)
+
+    def _append_stats_text(self, text):
+        """Añade una sección al panel de estadísticas."""
+        if not text:
+            return
+        self.stats_text.config(state=tk.NORMAL)
+        self.stats_text.insert(tk.END, text)
+        self.stats_text.config(state=tk.DISABLED)
+        self.stats_text.see(tk.END)
+
+    def _stats_sections(self, approximate=False):
+        """
+        Secciones del panel de estadísticas en orden de presentación: lista de (nombre, función) donde cada
+        función calcula sus métricas y devuelve el texto. Se ejecutan en el hilo de trabajo: no tocan Tk.
+        Las rápidas van primero para que el panel muestre algo cuanto antes.
+        """
+        sections = [("resumen", self._format_overview_stats)]
         if self.analyzer.graph.number_of_nodes() > 0:
-            density = self.analyzer.get_density()
-            detailed_stats += f"• Densidad de la red: {density:.6f}\n"
-
-            # Componentes conectados (solo para grafos no dirigidos)
-            num_components = self.analyzer.get_number_connected_components()
-            detailed_stats += f"• Componentes conectados: {num_components}\n"
-            if num_components > 1 and self.analyzer.graph.number_of_nodes() > 0 : # Asegurar que haya nodos antes de pedir el más grande
-                largest_cc_size = self.analyzer.get_largest_connected_component_size()
-                detailed_stats += f"• Tamaño del componente más grande: {largest_cc_size:,}\n"
-            
-            # Coeficiente de clustering promedio (solo para grafos no dirigidos)
-            avg_clustering = self.analyzer.get_average_clustering_coefficient()
-            detailed_stats += f"• Coeficiente de clustering promedio: {avg_clustering:.4f}\n"
-            
-            # Grado promedio
-            num_nodes = self.analyzer.graph.number_of_nodes()
-            if num_nodes > 0:
-                total_degree = 0
-                for node in self.analyzer.graph.get_nodes():
-                    total_degree += self.analyzer.graph.degree(node) # Usando CustomGraph.degree()
-                avg_degree = total_degree / num_nodes
-                detailed_stats += f"• Grado promedio: {avg_degree:.2f}\n"
+            sections.append(("grados", self._format_degree_stats))
+            if approximate:
+                sections.append(("estimaciones por muestreo", self._format_approximate_stats))
             else:
-                detailed_stats += f"• Grado promedio: N/A\n"
+                sections.append(("componentes conectados", self._format_component_stats))
+                sections.append(("coeficiente de clustering", self._format_clustering_stats))
+        sections.append(("distribución geográfica", self._format_geographic_stats))
+        sections.append(("comunidades", self._format_community_stats))
+        sections.append(("nodos más conectados", self._format_top_nodes_stats))
+        return sections
+
+    def _format_overview_stats(self):
+        text = f"• Nodos totales: {self.analyzer.graph.number_of_nodes():,}\n"
+        text += f"• Aristas totales: {self.analyzer.graph.number_of_edges():,}\n"
+        if self.analyzer.graph.number_of_nodes() > 0:
+            text += f"• Densidad de la red: {self.analyzer.get_density():.6f}\n"
         else:
-            detailed_stats += "No hay nodos para calcular métricas avanzadas.\n"
-
+            text += "No hay nodos para calcular métricas avanzadas.\n"
+        return text
+
+    def _format_degree_stats(self):
+        # Grado promedio y máximo, leídos de los arrays de grado del analizador
+        degree_histogram = self.analyzer.get_degree_histogram()
+        text = f"• Grado promedio: {self.analyzer.get_average_degree():.2f}\n"
+        text += f"• Grado máximo: {len(degree_histogram) - 1}\n"
+        text += f"• Nodos aislados (grado 0): {int(degree_histogram[0]):,}\n"
+        return text
+
+    def _format_component_stats(self):
+        # Componentes conectados (solo para grafos no dirigidos)
+        num_components = self.analyzer.get_number_connected_components()
+        text = f"• Componentes conectados: {num_components}\n"
+        if num_components > 1:
+            text += f"• Tamaño del componente más grande: {self.analyzer.get_largest_connected_component_size():,}\n"
+        return text
+
+    def _format_clustering_stats(self):
+        # Coeficiente de clustering promedio (solo para grafos no dirigidos)
+        return f"• Coeficiente de clustering promedio: {self.analyzer.get_average_clustering_coefficient():.4f}\n"
+
+    def _format_approximate_stats(self):
+        """Estimaciones por muestreo (get_approximate_stats) con su intervalo de confianza."""
+        approx = self.analyzer.get_approximate_stats(time_budget_s=STATS_TIME_BUDGET_S)
+        confidence = approx['confidence']
+        text = ""
+        for label, key in (("Coeficiente de clustering promedio", 'average_clustering'), ("Transitividad", 'transitivity')):
+            estimate = approx[key]
+            text += (f"• {label} (aprox.): {estimate['estimate']:.4f} "
+                     f"[{estimate['ci_low']:.4f}, {estimate['ci_high']:.4f}] IC {confidence:.0%}, "
+                     f"{estimate['samples']:,} cuñas\n")
+        degree = approx['degree']
+        text += "• Distribución de grados (aprox., grados más frecuentes):\n"
+        top_degrees = sorted(degree['distribution'].items(), key=lambda item: item[1], reverse=True)[:5]
+        for d, proportion in top_degrees:
+            text += f"  grado {d}: {proportion:.2%} ± {degree['distribution_ci'][d]:.2%}\n"
+        return text
+
+    def _format_geographic_stats(self):
         geo_stats = self.analyzer.analyze_geographic_distribution()
-        if geo_stats:
-            detailed_stats += "\nANÁLISIS GEOGRÁFICO:\n"
-            detailed_stats += f"• Rango de latitud: {geo_stats.get('lat_range', (0,0))[0]:.4f} a {geo_stats.get('lat_range', (0,0))[1]:.4f}\n"
-            detailed_stats += f"• Rango de longitud: {geo_stats.get('lng_range', (0,0))[0]:.4f} a {geo_stats.get('lng_range', (0,0))[1]:.4f}\n"
-            detailed_stats += f"• Centro geográfico: ({geo_stats.get('lat_center', 0):.4f}, {geo_stats.get('lng_center', 0):.4f})\n\n"
-        
+        if not geo_stats:
+            return "\n"
+        text = "\nANÁLISIS GEOGRÁFICO:\n"
+        text += f"• Rango de latitud: {geo_stats.get('lat_range', (0,0))[0]:.4f} a {geo_stats.get('lat_range', (0,0))[1]:.4f}\n"
+        text += f"• Rango de longitud: {geo_stats.get('lng_range', (0,0))[0]:.4f} a {geo_stats.get('lng_range', (0,0))[1]:.4f}\n"
+        text += f"• Centro geográfico: ({geo_stats.get('lat_center', 0):.4f}, {geo_stats.get('lng_center', 0):.4f})\n\n"
+        return text
+
+    def _format_community_stats(self):
         if self.communities_detected and self.analyzer.communities:
-            detailed_stats += "ANÁLISIS DE COMUNIDADES:\n"
-            detailed_stats += f"• Total de comunidades: {len(self.analyzer.communities)}\n"
+            text = "ANÁLISIS DE COMUNIDADES:\n"
+            text += f"• Total de comunidades: {len(self.analyzer.communities)}\n"
             # Mostrar solo las 5 comunidades más grandes para no saturar
             sorted_communities = sorted(self.analyzer.communities.items(), key=lambda item: item[1]['size'], reverse=True)
             for i, (comm_id, comm_data) in enumerate(sorted_communities[:5]):
-                detailed_stats += f"• Comunidad {comm_id}: {comm_data['size']} nodos\n"
-                detailed_stats += f"  Centro: ({comm_data.get('center_lat', 0.0):.2f}, {comm_data.get('center_lng', 0.0):.2f})\n"
+                text += f"• Comunidad {comm_id}: {comm_data['size']} nodos\n"
+                text += f"  Centro: ({comm_data.get('center_lat', 0.0):.2f}, {comm_data.get('center_lng', 0.0):.2f})\n"
                 # Mostrar algunos nodos de ejemplo
                 node_examples = list(comm_data.get('nodes', []))[:3]
                 if node_examples:
-                    detailed_stats += f"  Nodos de ejemplo: {', '.join(map(str, node_examples))}\n"
+                    text += f"  Nodos de ejemplo: {', '.join(map(str, node_examples))}\n"
 
             if len(sorted_communities) > 5:
-                detailed_stats += f"  ... y {len(sorted_communities) - 5} comunidades más.\n"
-            detailed_stats += "\n"
-        elif self.data_loaded:
-             detailed_stats += "\nANÁLISIS DE COMUNIDADES:\n"
-             detailed_stats += "• Comunidades aún no detectadas.\n\n"
-        
+                text += f"  ... y {len(sorted_communities) - 5} comunidades más.\n"
+            return text + "\n"
+        return "ANÁLISIS DE COMUNIDADES:\n• Comunidades aún no detectadas.\n\n"
+
+    def _format_top_nodes_stats(self):
         # Top nodos conectados
         top_nodes = self.analyzer.get_top_connected_nodes(10)
-        if top_nodes:
-            detailed_stats += "NODOS MÁS CONECTADOS (TOP 10 por grado):\n"
-            for i, (node, degree) in enumerate(top_nodes, 1):
-                detailed_stats += f"{i:2d}. Nodo {node:8d}: {degree:4d} conexiones\n"
-        else:
-            detailed_stats += "No hay nodos conectados para mostrar.\n"
-
-        text_widget.insert(tk.END, detailed_stats)
-        text_widget.config(state=tk.DISABLED)
-        self.stats_button.config(state=tk.NORMAL) # Re-habilitar botón de estadísticas
+        if not top_nodes:
+            return "No hay nodos conectados para mostrar.\n"
+        text = "NODOS MÁS CONECTADOS (TOP 10 por grado):\n"
+        for i, (node, degree) in enumerate(top_nodes, 1):
+            text += f"{i:2d}. Nodo {node:8d}: {degree:4d} conexiones\n"
+        return text
 
 
     def on_click_node(self, event):
@@ -611,7 +917,7 @@ class SocialNetworkApp:
     def clear_selection(self):
         """Limpia la selección actual de nodos y la visualización del camino."""
         self.selected_nodes = []
-        self.current_path = []
+        self.current_paths = []
         self.entry_start_node.delete(0, tk.END)
         self.entry_end_node.delete(0, tk.END)
         self.update_status("Selección y camino limpiados.", "info")
@@ -623,7 +929,7 @@ class SocialNetworkApp:
         # self.map_html_view.set_html("<p>Mapa limpiado. Cargue nuevos datos.</p>") # Eliminado
 
         self.selected_nodes = []
-        self.current_path = []
+        self.current_paths = []
         self.data_loaded = False
         self.communities_detected = False
         
@@ -639,10 +945,9 @@ class SocialNetworkApp:
         self.stats_button.config(state=tk.DISABLED)
 
         self.update_status("Visualización limpiada y estado reiniciado. Carga nuevos datos.", "info")
-        self.stats_text.config(state=tk.NORMAL)
-        self.stats_text.delete(1.0, tk.END)
-        self.stats_text.insert(tk.END, "No hay datos cargados para mostrar estadísticas.")
-        self.stats_text.config(state=tk.DISABLED)
+        self.scheduler.cancel_all()
+        self._stats_job_id = None
+        self._set_stats_text("No hay datos cargados para mostrar estadísticas.")
 
     def calculate_mst_async(self):
         """Calcula el MST de forma asíncrona."""
@@ -655,26 +960,34 @@ class SocialNetworkApp:
         self.find_path_button.config(state=tk.DISABLED) # Deshabilitar otros botones de análisis
         self.communities_button.config(state=tk.DISABLED)
 
-        threading.Thread(target=self._calculate_mst_task).start()
+        version = self._analysis_version()
+        self.scheduler.submit(('mst', 'kruskal'), self._calculate_mst_task, version=version,
+                              on_success=lambda mst: self._after_mst_calculated_success(mst, version),
+                              on_error=self._on_mst_error)
 
-    def _calculate_mst_task(self):
-        """Tarea de cálculo de MST para ejecutar en un hilo separado."""
-        try:
-            self.analyzer.calculate_minimum_spanning_tree() # Llama al método en GraphAnalyzer
-            # El resultado se guarda en self.analyzer.mst
-            self.root.after(0, self._after_mst_calculated_success)
-        except Exception as e:
-            logging.error(f"Error al calcular MST: {e}")
-            self.root.after(0, lambda: self.update_status(f"Error al calcular MST: {e}", "error"))
-        finally:
-            # Volver a habilitar botones en el hilo principal
-            self.root.after(0, lambda: self.mst_button.config(state=tk.NORMAL))
-            self.root.after(0, lambda: self.find_path_button.config(state=tk.NORMAL if self.data_loaded else tk.DISABLED))
-            self.root.after(0, lambda: self.communities_button.config(state=tk.NORMAL if self.data_loaded else tk.DISABLED))
+    def _calculate_mst_task(self, job):
+        """
+        Tarea de cálculo de MST para ejecutar en el planificador: solo calcula y devuelve el MST (el
+        analizador se actualiza en el hilo de la GUI). Se interrumpe si se cancela el trabajo.
+        """
+        return self.analyzer.compute_minimum_spanning_tree(should_stop=job.is_cancelled)
 
+    def _enable_buttons_after_mst(self):
+        self.mst_button.config(state=tk.NORMAL)
+        self.find_path_button.config(state=tk.NORMAL if self.data_loaded else tk.DISABLED)
+        self.communities_button.config(state=tk.NORMAL if self.data_loaded else tk.DISABLED)
 
-    def _after_mst_calculated_success(self):
+    def _on_mst_error(self, e):
+        self.update_status(f"Error al calcular MST: {e}", "error")
+        self._enable_buttons_after_mst()
+
+    def _after_mst_calculated_success(self, mst, version):
         """Acciones a realizar después de que el MST se haya calculado exitosamente."""
+        self._enable_buttons_after_mst()
+        if version != self._analysis_version(): # Calculado sobre un grafo que ya no está cargado
+            logging.info("MST descartado: el grafo cambió mientras se calculaba.")
+            return
+        self.analyzer.mst = mst # También si el resultado viene memorizado
         if self.analyzer.mst and self.analyzer.mst.number_of_edges() > 0:
             num_edges = self.analyzer.mst.number_of_edges()
             self.update_status(f"MST calculado con {num_edges} aristas.", "info")
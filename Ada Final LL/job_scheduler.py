@@ -0,0 +1,163 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class Job:
+    """
+    Un trabajo de análisis en curso. La función del trabajo la recibe como único argumento para
+    consultar si fue cancelado (is_cancelled) y para informar de su avance (report_progress).
+    """
+    def __init__(self, job_id, key, version, scheduler):
+        self.job_id = job_id
+        self.key = key
+        self.version = version
+        self.cancel_event = threading.Event()
+        self.progress = 0.0
+        self.message = ""
+        self.future = None
+        self._scheduler = scheduler
+        self._subscribers = [] # [(on_success, on_error, on_progress)] de todas las peticiones agrupadas
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def report_progress(self, fraction=None, message=None, data=None):
+        """Actualiza el avance (0..1) y el mensaje, y lo notifica a los suscriptores con `data` opcional."""
+        if fraction is not None:
+            self.progress = fraction
+        if message is not None:
+            self.message = message
+        self._scheduler._notify_progress(self, data)
+
+class JobScheduler:
+    """
+    Planificador central de los trabajos de análisis de la GUI sobre un pool de hilos (los algoritmos
+    comparten el estado del analizador; los que lo necesitan ya reparten su trabajo en procesos).
+      - Cada petición recibe un id de trabajo; se puede cancelar con cancel(job_id) o cancel_all().
+      - Dos peticiones iguales (misma clave y versión) en curso a la vez comparten un único trabajo.
+      - Los resultados se memorizan por (clave, versión): repetir una petición ya resuelta no recalcula.
+    `dispatch(fn)` ejecuta los callbacks en el hilo adecuado (en la GUI, root.after(0, fn)).
+    """
+    def __init__(self, max_workers=2, dispatch=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        self._dispatch = dispatch if dispatch is not None else (lambda fn: fn())
+        self._lock = threading.Lock()
+        self._next_job_id = 1
+        self._jobs = {}       # {job_id: Job} en curso
+        self._in_flight = {}  # {(clave, versión): Job} en curso, para agrupar peticiones iguales
+        self._results = {}    # {(clave, versión): resultado} memorizados
+
+    def submit(self, key, fn, version=None, on_success=None, on_error=None, on_progress=None, memoize=True):
+        """
+        Ejecuta fn(job) en el pool. `key` identifica la petición (hashable) y `version` el estado del grafo
+        sobre el que se calcula. Callbacks: on_success(resultado), on_error(excepción), on_progress(job, data).
+        Devuelve el id del trabajo (el del trabajo existente si la petición se agrupó con otra en curso).
+        """
+        cache_key = (key, version)
+        with self._lock:
+            if memoize and cache_key in self._results:
+                result = self._results[cache_key]
+                job_id = self._new_job_id()
+                logging.info(f"Trabajo {job_id} {key}: resultado memorizado")
+                if on_success is not None:
+                    self._dispatch(lambda: on_success(result))
+                return job_id
+            job = self._in_flight.get(cache_key)
+            if job is not None:
+                job._subscribers.append((on_success, on_error, on_progress))
+                logging.info(f"Trabajo {job.job_id} {key}: petición agrupada con el trabajo en curso")
+                return job.job_id
+            job = Job(self._new_job_id(), key, version, self)
+            job._subscribers.append((on_success, on_error, on_progress))
+            self._jobs[job.job_id] = job
+            self._in_flight[cache_key] = job
+            job.future = self._executor.submit(self._run, job, fn, memoize)
+            logging.info(f"Trabajo {job.job_id} {key}: enviado")
+            return job.job_id
+
+    def _new_job_id(self):
+        job_id = self._next_job_id
+        self._next_job_id += 1
+        return job_id
+
+    def _run(self, job, fn, memoize):
+        if job.is_cancelled():
+            return
+        try:
+            result = fn(job)
+        except Exception as e:
+            logging.error(f"Trabajo {job.job_id} {job.key}: error: {e}")
+            for _, on_error, _ in self._finish(job):
+                if on_error is not None:
+                    self._dispatch(lambda on_error=on_error, e=e: on_error(e))
+            return
+        subscribers = self._finish(job, result if memoize else None, memoize)
+        for on_success, _, _ in subscribers:
+            if on_success is not None:
+                self._dispatch(lambda on_success=on_success: on_success(result))
+
+    def _finish(self, job, result=None, memoize=False):
+        """Saca el trabajo de los registros y devuelve sus suscriptores ([] si fue cancelado)."""
+        with self._lock:
+            self._jobs.pop(job.job_id, None)
+            if self._in_flight.get((job.key, job.version)) is job:
+                del self._in_flight[(job.key, job.version)]
+            if job.is_cancelled():
+                logging.info(f"Trabajo {job.job_id} {job.key}: cancelado")
+                return []
+            if memoize:
+                self._results[(job.key, job.version)] = result
+            return list(job._subscribers)
+
+    def _notify_progress(self, job, data):
+        if job.is_cancelled():
+            return
+        with self._lock:
+            subscribers = list(job._subscribers)
+        for _, _, on_progress in subscribers:
+            if on_progress is not None:
+                # Se comprueba de nuevo al ejecutarse: el trabajo pudo cancelarse mientras tanto
+                self._dispatch(lambda on_progress=on_progress: None if job.is_cancelled() else on_progress(job, data))
+
+    def cancel(self, job_id):
+        """
+        Cancela un trabajo: no empieza si aún está en cola y, si ya corre, sus resultados y avances se
+        descartan (la función puede consultar job.is_cancelled() para terminar antes). Devuelve si existía.
+        """
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                return False
+            job.cancel_event.set()
+            if self._in_flight.get((job.key, job.version)) is job:
+                del self._in_flight[(job.key, job.version)]
+        job.future.cancel()
+        return True
+
+    def cancel_all(self):
+        """Cancela todos los trabajos en curso."""
+        with self._lock:
+            job_ids = list(self._jobs)
+        for job_id in job_ids:
+            self.cancel(job_id)
+
+    def is_running(self, job_id):
+        with self._lock:
+            return job_id in self._jobs
+
+    def get_progress(self, job_id):
+        """(avance 0..1, mensaje) de un trabajo en curso, o None si ya terminó."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return (job.progress, job.message) if job is not None else None
+
+    def invalidate(self, current_version=None):
+        """Descarta los resultados memorizados de versiones distintas de current_version (todos si es None)."""
+        with self._lock:
+            self._results = {cache_key: result for cache_key, result in self._results.items()
+                             if current_version is not None and cache_key[1] == current_version}
+
+    def shutdown(self):
+        """Cancela lo pendiente y libera el pool sin esperar a los trabajos en curso."""
+        self.cancel_all()
+        self._executor.shutdown(wait=False)
@@ -1,13 +1,30 @@
 import polars as pl
 import os
 import logging
+from collections import namedtuple
+import snapshot
+from config import USER_CHUNK_BYTES
 
-def load_location_data(filepath: str):
+# Tamaño de bloque por defecto al leer el archivo de usuarios en streaming (se configura en config.py)
+DEFAULT_CHUNK_BYTES = USER_CHUNK_BYTES
+
+# Lote de aristas parseadas de las filas [row_start, row_end) del archivo de usuarios
+EdgeBatch = namedtuple('EdgeBatch', ['src', 'dst', 'row_start', 'row_end'])
+
+def load_location_data(filepath: str, use_snapshot: bool = True):
     try:
         logging.info(f"Cargando archivo de ubicación: {filepath}")
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"El archivo {filepath} no existe.")
 
+        # Reutilizar la copia binaria (Arrow IPC) si el archivo de texto no ha cambiado
+        snapshot_dir, snapshot_key = f"{filepath}.snapshot", snapshot.snapshot_key([filepath])
+        if use_snapshot:
+            df = snapshot.load_frame(snapshot_dir, snapshot_key)
+            if df is not None:
+                logging.info(f"Archivo de ubicación cargado desde snapshot: {df.height} registros")
+                return df
+
         # Read as strings first to allow adding row index before casting
         # Assuming the row number acts as the ID (0-indexed)
         df = pl.read_csv(filepath, has_header=False, new_columns=["lat_str", "long_str"])
@@ -17,24 +34,113 @@ def load_location_data(filepath: str):
             pl.col("long_str").cast(pl.Float64).alias("long"),
         ]).drop("lat_str", "long_str")
         logging.info(f"Archivo de ubicación cargado: {df.height} registros")
+        if use_snapshot:
+            snapshot.save_frame(snapshot_dir, snapshot_key, df)
         return df
     except Exception as e:
         logging.error(f"Error al cargar datos de ubicación: {e}")
         return None
 
-def load_user_data(filepath: str):
+def load_user_data(filepath: str, use_snapshot: bool = True):
     try:
         logging.info(f"Cargando archivo de usuarios: {filepath}")
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"El archivo {filepath} no existe.")
 
-        with open(filepath, "r") as f:
-            lines = (line.strip() for line in f)
-            # The 'adj_list' column will hold the original string, e.g., "0 1 2"
-            df = pl.DataFrame({"adj_list": list(lines)})
+        snapshot_dir, snapshot_key = f"{filepath}.snapshot", snapshot.snapshot_key([filepath])
+        if use_snapshot:
+            df = snapshot.load_frame(snapshot_dir, snapshot_key)
+            if df is not None:
+                logging.info(f"Archivo de usuarios cargado desde snapshot: {df.height} registros")
+                return df
+
+        # Se construye un DataFrame por bloque y se concatenan: nunca se mantiene el archivo
+        # entero como lista de str de Python.
+        # The 'adj_list' column will hold the original string, e.g., "0 1 2"
+        frames = [pl.DataFrame({"adj_list": lines}, schema={"adj_list": pl.String})
+                  for lines, _, _ in _iter_line_blocks(filepath)]
+        df = pl.concat(frames) if frames else pl.DataFrame(schema={"adj_list": pl.String})
 
         logging.info(f"Archivo de usuarios cargado: {df.height} registros")
+        if use_snapshot:
+            snapshot.save_frame(snapshot_dir, snapshot_key, df)
         return df
     except Exception as e:
         logging.error(f"Error al cargar datos de usuario: {e}")
-        return None
\ No newline at end of file
+        return None
+
+def build_edge_list(user_df: pl.DataFrame, node_ids=None, row_offset=0):
+    """
+    Convierte el DataFrame de listas de adyacencia (columna 'adj_list') en una lista de aristas
+    con columnas enteras 'src'/'dst', usando solo expresiones de Polars (sin bucle por fila).
+    El ID de origen es el índice de la fila (+ row_offset). Si se pasa `node_ids`, solo se
+    conservan las aristas con ambos extremos en ese conjunto. Las aristas repetidas se conservan:
+    los constructores del grafo ya las colapsan.
+    """
+    edges = (
+        user_df.lazy()
+        .with_row_index("src", offset=row_offset)
+        .select(
+            pl.col("src").cast(pl.Int64),
+            pl.col("adj_list").str.replace_all(r"[,\s]+", " ").str.strip_chars().str.split(" ").alias("dst"),
+        )
+    )
+    if node_ids is not None:
+        node_ids = pl.Series("node_ids", node_ids, dtype=pl.Int64)
+        edges = edges.filter(pl.col("src").is_in(node_ids))
+    edges = (
+        edges.explode("dst")
+        .filter(pl.col("dst").str.contains(r"^[0-9]+$"))
+        .with_columns(pl.col("dst").cast(pl.Int64))
+    )
+    if node_ids is not None:
+        edges = edges.filter(pl.col("dst").is_in(node_ids))
+    return edges.collect()
+
+
+def _iter_line_blocks(filepath: str, chunk_bytes: int = DEFAULT_CHUNK_BYTES):
+    """
+    Lee el archivo en bloques binarios de tamaño fijo y devuelve (lineas, bytes_leidos, bytes_totales)
+    por bloque, cortando siempre en un salto de línea. La memoria queda acotada por chunk_bytes.
+    """
+    total_bytes = os.path.getsize(filepath)
+    bytes_read = 0
+    remainder = b""
+    with open(filepath, "rb") as f:
+        while True:
+            chunk = f.read(chunk_bytes)
+            if not chunk:
+                break
+            bytes_read += len(chunk)
+            data = remainder + chunk
+            cut = data.rfind(b"\n")
+            if cut == -1: # Línea más larga que el bloque: seguir acumulando
+                remainder = data
+                continue
+            remainder = data[cut + 1:]
+            yield [line.strip() for line in data[:cut].decode("utf-8").split("\n")], bytes_read, total_bytes
+    if remainder: # Última línea sin salto de línea final
+        yield [remainder.decode("utf-8").strip()], bytes_read, total_bytes
+
+def iter_user_edge_batches(filepath: str, node_ids=None, chunk_bytes: int = DEFAULT_CHUNK_BYTES, progress_callback=None):
+    """
+    Lee el archivo de usuarios en streaming y produce un EdgeBatch (arrays enteros src/dst de NumPy)
+    por bloque, filtrados a `node_ids` si se indica. El pico de memoria depende de chunk_bytes y no del
+    tamaño del archivo. `progress_callback(bytes_leidos, bytes_totales)` se llama tras cada bloque.
+    """
+    logging.info(f"Leyendo archivo de usuarios en streaming: {filepath} (bloques de {chunk_bytes:,} bytes)")
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(f"El archivo {filepath} no existe.")
+
+    if node_ids is not None:
+        node_ids = pl.Series("node_ids", node_ids, dtype=pl.Int64)
+    row_start = 0
+    for lines, bytes_read, total_bytes in _iter_line_blocks(filepath, chunk_bytes):
+        block_df = pl.DataFrame({"adj_list": lines}, schema={"adj_list": pl.String})
+        edges_df = build_edge_list(block_df, node_ids, row_offset=row_start)
+        row_end = row_start + block_df.height
+        yield EdgeBatch(edges_df["src"].to_numpy(), edges_df["dst"].to_numpy(), row_start, row_end)
+        row_start = row_end
+        if progress_callback:
+            progress_callback(bytes_read, total_bytes)
+    logging.info(f"Streaming de usuarios completado: {row_start} registros")
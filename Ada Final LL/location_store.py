@@ -0,0 +1,264 @@
+from collections.abc import Mapping
+import math
+import numpy as np
+
+def valid_location_mask(lat, lng):
+    """
+    Filtro de ubicaciones válidas: devuelve una máscara booleana con las coordenadas dentro de rangos
+    geográficos válidos y fuera de algunas áreas oceánicas o irreales comunes.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    mask = (lat >= -90) & (lat <= 90) & (lng >= -180) & (lng <= 180) # NaN queda como inválido
+    # Filtros heurísticos para áreas oceánicas o de datos anómalos
+    mask &= ~((-30 < lat) & (lat < 30) & (160 < lng) & (lng < -120)) # Pacífico Central
+    mask &= ~((-30 < lat) & (lat < 30) & (-40 < lng) & (lng < -10)) # Atlántico Central
+    mask &= ~((-30 < lat) & (lat < 10) & (60 < lng) & (lng < 100)) # Océano Índico
+    return mask
+
+EARTH_RADIUS_KM = 6371.0088
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Distancia de círculo máximo (km) entre pares de coordenadas en grados, vectorizada con NumPy."""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def haversine_km_scalar(lat1, lng1, lat2, lng2):
+    """Versión escalar (módulo math) de haversine_km, para bucles como la heurística de A*."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(max(a, 0.0), 1.0)))
+
+class LocationStore(Mapping):
+    """
+    Ubicaciones de los nodos en arrays contiguos de NumPy indexados por ID de nodo:
+    lat[node_id], lng[node_id] y una máscara `valid` que indica qué nodos tienen ubicación.
+    Se comporta como el antiguo dict de solo lectura {node_id: (lat, lng)} (`in`, get, items, ...),
+    pero los cálculos masivos deben usar directamente los arrays.
+    Es inmutable: restrict_to devuelve un nuevo store que comparte lat/lng.
+    """
+    def __init__(self, lat=None, lng=None, valid=None):
+        self.lat = np.empty(0, dtype=np.float64) if lat is None else lat
+        self.lng = np.empty(0, dtype=np.float64) if lng is None else lng
+        self.valid = np.zeros(len(self.lat), dtype=bool) if valid is None else valid
+        self._count = int(np.count_nonzero(self.valid))
+
+    @classmethod
+    def from_dataframe(cls, locations_df):
+        """
+        Construye el store desde el DataFrame de ubicaciones (columnas 'lat' y 'long'; el índice de fila es
+        el ID del nodo) en una sola pasada vectorizada, aplicando los filtros de valid_location_mask.
+        """
+        lat = locations_df["lat"].to_numpy().astype(np.float64, copy=False)
+        lng = locations_df["long"].to_numpy().astype(np.float64, copy=False)
+        return cls(lat, lng, valid_location_mask(lat, lng))
+
+    @classmethod
+    def from_arrays(cls, node_ids, lat, lng):
+        """Construye el store a partir de arrays paralelos (IDs, latitudes, longitudes) de nodos válidos."""
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        size = int(node_ids.max()) + 1 if len(node_ids) else 0
+        full_lat = np.full(size, np.nan)
+        full_lng = np.full(size, np.nan)
+        valid = np.zeros(size, dtype=bool)
+        full_lat[node_ids] = lat
+        full_lng[node_ids] = lng
+        valid[node_ids] = True
+        return cls(full_lat, full_lng, valid)
+
+    def restrict_to(self, node_ids):
+        """Devuelve un store con solo los nodos de `node_ids` que ya tenían ubicación válida."""
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        node_ids = node_ids[(node_ids >= 0) & (node_ids < len(self.valid))]
+        valid = np.zeros(len(self.valid), dtype=bool)
+        valid[node_ids] = self.valid[node_ids]
+        return LocationStore(self.lat, self.lng, valid)
+
+    def ids(self):
+        """Array ordenado con los IDs de los nodos con ubicación válida."""
+        return np.flatnonzero(self.valid)
+
+    def has_location(self, node_ids):
+        """Máscara booleana vectorizada: qué nodos de `node_ids` tienen ubicación válida."""
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        in_range = (node_ids >= 0) & (node_ids < len(self.valid))
+        result = np.zeros(len(node_ids), dtype=bool)
+        result[in_range] = self.valid[node_ids[in_range]]
+        return result
+
+    def edge_lengths_km(self, src, dst, dtype=np.float32):
+        """
+        Longitud (km, haversine) de cada arista src[i] -> dst[i] en una sola pasada vectorizada.
+        Se devuelve en float32 por defecto para guardar los pesos de forma compacta.
+        Ambos extremos deben tener ubicación válida.
+        """
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        return haversine_km(self.lat[src], self.lng[src], self.lat[dst], self.lng[dst]).astype(dtype, copy=False)
+
+    def memory_usage(self):
+        """Bytes ocupados por los arrays del store."""
+        return self.lat.nbytes + self.lng.nbytes + self.valid.nbytes
+
+    # --- Interfaz de dict de solo lectura {node_id: (lat, lng)} ---
+
+    def _index(self, node_id):
+        try:
+            node_id = int(node_id)
+        except (TypeError, ValueError):
+            return -1
+        if 0 <= node_id < len(self.valid) and self.valid[node_id]:
+            return node_id
+        return -1
+
+    def __getitem__(self, node_id):
+        idx = self._index(node_id)
+        if idx < 0:
+            raise KeyError(node_id)
+        return (float(self.lat[idx]), float(self.lng[idx]))
+
+    def __contains__(self, node_id):
+        return self._index(node_id) >= 0
+
+    def __iter__(self):
+        return iter(self.ids().tolist())
+
+    def __len__(self):
+        return self._count
+
+    def items(self):
+        ids = self.ids()
+        return zip(ids.tolist(), zip(self.lat[ids].tolist(), self.lng[ids].tolist()))
+
+    def values(self):
+        ids = self.ids()
+        return zip(self.lat[ids].tolist(), self.lng[ids].tolist())
+
+    def __repr__(self):
+        return f"LocationStore({self._count} ubicaciones válidas)"
+
+# Kilómetros por grado de latitud (y de longitud en el ecuador)
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+class SpatialIndex:
+    """
+    Índice espacial de rejilla sobre arrays de ubicaciones (se construye una vez, de forma vectorizada):
+    los puntos se ordenan por celda de cell_deg grados y cell_start[i] marca dónde empieza la i-ésima celda
+    ocupada, como un CSR de celdas -> puntos. Consultas: bbox (rectángulo lat/lng), radius (haversine)
+    y nearest (k más cercanos). Las consultas devuelven IDs de nodo; las variantes *_positions devuelven
+    posiciones en los arrays con los que se construyó (para leer otras columnas alineadas con ellos).
+    """
+    def __init__(self, node_ids, lat, lng, cell_deg=1.0):
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        self.cell_deg = cell_deg
+        self.num_rows = int(math.ceil(180.0 / cell_deg))
+        self.num_cols = int(math.ceil(360.0 / cell_deg))
+        keys = self._row(lat) * self.num_cols + self._col(lng)
+        order = np.argsort(keys, kind='stable')
+        self.positions = order # Posición original de cada punto del índice
+        self.node_ids = node_ids[order]
+        self.lat = lat[order]
+        self.lng = lng[order]
+        self.cell_keys, cell_first = np.unique(keys[order], return_index=True)
+        self.cell_start = np.append(cell_first, len(order)).astype(np.int64)
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def _row(self, lat):
+        return np.clip(np.floor((np.asarray(lat) + 90.0) / self.cell_deg).astype(np.int64), 0, self.num_rows - 1)
+
+    def _col(self, lng):
+        return np.clip(np.floor((np.asarray(lng) + 180.0) / self.cell_deg).astype(np.int64), 0, self.num_cols - 1)
+
+    def _candidates(self, south, north, col_ranges):
+        """Puntos (índices internos) de las celdas de las filas south..north y los rangos de columnas dados."""
+        rows = np.arange(self._row(south), self._row(north) + 1, dtype=np.int64)
+        starts, ends = [], []
+        for col_lo, col_hi in col_ranges:
+            first = np.searchsorted(self.cell_keys, rows * self.num_cols + col_lo, side='left')
+            last = np.searchsorted(self.cell_keys, rows * self.num_cols + col_hi, side='right')
+            starts.append(self.cell_start[first])
+            ends.append(self.cell_start[last])
+        starts, ends = np.concatenate(starts), np.concatenate(ends)
+        lengths = ends - starts
+        total = int(lengths.sum())
+        # Rangos contiguos [start, end) concatenados sin bucle de Python
+        return np.repeat(starts - (np.cumsum(lengths) - lengths), lengths) + np.arange(total)
+
+    def _bbox_internal(self, west, south, east, north):
+        south, north = max(south, -90.0), min(north, 90.0)
+        if south > north:
+            return np.empty(0, dtype=np.int64)
+        if east - west >= 360.0:
+            west, east = -180.0, 180.0
+        else:
+            west = (west + 180.0) % 360.0 - 180.0
+            east = (east + 180.0) % 360.0 - 180.0
+        if west <= east:
+            col_ranges = [(int(self._col(west)), int(self._col(east)))]
+        else: # Cruza el antimeridiano: dos rangos de columnas
+            col_ranges = [(int(self._col(west)), self.num_cols - 1), (0, int(self._col(east)))]
+        candidates = self._candidates(south, north, col_ranges)
+        lat, lng = self.lat[candidates], self.lng[candidates]
+        inside = (lat >= south) & (lat <= north)
+        inside &= ((lng >= west) & (lng <= east)) if west <= east else ((lng >= west) | (lng <= east))
+        return candidates[inside]
+
+    def bbox_positions(self, west, south, east, north):
+        """Posiciones de los puntos dentro del rectángulo (admite vistas que cruzan el antimeridiano)."""
+        return self.positions[self._bbox_internal(west, south, east, north)]
+
+    def bbox(self, west, south, east, north):
+        """IDs de los nodos dentro del rectángulo [west, east] x [south, north] (grados)."""
+        return self.node_ids[self._bbox_internal(west, south, east, north)]
+
+    def _radius_internal(self, lat, lng, radius_km):
+        """Índices internos y distancias (km) de los puntos a menos de radius_km, ordenados por distancia."""
+        dlat = radius_km / KM_PER_DEGREE
+        south, north = lat - dlat, lat + dlat
+        max_abs_lat = min(max(abs(south), abs(north)), 90.0)
+        cos_lat = math.cos(math.radians(max_abs_lat))
+        if north >= 90.0 or south <= -90.0 or cos_lat < 1e-9 or dlat / cos_lat >= 180.0:
+            west, east = -180.0, 180.0 # Cerca de un polo o radio enorme: todas las longitudes
+        else:
+            west, east = lng - dlat / cos_lat, lng + dlat / cos_lat
+        candidates = self._bbox_internal(west, south, east, north)
+        dist = haversine_km(lat, lng, self.lat[candidates], self.lng[candidates])
+        keep = dist <= radius_km
+        candidates, dist = candidates[keep], dist[keep]
+        order = np.argsort(dist, kind='stable')
+        return candidates[order], dist[order]
+
+    def radius(self, lat, lng, radius_km):
+        """(IDs, distancias en km) de los nodos a menos de radius_km del punto, de más cerca a más lejos."""
+        found, dist = self._radius_internal(lat, lng, radius_km)
+        return self.node_ids[found], dist
+
+    def _nearest_internal(self, lat, lng, k):
+        """
+        Índices internos y distancias de los k puntos más cercanos. Busca en un radio que se duplica desde
+        el tamaño de una celda hasta contener k puntos: dentro de ese radio están los k más cercanos.
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        radius_km = self.cell_deg * KM_PER_DEGREE
+        while True:
+            found, dist = self._radius_internal(lat, lng, radius_km)
+            if len(found) >= k or radius_km >= math.pi * EARTH_RADIUS_KM:
+                return found[:k], dist[:k]
+            radius_km *= 2
+
+    def nearest_positions(self, lat, lng, k=1):
+        """(posiciones, distancias en km) de los k puntos más cercanos."""
+        found, dist = self._nearest_internal(lat, lng, k)
+        return self.positions[found], dist
+
+    def nearest(self, lat, lng, k=1):
+        """(IDs, distancias en km) de los k nodos más cercanos al punto, de más cerca a más lejos."""
+        found, dist = self._nearest_internal(lat, lng, k)
+        return self.node_ids[found], dist
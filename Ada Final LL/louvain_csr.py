@@ -0,0 +1,396 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Número de nodos cuyos vecinos se convierten juntos a listas de Python en la fase local
+_BLOCK_NODES = 65536
+# Por debajo de este número de nodos un nivel (o una clase de color) se procesa sin el pool de procesos
+_PARALLEL_MIN_NODES = 50000
+_PARALLEL_MIN_CLASS_NODES = 4096
+
+def _undirected_arrays(csr, weighted=True):
+    """
+    Arrays (indptr, indices, weights) de la versión no dirigida de un CSRGraph, con índices internos 0..n-1.
+    Los pesos se pasan a float64 para acumular sin pérdida en los niveles agregados; con weighted=False
+    todas las aristas pesan 1.
+    """
+    undirected = csr.undirected_view()
+    weights = undirected.weights if weighted else np.ones(len(undirected.indices))
+    return (np.asarray(undirected.indptr, dtype=np.int64),
+            np.asarray(undirected.indices, dtype=np.int64),
+            np.asarray(weights, dtype=np.float64))
+
+def _row_of_edges(indptr):
+    """Índice de fila (nodo de origen) de cada posición de `indices`."""
+    n = len(indptr) - 1
+    return np.repeat(np.arange(n, dtype=np.int64), np.diff(indptr))
+
+def _edge_offsets(indptr, nodes):
+    """Posiciones en `indices` de las aristas de `nodes` (en ese orden) y número de aristas de cada nodo."""
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    return np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(int(counts.sum())), counts
+
+def _modularity(indptr, indices, weights, degrees, community, m2):
+    """
+    Modularidad de una partición (array community[i]) sobre el grafo simétrico dado en CSR:
+    Q = Σ_c [ Σ_in_c / 2m - (Σ_tot_c / 2m)^2 ], con Σ_in_c la suma de A_ij para i, j en c.
+    """
+    num_comms = int(community.max()) + 1 if len(community) else 0
+    src_comm = community[_row_of_edges(indptr)]
+    internal = src_comm == community[indices]
+    sigma_in = np.bincount(src_comm[internal], weights=weights[internal], minlength=num_comms)
+    sigma_tot = np.bincount(community, weights=degrees, minlength=num_comms)
+    return float(np.sum(sigma_in / m2 - (sigma_tot / m2) ** 2))
+
+def _permute(indptr, indices, weights, order):
+    """
+    Reetiqueta el grafo CSR para que el nodo order[r] pase a ser el nodo r.
+    Devuelve (indptr, indices, weights) permutados; los vecinos conservan sus pesos.
+    """
+    n = len(order)
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = np.arange(n)
+    offsets, counts = _edge_offsets(indptr, order)
+    new_indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=new_indptr[1:])
+    return new_indptr, rank[indices[offsets]], weights[offsets]
+
+def _local_moving(indptr, indices, weights, degrees, m2, max_passes=30, min_gain=1e-12, seed=None,
+                  active_queue=True, min_moved_fraction=0.0, min_pass_gain=0.0, should_stop=None):
+    """
+    Fase 1 de Louvain sobre arrays CSR: recorre los nodos y mueve cada uno a la comunidad vecina con
+    mayor ganancia de modularidad, hasta que una pasada no produce movimientos.
+    Los pesos hacia cada comunidad vecina se acumulan en un buffer denso preasignado (neigh_weight),
+    que se limpia solo en las posiciones tocadas.
+    Controles de convergencia:
+      - seed: si no es None, los nodos se visitan en un orden aleatorio reproducible (se reetiqueta el
+        grafo con esa permutación, de modo que la lectura por bloques sigue siendo secuencial).
+      - active_queue: cada pasada solo revisita los nodos cuyo vecindario cambió en la anterior.
+      - min_moved_fraction / min_pass_gain: se detiene si una pasada mueve menos de esa fracción de
+        nodos o el ΔQ de la pasada no la supera.
+      - should_stop: si devuelve True (se comprueba en cada bloque de nodos), termina la fase local.
+    Devuelve (community, movimientos_totales).
+    """
+    n = len(degrees)
+    order = None
+    if seed is not None:
+        order = np.random.default_rng(seed).permutation(n)
+        indptr, indices, weights = _permute(indptr, indices, weights, order)
+        degrees = degrees[order]
+    community = list(range(n))
+    k = degrees.tolist()
+    comm_tot = list(k) # Σ_tot de cada comunidad
+    neigh_weight = [-1.0] * n # -1 indica "comunidad no tocada" para este nodo
+    active = [True] * n
+    total_moves = 0
+
+    for pass_num in range(1, max_passes + 1):
+        moves = 0
+        pass_gain = 0.0
+        stopped = False
+        for block_start in range(0, n, _BLOCK_NODES):
+            if should_stop is not None and should_stop():
+                stopped = True
+                break
+            block_end = min(block_start + _BLOCK_NODES, n)
+            if active_queue and not any(active[block_start:block_end]):
+                continue
+            offset = int(indptr[block_start])
+            block_ptr = (indptr[block_start:block_end + 1] - offset).tolist()
+            block_indices = indices[offset:int(indptr[block_end])].tolist()
+            block_weights = weights[offset:int(indptr[block_end])].tolist()
+
+            for local_i in range(block_end - block_start):
+                i = block_start + local_i
+                if active_queue:
+                    if not active[i]:
+                        continue
+                    active[i] = False
+                lo, hi = block_ptr[local_i], block_ptr[local_i + 1]
+                ci = community[i]
+                ki = k[i]
+
+                # Pesos de i hacia cada comunidad vecina (sin contar su auto-bucle)
+                neigh_weight[ci] = 0.0
+                touched = [ci]
+                for j, w in zip(block_indices[lo:hi], block_weights[lo:hi]):
+                    if j == i:
+                        continue
+                    cj = community[j]
+                    if neigh_weight[cj] < 0:
+                        neigh_weight[cj] = w
+                        touched.append(cj)
+                    else:
+                        neigh_weight[cj] += w
+
+                # Sacar i de su comunidad y elegir la mejor (incluida la suya) según k_i,C - Σ_tot_C·k_i/2m
+                comm_tot[ci] -= ki
+                best_comm = ci
+                stay_gain = best_gain = neigh_weight[ci] - comm_tot[ci] * ki / m2
+                for c in touched:
+                    gain = neigh_weight[c] - comm_tot[c] * ki / m2
+                    if gain > best_gain + min_gain:
+                        best_gain = gain
+                        best_comm = c
+                    neigh_weight[c] = -1.0
+                comm_tot[best_comm] += ki
+
+                if best_comm != ci:
+                    community[i] = best_comm
+                    moves += 1
+                    pass_gain += best_gain - stay_gain
+                    if active_queue:
+                        for j in block_indices[lo:hi]:
+                            active[j] = True
+
+        total_moves += moves
+        pass_gain *= 2 / m2 # ΔQ real de la pasada
+        logging.debug(f"Louvain CSR, pasada {pass_num}: {moves} nodos movidos, ganancia {pass_gain:.2e}.")
+        if moves == 0 or stopped:
+            break
+        if moves / n < min_moved_fraction or pass_gain <= min_pass_gain:
+            logging.debug(f"Louvain CSR: fase local detenida por umbral en la pasada {pass_num}.")
+            break
+
+    community = np.asarray(community, dtype=np.int64)
+    if order is not None:
+        # Volver a la numeración original de los nodos (las etiquetas de comunidad siguen siendo válidas)
+        original_community = np.empty(n, dtype=np.int64)
+        original_community[order] = community
+        community = original_community
+    return community, total_moves
+
+# --- Fase local en paralelo (clases de color) ---
+
+def _color_classes(indptr, indices, seed=0):
+    """
+    Reparte los nodos en clases de color (conjuntos independientes) con el esquema de Jones-Plassmann:
+    en cada ronda, los nodos sin color cuya prioridad aleatoria supera a la de todos sus vecinos sin color
+    forman una nueva clase. Dos nodos de la misma clase nunca son vecinos.
+    Devuelve una lista de arrays ordenados de índices de nodo, uno por clase.
+    """
+    n = len(indptr) - 1
+    priority = np.random.default_rng(seed).permutation(n)
+    row = _row_of_edges(indptr)
+    not_loop = row != indices
+    row, col = row[not_loop], indices[not_loop]
+    color = np.full(n, -1, dtype=np.int64)
+    uncolored = np.ones(n, dtype=bool)
+    num_colors = 0
+    while uncolored.any():
+        alive = uncolored[row] & uncolored[col]
+        row, col = row[alive], col[alive]
+        beaten = np.zeros(n, dtype=bool)
+        beaten[row[priority[col] > priority[row]]] = True
+        winners = uncolored & ~beaten
+        color[winners] = num_colors
+        uncolored[winners] = False
+        num_colors += 1
+    order = np.argsort(color, kind='stable')
+    boundaries = np.cumsum(np.bincount(color, minlength=num_colors))[:-1]
+    return np.split(order, boundaries)
+
+def _propose_moves(nodes, indptr, indices, weights, degrees, community, comm_tot, m2, min_gain):
+    """
+    Evalúa de forma vectorizada el mejor movimiento de cada nodo de `nodes` con el estado actual
+    (community, comm_tot). Devuelve (nodos_que_se_mueven, comunidad_destino).
+    """
+    n = len(community)
+    offsets, counts = _edge_offsets(indptr, nodes)
+    if len(offsets) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    owner = np.repeat(np.arange(len(nodes), dtype=np.int64), counts)
+    neighbors = indices[offsets]
+    not_loop = neighbors != nodes[owner]
+    owner, neighbors, w = owner[not_loop], neighbors[not_loop], weights[offsets][not_loop]
+
+    # Peso de cada nodo hacia cada comunidad vecina, agrupando por la clave (nodo, comunidad)
+    keys, inverse = np.unique(owner * n + community[neighbors], return_inverse=True)
+    w_to_comm = np.bincount(inverse, weights=w)
+    key_owner, key_comm = keys // n, keys % n
+
+    own_comm = community[nodes]
+    k = degrees[nodes]
+    in_own = key_comm == own_comm[key_owner]
+    tot = comm_tot[key_comm] - np.where(in_own, k[key_owner], 0.0) # Σ_tot sin el propio nodo
+    gain = w_to_comm - tot * k[key_owner] / m2
+    stay_gain = -(comm_tot[own_comm] - k) * k / m2
+    stay_gain[key_owner[in_own]] = gain[in_own]
+
+    # Mejor comunidad de cada nodo (mayor ganancia; a igualdad, la de menor ID)
+    order = np.lexsort((-gain, key_owner))
+    first = order[np.r_[True, key_owner[order][1:] != key_owner[order][:-1]]]
+    best_owner, best_comm, best_gain = key_owner[first], key_comm[first], gain[first]
+    move = (best_comm != own_comm[best_owner]) & (best_gain > stay_gain[best_owner] + min_gain)
+    return nodes[best_owner[move]], best_comm[move]
+
+_louvain_worker_state = None # Arrays del nivel (estáticos) y estado compartido de cada proceso del pool
+
+def _init_louvain_worker(indptr, indices, weights, degrees, shared_community, shared_comm_tot, m2, min_gain):
+    global _louvain_worker_state
+    _louvain_worker_state = (indptr, indices, weights, degrees,
+                             np.frombuffer(shared_community, dtype=np.int64),
+                             np.frombuffer(shared_comm_tot, dtype=np.float64), m2, min_gain)
+
+def _propose_moves_task(nodes):
+    """Tarea del pool: propone movimientos para un trozo de una clase de color con el estado compartido."""
+    indptr, indices, weights, degrees, community, comm_tot, m2, min_gain = _louvain_worker_state
+    return _propose_moves(nodes, indptr, indices, weights, degrees, community, comm_tot, m2, min_gain)
+
+def _local_moving_parallel(indptr, indices, weights, degrees, m2, n_workers, max_passes=30,
+                           min_modularity_gain=1e-7, seed=0, active_queue=True, min_moved_fraction=0.0,
+                           min_gain=1e-12, should_stop=None):
+    """
+    Fase 1 de Louvain en paralelo. Los nodos se agrupan en clases de color (sin vecinos entre sí);
+    dentro de cada clase, los movimientos se evalúan a la vez repartidos en un pool de procesos y se
+    aplican juntos. Como los nodos de una clase no son vecinos, sus pesos hacia cada comunidad son
+    exactos; solo Σ_tot puede quedar desfasado entre nodos que eligen la misma comunidad.
+    Contra las oscilaciones: cada pasada debe mejorar la modularidad en más de min_modularity_gain;
+    si empeora, se restaura la partición anterior y se termina.
+    active_queue, min_moved_fraction y should_stop funcionan como en _local_moving; seed fija el coloreado.
+    Devuelve (community, movimientos_totales), igual que _local_moving.
+    """
+    n = len(degrees)
+    shared_community = multiprocessing.RawArray('q', n)
+    shared_comm_tot = multiprocessing.RawArray('d', n)
+    community = np.frombuffer(shared_community, dtype=np.int64)
+    comm_tot = np.frombuffer(shared_comm_tot, dtype=np.float64)
+    community[:] = np.arange(n)
+    comm_tot[:] = degrees
+    color_classes = _color_classes(indptr, indices, seed)
+    logging.info(f"Louvain CSR paralelo: {len(color_classes)} clases de color, {n_workers} procesos.")
+
+    modularity = _modularity(indptr, indices, weights, degrees, community, m2)
+    total_moves = 0
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_louvain_worker,
+                             initargs=(indptr, indices, weights, degrees, shared_community,
+                                       shared_comm_tot, m2, min_gain)) as executor:
+        for pass_num in range(1, max_passes + 1):
+            if should_stop is not None and should_stop():
+                break
+            previous_community = community.copy()
+            moves = 0
+            active = np.ones(n, dtype=bool) if pass_num == 1 or not active_queue else next_active
+            next_active = np.zeros(n, dtype=bool)
+            for class_nodes in color_classes:
+                if active_queue:
+                    class_nodes = class_nodes[active[class_nodes]]
+                if len(class_nodes) >= _PARALLEL_MIN_CLASS_NODES:
+                    chunks = np.array_split(class_nodes, n_workers * 4)
+                    proposals = list(executor.map(_propose_moves_task, chunks))
+                    moved = np.concatenate([p[0] for p in proposals])
+                    targets = np.concatenate([p[1] for p in proposals])
+                else:
+                    moved, targets = _propose_moves(class_nodes, indptr, indices, weights, degrees,
+                                                    community, comm_tot, m2, min_gain)
+                if len(moved) == 0:
+                    continue
+                # Aplicar los movimientos de la clase de una vez (en el array compartido con los procesos)
+                moved_degrees = degrees[moved]
+                comm_tot -= np.bincount(community[moved], weights=moved_degrees, minlength=n)
+                comm_tot += np.bincount(targets, weights=moved_degrees, minlength=n)
+                community[moved] = targets
+                moves += len(moved)
+                if active_queue:
+                    # Los vecinos de los nodos movidos se revisan en esta pasada (si su clase aún no
+                    # se procesó) o en la siguiente
+                    neighbors = indices[_edge_offsets(indptr, moved)[0]]
+                    active[neighbors] = True
+                    next_active[neighbors] = True
+
+            new_modularity = _modularity(indptr, indices, weights, degrees, community, m2)
+            logging.debug(f"Louvain CSR paralelo, pasada {pass_num}: {moves} nodos movidos, modularidad {new_modularity:.6f}.")
+            if new_modularity < modularity:
+                community[:] = previous_community # Pasada perjudicial (Σ_tot desfasado): se descarta
+                break
+            total_moves += moves
+            gain = new_modularity - modularity
+            modularity = new_modularity
+            if moves == 0 or gain <= min_modularity_gain or moves / n < min_moved_fraction:
+                break
+    return community.copy(), total_moves
+
+def _aggregate(indptr, indices, weights, community):
+    """
+    Fase 2 de Louvain: colapsa cada comunidad en un nodo. Las aristas se agrupan por la clave
+    (comunidad_origen, comunidad_destino) con np.unique/bincount; el peso interno de cada
+    comunidad queda como auto-bucle. Devuelve (indptr, indices, weights) del grafo agregado.
+    """
+    num_comms = int(community.max()) + 1
+    keys = community[_row_of_edges(indptr)] * num_comms + community[indices]
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    new_weights = np.bincount(inverse, weights=weights)
+    new_src = unique_keys // num_comms
+    new_indices = unique_keys % num_comms
+    new_indptr = np.zeros(num_comms + 1, dtype=np.int64)
+    np.cumsum(np.bincount(new_src, minlength=num_comms), out=new_indptr[1:])
+    return new_indptr, new_indices, new_weights
+
+def louvain_csr(csr, max_passes=30, min_modularity_gain=1e-7, n_workers=1, random_state=None,
+                active_queue=True, min_moved_fraction=0.0, min_pass_gain=0.0, should_stop=None, weighted=True):
+    """
+    Louvain sobre un CSRGraph (se usa su versión no dirigida), con los nodos reetiquetados a 0..n-1.
+    Con n_workers > 1, la fase local de los niveles grandes se ejecuta en paralelo (_local_moving_parallel).
+    random_state, active_queue, min_moved_fraction y min_pass_gain controlan la convergencia de la fase
+    local (ver _local_moving); should_stop() la interrumpe y se devuelve la mejor partición hasta entonces.
+    Con weighted=False cada arista pesa 1 (los pesos del grafo, p. ej. km, no se leen como fuerza del vínculo).
+    Devuelve (community, modularity): community[i] es la comunidad (0..k-1) del nodo csr.node_ids[i].
+    """
+    indptr, indices, weights = _undirected_arrays(csr, weighted)
+    n = len(indptr) - 1
+    node_community = np.arange(n, dtype=np.int64)
+    if n == 0:
+        return node_community, 0.0
+    degrees = np.bincount(_row_of_edges(indptr), weights=weights, minlength=n)
+    m2 = float(weights.sum()) # 2m
+    if m2 == 0: # Grafo sin aristas: cada nodo es su propia comunidad
+        return node_community, 0.0
+
+    best_modularity = _modularity(indptr, indices, weights, degrees, node_community, m2)
+    level = 0
+    while True:
+        level += 1
+        level_seed = None if random_state is None else random_state + level
+        if n_workers > 1 and len(degrees) >= _PARALLEL_MIN_NODES:
+            level_community, moves = _local_moving_parallel(
+                indptr, indices, weights, degrees, m2, n_workers, max_passes,
+                max(min_modularity_gain, min_pass_gain), level_seed or 0, active_queue, min_moved_fraction,
+                should_stop=should_stop)
+        else:
+            level_community, moves = _local_moving(
+                indptr, indices, weights, degrees, m2, max_passes, seed=level_seed, active_queue=active_queue,
+                min_moved_fraction=min_moved_fraction, min_pass_gain=min_pass_gain, should_stop=should_stop)
+        if moves == 0:
+            logging.info(f"Louvain CSR Nivel {level}: ningún nodo se movió. Deteniendo.")
+            break
+        # Reetiquetar las comunidades del nivel a 0..k-1 y proyectarlas sobre los nodos originales
+        _, level_community = np.unique(level_community, return_inverse=True)
+        modularity = _modularity(indptr, indices, weights, degrees, level_community, m2)
+        logging.info(f"Louvain CSR Nivel {level}: {len(degrees)} nodos, {moves} movimientos, modularidad {modularity:.6f}")
+        if modularity - best_modularity <= min_modularity_gain:
+            break
+        best_modularity = modularity
+        node_community = level_community[node_community]
+
+        indptr, indices, weights = _aggregate(indptr, indices, weights, level_community)
+        degrees = np.bincount(level_community, weights=degrees)
+        if len(degrees) == 1 or (should_stop is not None and should_stop()):
+            break
+
+    logging.info(f"Louvain CSR finalizado. Modularidad: {best_modularity:.6f}, {int(node_community.max()) + 1} comunidades.")
+    return node_community, best_modularity
+
+def detect_communities_louvain_csr(csr, max_passes=30, min_modularity_gain=1e-7, n_workers=1, random_state=None,
+                                   active_queue=True, min_moved_fraction=0.0, min_pass_gain=0.0, should_stop=None,
+                                   weighted=True):
+    """
+    Variante de algorithms.detect_communities_louvain para CSRGraph.
+    Devuelve la partición {node_id: community_id} que espera GraphAnalyzer.detect_communities.
+    """
+    if csr.number_of_nodes() == 0:
+        return {}
+    community, _ = louvain_csr(csr, max_passes, min_modularity_gain, n_workers, random_state,
+                               active_queue, min_moved_fraction, min_pass_gain, should_stop, weighted)
+    return dict(zip(csr.node_ids.tolist(), community.tolist()))
@@ -0,0 +1,433 @@
+import json
+import numpy as np
+from location_store import SpatialIndex
+
+# Paleta de colores de las comunidades: cada comunidad usa PALETTE[índice % len(PALETTE)]
+COMMUNITY_PALETTE = ['#e6194b', '#3cb44b', '#4363d8', '#f58231', '#911eb4', '#46f0f0',
+                     '#f032e6', '#bcf60c', '#008080', '#9a6324', '#800000', '#000075']
+DEFAULT_NODE_COLOR = '#2874A6'
+
+def grid_aggregate(lat, lng, labels, cell_deg):
+    """
+    Agrega puntos en celdas de una rejilla de cell_deg grados, de forma vectorizada.
+    Devuelve un dict de arrays, uno por celda ocupada y ordenados por clave de celda:
+    'key' (fila * columnas + columna), 'count', 'lat'/'lng' (centroide de los puntos) y 'label'
+    (comunidad dominante de la celda, -1 si ninguno de sus puntos tiene comunidad); además 'point_cell',
+    la celda de cada punto, para recalcular las comunidades con dominant_labels sin volver a agregar.
+    """
+    num_cols = int(np.ceil(360.0 / cell_deg))
+    rows = np.floor((np.asarray(lat) + 90.0) / cell_deg).astype(np.int64)
+    cols = np.clip(np.floor((np.asarray(lng) + 180.0) / cell_deg).astype(np.int64), 0, num_cols - 1)
+    keys = rows * num_cols + cols
+    cell_keys, cell_index, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    num_cells = len(cell_keys)
+    cell_lat = np.bincount(cell_index, weights=lat, minlength=num_cells) / np.maximum(counts, 1)
+    cell_lng = np.bincount(cell_index, weights=lng, minlength=num_cells) / np.maximum(counts, 1)
+    cell_index = cell_index.astype(np.int32)
+    return {'key': cell_keys, 'count': counts, 'lat': cell_lat, 'lng': cell_lng,
+            'label': dominant_labels(cell_index, num_cells, labels), 'point_cell': cell_index}
+
+def dominant_labels(point_cell, num_cells, labels):
+    """Comunidad más frecuente de cada celda (-1 si ninguno de sus puntos tiene comunidad)."""
+    # Contar pares (celda, comunidad) y quedarse con el más frecuente de cada celda
+    dominant = np.full(num_cells, -1, dtype=np.int64)
+    labels = np.asarray(labels, dtype=np.int64)
+    cell_index = np.asarray(point_cell, dtype=np.int64)
+    labelled = labels >= 0
+    if labelled.any():
+        num_labels = int(labels.max()) + 1
+        pairs, pair_counts = np.unique(cell_index[labelled] * num_labels + labels[labelled], return_counts=True)
+        pair_cells = pairs // num_labels
+        order = np.lexsort((-pair_counts, pair_cells)) # Por celda y, dentro de ella, de más a menos frecuente
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = pair_cells[order][1:] != pair_cells[order][:-1]
+        winners = order[first]
+        dominant[pair_cells[winners]] = pairs[winners] % num_labels
+    return dominant
+
+def compact_point_rows(node_ids, lat, lng, labels, max_points=None, decimals=5):
+    """
+    Filas compactas [lat, lng, comunidad, id] para dibujar los nodos desde un único array de JS.
+    `comunidad` es el índice en la tabla de colores (-1 sin comunidad). Si hay más de max_points nodos
+    se agregan en una rejilla (cada vez más gruesa hasta no superar max_points celdas) y la fila de
+    cada celda lleva -nº de nodos en lugar del id: el tamaño del mapa queda acotado por max_points.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    if max_points is None or len(node_ids) <= max_points:
+        columns = (np.round(lat, decimals), np.round(lng, decimals), np.asarray(labels), np.asarray(node_ids))
+    else:
+        cell_deg = 0.01
+        cells = grid_aggregate(lat, lng, labels, cell_deg)
+        while len(cells['key']) > max_points:
+            cell_deg *= 2
+            cells = grid_aggregate(lat, lng, labels, cell_deg)
+        columns = (np.round(cells['lat'], decimals), np.round(cells['lng'], decimals), cells['label'], -cells['count'])
+    return _rows(columns)
+
+def _rows(columns):
+    """Filas [lat, lng, comunidad, id] a partir de sus columnas (arrays paralelos)."""
+    return [list(row) for row in zip(*(column.tolist() for column in columns))]
+
+def _lng_in_range(lng, west, east):
+    """Máscara de longitudes dentro de [west, east], admitiendo vistas que cruzan el antimeridiano."""
+    if east - west >= 360.0:
+        return np.ones(len(lng), dtype=bool)
+    west = (west + 180.0) % 360.0 - 180.0
+    east = (east + 180.0) % 360.0 - 180.0
+    if west <= east:
+        return (lng >= west) & (lng <= east)
+    return (lng >= west) | (lng <= east)
+
+class GridPyramid:
+    """
+    Agregado espacial multirresolución de los nodos del mapa: para cada zoom 0..node_zoom-1 una rejilla
+    (grid_aggregate) con el número de nodos y la comunidad dominante de cada celda ocupada. Las celdas
+    miden cell_px píxeles en pantalla en su zoom (360 / 2**z * cell_px / 256 grados).
+    view() devuelve solo lo que cae en la vista: celdas a zoom bajo y nodos individuales desde node_zoom
+    (o antes, si en la vista hay como mucho sparse_nodes), siempre con a lo sumo max_items filas.
+    Se construye con las columnas de GraphAnalyzer.get_map_nodes(). La geometría se calcula una vez;
+    las comunidades (colores) se cambian sin volver a agregar: compute_labelling() calcula el nuevo
+    etiquetado completo sin tocar la pirámide (p. ej. en un hilo de trabajo) y apply_labelling() lo
+    sustituye con una sola asignación, de modo que view() siempre ve un etiquetado coherente aunque se
+    llame desde otros hilos. Los nodos de la vista se buscan con un SpatialIndex sobre los mismos arrays
+    (p. ej. GraphAnalyzer.get_spatial_index()).
+    """
+    def __init__(self, node_ids, lat, lng, labels, community_ids=(), node_zoom=12, cell_px=32, max_items=5000,
+                 sparse_nodes=1000, decimals=5, spatial_index=None):
+        self.node_ids = np.asarray(node_ids)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.spatial_index = spatial_index if spatial_index is not None else SpatialIndex(node_ids, lat, lng)
+        self.node_zoom = node_zoom
+        self.max_items = max_items
+        self.sparse_nodes = sparse_nodes
+        self.decimals = decimals
+        self.base_cell_deg = 360.0 * cell_px / 256.0
+        labels = np.asarray(labels, dtype=np.int64)
+        self.levels = [grid_aggregate(self.lat, self.lng, labels, self.cell_deg(zoom)) for zoom in range(node_zoom)]
+        # (comunidad de cada nodo, ID de comunidad de cada índice (para los popups), comunidad dominante de
+        # las celdas de cada nivel): se sustituye entero, nunca se modifica en su sitio
+        self._labelling = (labels, list(community_ids), [cells['label'] for cells in self.levels])
+
+    def cell_deg(self, zoom):
+        return self.base_cell_deg / 2 ** zoom
+
+    @property
+    def labels(self):
+        return self._labelling[0]
+
+    @property
+    def community_ids(self):
+        return self._labelling[1]
+
+    def compute_labelling(self, labels, community_ids):
+        """
+        Etiquetado para unas comunidades nuevas (labels alineadas con los node_ids de construcción): la
+        comunidad dominante de cada celda de cada nivel. No modifica la pirámide; se aplica con apply_labelling().
+        """
+        labels = np.asarray(labels, dtype=np.int64)
+        level_labels = [dominant_labels(cells['point_cell'], len(cells['key']), labels) for cells in self.levels]
+        return (labels, list(community_ids), level_labels)
+
+    def apply_labelling(self, labelling):
+        """Sustituye el etiquetado por uno de compute_labelling() con una sola asignación."""
+        self._labelling = labelling
+
+    def set_labels(self, labels, community_ids):
+        """Nuevas comunidades (alineadas con los node_ids de construcción): recalcula la dominante de cada celda."""
+        self.apply_labelling(self.compute_labelling(labels, community_ids))
+
+    def view(self, zoom, west, south, east, north):
+        """
+        Contenido de la vista [west, east] x [south, north] a ese zoom:
+        {'kind': 'nodes' | 'cells', 'zoom': nivel usado, 'rows': filas [lat, lng, comunidad, id | -nº de nodos]}.
+        """
+        zoom = max(int(zoom), 0)
+        labels, _, level_labels = self._labelling # Un único etiquetado para toda la respuesta
+        in_view = self.spatial_index.bbox_positions(west, south, east, north)
+        if len(in_view) <= self.max_items and (zoom >= self.node_zoom or len(in_view) <= self.sparse_nodes):
+            columns = (np.round(self.lat[in_view], self.decimals), np.round(self.lng[in_view], self.decimals),
+                       labels[in_view], self.node_ids[in_view])
+            return {'kind': 'nodes', 'zoom': zoom, 'rows': _rows(columns)}
+
+        # Demasiados nodos: celdas del nivel del zoom (o más gruesas si aun así no caben)
+        level = min(zoom, self.node_zoom - 1)
+        while True:
+            cells = self.levels[level]
+            visible = np.flatnonzero((cells['lat'] >= south) & (cells['lat'] <= north) &
+                                     _lng_in_range(cells['lng'], west, east))
+            if len(visible) <= self.max_items or level == 0:
+                break
+            level -= 1
+        visible = visible[:self.max_items]
+        columns = (np.round(cells['lat'][visible], self.decimals), np.round(cells['lng'][visible], self.decimals),
+                   level_labels[level][visible], -cells['count'][visible])
+        return {'kind': 'cells', 'zoom': level, 'rows': _rows(columns)}
+
+def community_color_lut(num_communities):
+    """Color de cada índice de comunidad (tabla pequeña: la paleta se repite cíclicamente)."""
+    return [COMMUNITY_PALETTE[i % len(COMMUNITY_PALETTE)] for i in range(min(num_communities, len(COMMUNITY_PALETTE)))]
+
+def lookup_tables(community_ids):
+    """Tablas que usa fast_marker_callback_js: colores por índice de comunidad e ID real de cada comunidad."""
+    return {'colors': community_color_lut(len(community_ids)), 'ids': [int(c) for c in community_ids]}
+
+def lookup_tables_script(community_ids):
+    """
+    <script> con las tablas globales de lookup_tables (NODE_COLORS, COMMUNITY_IDS) y el color por defecto.
+    Se emite una sola vez por mapa, no por nodo.
+    """
+    tables = lookup_tables(community_ids)
+    return ("<script>"
+            f"var NODE_COLORS = {json.dumps(tables['colors'])};"
+            f"var COMMUNITY_IDS = {json.dumps(tables['ids'])};"
+            f"var DEFAULT_NODE_COLOR = {json.dumps(DEFAULT_NODE_COLOR)};"
+            "</script>")
+
+def fast_marker_callback_js():
+    """
+    Función JS para FastMarkerCluster: crea un circleMarker por fila [lat, lng, comunidad, id] con el color
+    de la tabla NODE_COLORS, y construye el popup solo al hacer clic (no se serializa HTML por nodo).
+    """
+    return """function (row) {
+    var color = row[2] >= 0 ? NODE_COLORS[row[2] % NODE_COLORS.length] : DEFAULT_NODE_COLOR;
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]),
+                                {radius: row[3] < 0 ? 4 + 2 * Math.log10(-row[3]) : 3, color: color, fillColor: color, fill: true, fillOpacity: 0.6});
+    marker.on('click', function () {
+        var text = row[3] >= 0 ? 'Nodo ID: ' + row[3] : (-row[3]) + ' nodos agrupados';
+        text += '<br>Lat: ' + row[0] + ', Lng: ' + row[1];
+        if (row[2] >= 0) { text += '<br>Comunidad: ' + COMMUNITY_IDS[row[2]]; }
+        marker.bindPopup(text, {maxWidth: 200}).openPopup();
+    });
+    return marker;
+}"""
+
+def viewport_loader_js(map_name):
+    """
+    JS de la página servida por MapServer: en cada movimiento del mapa `map_name` pide /view con el zoom
+    y los límites visibles y redibuja solo esas filas (con fast_marker_callback_js). Por /updates (espera
+    larga) recibe solo lo que cambia: capas superpuestas nuevas o retiradas, tablas de colores de las
+    comunidades (redibuja la vista) o un mapa base nuevo (recarga la página). De cada capa se dibujan las
+    Features de su rango de zoom (min_zoom/max_zoom, ver edge_set_features); si la capa anuncia 'detail',
+    desde ese zoom se pide además su detalle completo de la vista a /segments en cada movimiento. Un clic en el mapa muestra
+    el nodo más cercano (/nearest), para usarlo como extremo de un camino.
+    Se ejecuta en 'load', cuando el mapa de Leaflet ya existe.
+    """
+    return """window.addEventListener('load', function () {
+    var map = """ + map_name + """;
+    var makeMarker = """ + fast_marker_callback_js() + """;
+    var nodeLayer = L.layerGroup().addTo(map);
+    var overlays = {}, overlayData = {}, overlayKeys = {}, detailLayers = {}, detailRequests = {};
+    var lastRequest = 0, revision = 0, pageRevision = null;
+    function viewQuery() {
+        var bounds = map.getBounds();
+        return 'z=' + map.getZoom() + '&west=' + bounds.getWest() + '&south=' + bounds.getSouth() +
+               '&east=' + bounds.getEast() + '&north=' + bounds.getNorth();
+    }
+    function refresh() {
+        var request = ++lastRequest;
+        fetch('/view?' + viewQuery()).then(function (response) { return response.json(); }).then(function (view) {
+            if (request !== lastRequest) { return; } // Respuesta de una vista anterior
+            nodeLayer.clearLayers();
+            view.rows.forEach(function (row) { nodeLayer.addLayer(makeMarker(row)); });
+        });
+    }
+    function inZoom(feature, zoom) {
+        var properties = feature.properties;
+        return (properties.min_zoom == null || zoom >= properties.min_zoom) &&
+               (properties.max_zoom == null || zoom <= properties.max_zoom);
+    }
+    function zoomKey(geojson, zoom) { // Qué Features de la capa tocan a este zoom
+        return geojson.features.map(function (feature, i) { return inZoom(feature, zoom) ? i : ''; }).join(',');
+    }
+    function drawOverlay(name) {
+        if (overlays[name]) { map.removeLayer(overlays[name]); delete overlays[name]; }
+        var geojson = overlayData[name], zoom = map.getZoom();
+        if (!geojson) { return; }
+        overlayKeys[name] = zoomKey(geojson, zoom);
+        overlays[name] = L.geoJSON(geojson, {
+            filter: function (feature) { return inZoom(feature, zoom); },
+            style: function (feature) { return feature.properties.style; },
+            pointToLayer: function (feature, latlng) { return L.circleMarker(latlng, feature.properties.style); },
+            onEachFeature: function (feature, layer) {
+                if (feature.properties.popup) { layer.bindPopup(feature.properties.popup); }
+            }
+        }).addTo(map);
+    }
+    function refreshDetail(name) { // Detalle completo de la capa en la vista actual
+        var geojson = overlayData[name], request = detailRequests[name] = (detailRequests[name] || 0) + 1;
+        if (!geojson || !geojson.detail || map.getZoom() < geojson.detail.min_zoom) {
+            if (detailLayers[name]) { map.removeLayer(detailLayers[name]); delete detailLayers[name]; }
+            return;
+        }
+        var query = 'name=' + encodeURIComponent(name) + '&' + viewQuery();
+        fetch('/segments?' + query).then(function (response) { return response.json(); }).then(function (segments) {
+            if (request !== detailRequests[name]) { return; } // Respuesta de una vista anterior
+            if (detailLayers[name]) { map.removeLayer(detailLayers[name]); }
+            detailLayers[name] = L.geoJSON(segments, {
+                style: function (feature) { return feature.properties.style; }
+            }).addTo(map);
+        });
+    }
+    function setOverlay(name, geojson) {
+        overlayData[name] = geojson;
+        drawOverlay(name);
+        refreshDetail(name);
+    }
+    function poll() {
+        fetch('/updates?since=' + revision).then(function (response) { return response.json(); }).then(function (update) {
+            if (pageRevision === null) { pageRevision = update.base; }
+            if (update.base !== pageRevision) { window.location.reload(); return; }
+            revision = update.revision;
+            Object.keys(update.overlays).forEach(function (name) { setOverlay(name, update.overlays[name]); });
+            if (update.tables) {
+                NODE_COLORS = update.tables.colors;
+                COMMUNITY_IDS = update.tables.ids;
+                refresh();
+            }
+            poll();
+        }).catch(function () { setTimeout(poll, 2000); }); // Servidor parado o reiniciándose
+    }
+    map.on('click', function (event) {
+        var query = 'lat=' + event.latlng.lat + '&lng=' + event.latlng.lng;
+        fetch('/nearest?' + query).then(function (response) { return response.json(); }).then(function (result) {
+            if (!result.nodes.length) { return; }
+            var node = result.nodes[0];
+            L.popup().setLatLng([node[1], node[2]])
+                .setContent('Nodo más cercano: ' + node[0] + ' (' + node[3].toFixed(2) + ' km)' +
+                            '<br>En la búsqueda de caminos: ' + node[0] + ' o @' + event.latlng.lat.toFixed(5) +
+                            ',' + event.latlng.lng.toFixed(5))
+                .openOn(map);
+        });
+    });
+    map.on('zoomend', function () { // Cambiar de nivel de simplificación solo si el zoom lo requiere
+        Object.keys(overlayData).forEach(function (name) {
+            if (overlayData[name] && zoomKey(overlayData[name], map.getZoom()) !== overlayKeys[name]) { drawOverlay(name); }
+        });
+    });
+    map.on('moveend', function () {
+        refresh();
+        Object.keys(overlayData).forEach(refreshDetail);
+    });
+    refresh();
+    poll();
+});"""
+
+def simplify_segments(lat1, lng1, lat2, lng2, cell_deg, max_segments=None):
+    """
+    Simplificación de un conjunto de segmentos para un zoom, vectorizada: los extremos se ajustan al centro
+    de celdas de cell_deg grados, se descartan los segmentos que quedan dentro de una sola celda (no se
+    verían) y los repetidos (en cualquier sentido) se funden en uno. Con max_segments se conservan los
+    que agrupan más aristas (los corredores principales). Devuelve (lat1, lng1, lat2, lng2).
+    """
+    num_cols = int(np.ceil(360.0 / cell_deg))
+    def cell_of(lat, lng):
+        rows = np.floor((np.asarray(lat, dtype=np.float64) + 90.0) / cell_deg).astype(np.int64)
+        cols = np.clip(np.floor((np.asarray(lng, dtype=np.float64) + 180.0) / cell_deg).astype(np.int64), 0, num_cols - 1)
+        return rows * num_cols + cols
+    a, b = cell_of(lat1, lng1), cell_of(lat2, lng2)
+    visible = a != b
+    a, b = np.minimum(a[visible], b[visible]), np.maximum(a[visible], b[visible]) # a-b y b-a: mismo segmento
+    # Segmentos únicos (pares de celdas) con su número de aristas, ordenando por (a, b)
+    order = np.lexsort((b, a))
+    a, b = a[order], b[order]
+    first = np.ones(len(a), dtype=bool)
+    first[1:] = (a[1:] != a[:-1]) | (b[1:] != b[:-1])
+    starts = np.flatnonzero(first)
+    counts = np.diff(np.append(starts, len(a)))
+    a, b = a[starts], b[starts]
+    if max_segments is not None and len(a) > max_segments:
+        keep = np.argsort(-counts, kind='stable')[:max_segments]
+        a, b = a[keep], b[keep]
+    center = lambda cells, axis: ((cells // num_cols if axis == 0 else cells % num_cols) + 0.5) * cell_deg
+    return center(a, 0) - 90.0, center(a, 1) - 180.0, center(b, 0) - 90.0, center(b, 1) - 180.0
+
+def _multiline_feature(columns, style, min_zoom=None, max_zoom=None, decimals=5):
+    """Feature MultiLineString con un segmento por fila de las columnas (lat1, lng1, lat2, lng2)."""
+    lat1, lng1, lat2, lng2 = (np.round(np.asarray(column, dtype=np.float64), decimals) for column in columns)
+    lines = np.stack([np.stack([lng1, lat1], axis=1), np.stack([lng2, lat2], axis=1)], axis=1).tolist()
+    return {'type': 'Feature', 'properties': {'style': style, 'min_zoom': min_zoom, 'max_zoom': max_zoom},
+            'geometry': {'type': 'MultiLineString', 'coordinates': lines}}
+
+def edge_set_features(lat1, lng1, lat2, lng2, style, simplify_below_zoom=0, pixel_tolerance=2.0, max_segments=20000,
+                      decimals=5, full_detail=True):
+    """
+    Conjunto de aristas (MST, etc.) como Features MultiLineString: una sola geometría para todas, en lugar
+    de un objeto por arista. Con simplify_below_zoom > 0 se añade además una versión simplificada
+    (simplify_segments con celdas de pixel_tolerance píxeles y a lo sumo max_segments segmentos) por cada
+    par de zooms por debajo de ese zoom; cada Feature lleva 'min_zoom'/'max_zoom' en sus propiedades y
+    la completa se ve desde simplify_below_zoom. Con full_detail=False no se incluye la completa (se sirve
+    por vista con un EdgeSetIndex).
+    """
+    columns = (lat1, lng1, lat2, lng2)
+    if simplify_below_zoom <= 0:
+        return [_multiline_feature(columns, style, decimals=decimals)] if full_detail else []
+    features = []
+    for zoom in range(0, simplify_below_zoom, 2):
+        # Tolerancia medida en el zoom más detallado del par (zoom + 1)
+        cell_deg = pixel_tolerance * 360.0 / 256.0 / 2 ** (zoom + 1)
+        features.append(_multiline_feature(simplify_segments(*columns, cell_deg, max_segments), style, zoom,
+                                           min(zoom + 1, simplify_below_zoom - 1), decimals))
+    if full_detail:
+        features.append(_multiline_feature(columns, style, simplify_below_zoom, None, decimals))
+    return features
+
+class EdgeSetIndex:
+    """
+    Aristas a detalle completo servidas por vista (MapServer /segments), para no enviar la geometría
+    entera al navegador: view() devuelve solo los segmentos que tocan la vista, a lo sumo max_segments
+    (los más largos), desde min_zoom. Los segmentos cortos (extensión <= short_deg grados) se buscan con
+    un SpatialIndex sobre su punto medio y la vista ampliada short_deg / 2; los largos, que son pocos,
+    se comprueban todos por solapamiento de su rectángulo con la vista.
+    """
+    def __init__(self, lat1, lng1, lat2, lng2, style, min_zoom=0, max_segments=20000, decimals=5, short_deg=0.5):
+        self.columns = tuple(np.asarray(column, dtype=np.float64) for column in (lat1, lng1, lat2, lng2))
+        lat1, lng1, lat2, lng2 = self.columns
+        self.style = style
+        self.min_zoom = min_zoom
+        self.max_segments = max_segments
+        self.decimals = decimals
+        self.short_deg = short_deg
+        self.length = np.hypot(lat2 - lat1, lng2 - lng1)
+        short = (np.abs(lat2 - lat1) <= short_deg) & (np.abs(lng2 - lng1) <= short_deg)
+        self.short = np.flatnonzero(short)
+        self.long = np.flatnonzero(~short)
+        self.spatial_index = SpatialIndex(self.short, (lat1[short] + lat2[short]) / 2.0,
+                                          (lng1[short] + lng2[short]) / 2.0, cell_deg=max(short_deg, 0.1))
+        self.long_box = (np.minimum(lat1, lat2)[self.long], np.maximum(lat1, lat2)[self.long],
+                         np.minimum(lng1, lng2)[self.long], np.maximum(lng1, lng2)[self.long])
+
+    def __len__(self):
+        return len(self.length)
+
+    def view(self, zoom, west, south, east, north):
+        """Segmentos de la vista como FeatureCollection (vacía por debajo de min_zoom)."""
+        if int(zoom) < self.min_zoom:
+            return feature_collection([])
+        pad = self.short_deg / 2.0
+        short = self.spatial_index.bbox(west - pad, south - pad, east + pad, north + pad)
+        min_lat, max_lat, min_lng, max_lng = self.long_box
+        overlap = (max_lat >= south) & (min_lat <= north)
+        if east - west < 360.0:
+            west = (west + 180.0) % 360.0 - 180.0
+            east = (east + 180.0) % 360.0 - 180.0
+            overlap &= ((max_lng >= west) & (min_lng <= east)) if west <= east else ((max_lng >= west) | (min_lng <= east))
+        segments = np.concatenate([short, self.long[overlap]])
+        if len(segments) > self.max_segments: # Los más largos: la estructura principal de la vista
+            segments = segments[np.argpartition(-self.length[segments], self.max_segments)[:self.max_segments]]
+        columns = tuple(column[segments] for column in self.columns)
+        return feature_collection([_multiline_feature(columns, self.style, decimals=self.decimals)] if len(segments) else [])
+
+def line_feature(coords, style):
+    """Feature GeoJSON LineString a partir de coordenadas (lat, lng)."""
+    return {'type': 'Feature', 'properties': {'style': style},
+            'geometry': {'type': 'LineString', 'coordinates': [[float(lng), float(lat)] for lat, lng in coords]}}
+
+def point_feature(lat, lng, style, popup=None):
+    """Feature GeoJSON Point (se dibuja como circleMarker con `style`)."""
+    return {'type': 'Feature', 'properties': {'style': style, 'popup': popup},
+            'geometry': {'type': 'Point', 'coordinates': [float(lng), float(lat)]}}
+
+def feature_collection(features):
+    return {'type': 'FeatureCollection', 'features': list(features)}
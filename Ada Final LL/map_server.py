@@ -0,0 +1,217 @@
+import json
+import logging
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+class _MapRequestHandler(BaseHTTPRequestHandler):
+    """Peticiones del navegador al mapa; el estado publicado está en self.server.map_server."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        map_server = self.server.map_server
+        if url.path == '/':
+            self._send(map_server.page_html().encode('utf-8'), 'text/html; charset=utf-8')
+        elif url.path in ('/view', '/segments'):
+            query = parse_qs(url.query)
+            try:
+                zoom = int(query['z'][0])
+                bbox = [float(query[name][0]) for name in ('west', 'south', 'east', 'north')]
+                name = query['name'][0] if url.path == '/segments' else None
+            except (KeyError, ValueError):
+                self.send_error(400, "Parámetros de vista inválidos")
+                return
+            if name is None:
+                self._send_json(map_server.view(zoom, *bbox))
+            else:
+                self._send_json(map_server.segments(name, zoom, *bbox))
+        elif url.path == '/nearest':
+            query = parse_qs(url.query)
+            try:
+                lat, lng = float(query['lat'][0]), float(query['lng'][0])
+                k = int(query.get('k', ['1'])[0])
+            except (KeyError, ValueError):
+                self.send_error(400, "Coordenadas inválidas")
+                return
+            self._send_json(map_server.nearest(lat, lng, k))
+        elif url.path == '/updates':
+            try:
+                since = int(parse_qs(url.query).get('since', ['0'])[0])
+            except ValueError:
+                self.send_error(400, "Revisión inválida")
+                return
+            self._send_json(map_server.updates(since))
+        else:
+            self.send_error(404)
+
+    def _send_json(self, payload):
+        self._send(json.dumps(payload, separators=(',', ':')).encode('utf-8'), 'application/json')
+
+    def _send(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Servidor del mapa: {format % args}")
+
+class MapServer:
+    """
+    Servidor HTTP local del mapa (solo 127.0.0.1). Se arranca una vez con la aplicación en un hilo daemon
+    y se actualiza sin escribir archivos ni reiniciarlo:
+      GET /          página del mapa (Leaflet), que pide al servidor solo lo que tiene a la vista
+      GET /view      ?z=&west=&south=&east=&north= -> filas de la vista desde un GridPyramid
+      GET /segments  ?name=&z=&west=&south=&east=&north= -> aristas a detalle completo de la capa `name`
+                     en la vista (GeoJSON, desde un EdgeSetIndex)
+      GET /nearest   ?lat=&lng=&k= -> los k nodos más cercanos [id, lat, lng, km] (índice espacial del GridPyramid)
+      GET /updates   ?since=revisión -> espera (hasta UPDATE_WAIT_S) a que haya cambios y devuelve solo
+                     esos: capas superpuestas (GeoJSON, null si se retiró), tablas de colores y la
+                     revisión del mapa base (si cambia, la página se recarga).
+    El mapa base (página y agregado de nodos) se publica una vez por carga de datos con publish_base();
+    caminos, MST, etc. son capas con nombre que se cambian con set_overlay() y cuestan solo sus bytes; una
+    capa puede llevar además su detalle completo como EdgeSetIndex, que la página pide por vista.
+    """
+    UPDATE_WAIT_S = 25.0
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self._address = (host, port) # Puerto 0: el sistema elige uno libre
+        self._httpd = None
+        self._thread = None
+        self._changed = threading.Condition()
+        self._revision = 0
+        self._base_revision = 0
+        self._page_html = "<p>Cargue datos para ver el mapa.</p>"
+        self._pyramid = None
+        self._tables = (0, None)  # (revisión, tablas de colores de las comunidades)
+        self._overlays = {}       # {nombre: (revisión, GeoJSON o None si se retiró)}
+        self._segments = {}       # {nombre: EdgeSetIndex con el detalle completo de la capa}
+        self._waiting = 0         # Esperas de /updates en curso: hay una página abierta
+        self._last_update = None  # Fin de la última espera atendida (time.monotonic)
+
+    def start(self):
+        if self._httpd is None:
+            self._httpd = ThreadingHTTPServer(self._address, _MapRequestHandler)
+            self._httpd.daemon_threads = True
+            self._httpd.map_server = self
+            self._thread = threading.Thread(target=self._httpd.serve_forever, name="map-server", daemon=True)
+            self._thread.start()
+            logging.info(f"Servidor del mapa escuchando en {self.url}")
+        return self
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def _bump(self):
+        """Nueva revisión (llamar con self._changed adquirido) y aviso a las esperas de /updates."""
+        self._revision += 1
+        self._changed.notify_all()
+        return self._revision
+
+    def publish_base(self, page_html, pyramid, tables=None):
+        """Nuevo mapa base: las páginas abiertas se recargan. Las capas superpuestas anteriores se retiran."""
+        with self._changed:
+            revision = self._bump()
+            self._page_html = page_html
+            self._pyramid = pyramid
+            self._base_revision = revision
+            self._tables = (revision, tables)
+            self._overlays = {name: (revision, None) for name in self._overlays}
+            self._segments = {}
+
+    def set_tables(self, tables):
+        """Nuevas tablas de colores de los nodos (p. ej. tras detectar comunidades): las páginas redibujan la vista."""
+        with self._changed:
+            self._tables = (self._bump(), tables)
+
+    def set_labelling(self, pyramid, labelling, tables):
+        """
+        Nuevas comunidades del mapa base: sustituye el etiquetado de `pyramid` (de GridPyramid.compute_labelling)
+        y las tablas de colores a la vez, bajo el candado del servidor. Se ignora si `pyramid` ya no es el
+        mapa base publicado.
+        """
+        with self._changed:
+            if pyramid is not self._pyramid:
+                return False
+            pyramid.apply_labelling(labelling)
+            self._tables = (self._bump(), tables)
+            return True
+
+    def set_overlay(self, name, geojson, segments=None):
+        """
+        Sustituye la capa superpuesta `name` (None la retira). Solo viaja esa capa. `segments` (EdgeSetIndex)
+        es su detalle completo: no viaja con la capa, la página lo pide por vista a /segments desde
+        segments.min_zoom (se anuncia en el miembro 'detail' del GeoJSON).
+        """
+        if geojson is not None and segments is not None:
+            geojson = dict(geojson, detail={'min_zoom': segments.min_zoom})
+        with self._changed:
+            self._overlays[name] = (self._bump(), geojson)
+            if segments is not None and geojson is not None:
+                self._segments[name] = segments
+            else:
+                self._segments.pop(name, None)
+
+    def page_html(self):
+        with self._changed:
+            return self._page_html
+
+    def view(self, zoom, west, south, east, north):
+        with self._changed:
+            pyramid = self._pyramid
+        if pyramid is None:
+            return {'kind': 'nodes', 'zoom': zoom, 'rows': []}
+        return pyramid.view(zoom, west, south, east, north)
+
+    def segments(self, name, zoom, west, south, east, north):
+        """Detalle completo de la capa `name` en la vista (FeatureCollection vacía si no tiene)."""
+        with self._changed:
+            segments = self._segments.get(name)
+        if segments is None:
+            return {'type': 'FeatureCollection', 'features': []}
+        return segments.view(zoom, west, south, east, north)
+
+    def nearest(self, lat, lng, k=1):
+        """Los k nodos más cercanos al punto (k entre 1 y 100) como filas [id, lat, lng, km]."""
+        with self._changed:
+            pyramid = self._pyramid
+        if pyramid is None:
+            return {'nodes': []}
+        positions, dist = pyramid.spatial_index.nearest_positions(lat, lng, min(max(k, 1), 100))
+        return {'nodes': [[int(pyramid.node_ids[p]), float(pyramid.lat[p]), float(pyramid.lng[p]), float(d)]
+                          for p, d in zip(positions.tolist(), dist.tolist())]}
+
+    def updates(self, since):
+        """Cambios posteriores a la revisión `since`; espera hasta UPDATE_WAIT_S si todavía no hay ninguno."""
+        with self._changed:
+            self._waiting += 1
+            try:
+                self._changed.wait_for(lambda: self._revision > since, timeout=self.UPDATE_WAIT_S)
+            finally:
+                self._waiting -= 1
+                self._last_update = time.monotonic()
+            tables_revision, tables = self._tables
+            return {
+                'revision': self._revision,
+                'base': self._base_revision,
+                'overlays': {name: geojson for name, (revision, geojson) in self._overlays.items() if revision > since},
+                'tables': tables if tables_revision > since else None,
+            }
+
+    def has_viewer(self, grace_s=5.0):
+        """Si hay alguna página del mapa abierta (esperando en /updates ahora o hace menos de grace_s)."""
+        with self._changed:
+            if self._waiting > 0:
+                return True
+            return self._last_update is not None and time.monotonic() - self._last_update < grace_s
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
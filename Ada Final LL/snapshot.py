@@ -0,0 +1,112 @@
+import os
+import json
+import shutil
+import logging
+import numpy as np
+import polars as pl
+
+# Se incrementa cuando cambia el contenido o la disposición de los snapshots, para invalidar los antiguos
+SNAPSHOT_FORMAT_VERSION = 2
+META_FILE = "meta.json"
+
+def source_signature(filepath: str):
+    """Identifica un archivo de entrada por ruta, tamaño y fecha de modificación."""
+    stat = os.stat(filepath)
+    return {'path': os.path.abspath(filepath), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def snapshot_key(source_paths, **params):
+    """
+    Construye la clave de un snapshot: firma de cada archivo de entrada más los parámetros
+    que afectan al resultado (p. ej. sample_size y seed).
+    """
+    return {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'sources': [source_signature(path) for path in source_paths],
+        'params': params,
+    }
+
+def _read_meta(snapshot_dir: str):
+    meta_path = os.path.join(snapshot_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Metadatos de snapshot ilegibles en {snapshot_dir}: {e}")
+        return None
+
+def is_fresh(snapshot_dir: str, key: dict):
+    """Indica si existe un snapshot completo en snapshot_dir generado con exactamente la misma clave."""
+    meta = _read_meta(snapshot_dir)
+    return meta is not None and meta.get('key') == key
+
+def _write_snapshot_dir(snapshot_dir: str, key: dict, write_contents, contents_meta=None):
+    """
+    Escribe el snapshot en un directorio temporal y lo mueve a su sitio al terminar, de modo que
+    un snapshot a medio escribir nunca se considere válido. meta.json se escribe al final.
+    """
+    tmp_dir = f"{snapshot_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    try:
+        write_contents(tmp_dir)
+        with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({'key': key, 'contents': contents_meta or {}}, f, indent=2)
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        os.replace(tmp_dir, snapshot_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def save_arrays(snapshot_dir: str, key: dict, arrays: dict, extra_meta=None):
+    """Guarda un dict {nombre: array de NumPy} como archivos .npy mapeables en memoria."""
+    def write_contents(tmp_dir):
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+    try:
+        _write_snapshot_dir(snapshot_dir, key, write_contents, {'arrays': sorted(arrays), **(extra_meta or {})})
+        logging.info(f"Snapshot guardado en {snapshot_dir}")
+        return True
+    except OSError as e:
+        logging.warning(f"No se pudo guardar el snapshot en {snapshot_dir}: {e}")
+        return False
+
+def load_arrays(snapshot_dir: str, key: dict, mmap=True):
+    """
+    Carga los arrays de un snapshot válido para `key` (mapeados en memoria, sin copia, si mmap=True).
+    Devuelve (arrays, metadatos_extra) o None si el snapshot no existe o está desactualizado.
+    """
+    if not is_fresh(snapshot_dir, key):
+        return None
+    contents = _read_meta(snapshot_dir)['contents']
+    try:
+        arrays = {name: np.load(os.path.join(snapshot_dir, f"{name}.npy"), mmap_mode='r' if mmap else None)
+                  for name in contents.get('arrays', [])}
+    except (OSError, ValueError) as e:
+        logging.warning(f"Snapshot corrupto en {snapshot_dir}, se ignorará: {e}")
+        return None
+    logging.info(f"Snapshot cargado desde {snapshot_dir}")
+    return arrays, contents
+
+def save_frame(snapshot_dir: str, key: dict, df: pl.DataFrame):
+    """Guarda un DataFrame de Polars como archivo Arrow IPC (mapeable en memoria)."""
+    try:
+        _write_snapshot_dir(snapshot_dir, key, lambda tmp_dir: df.write_ipc(os.path.join(tmp_dir, "data.arrow")))
+        logging.info(f"Snapshot guardado en {snapshot_dir}")
+        return True
+    except OSError as e:
+        logging.warning(f"No se pudo guardar el snapshot en {snapshot_dir}: {e}")
+        return False
+
+def load_frame(snapshot_dir: str, key: dict):
+    """Carga un DataFrame guardado con save_frame, o None si el snapshot no existe o está desactualizado."""
+    if not is_fresh(snapshot_dir, key):
+        return None
+    try:
+        # Polars mapea en memoria los archivos IPC sin comprimir por defecto
+        df = pl.read_ipc(os.path.join(snapshot_dir, "data.arrow"))
+    except Exception as e:
+        logging.warning(f"Snapshot corrupto en {snapshot_dir}, se ignorará: {e}")
+        return None
+    logging.info(f"Snapshot cargado desde {snapshot_dir}")
+    return df
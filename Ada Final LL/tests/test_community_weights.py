@@ -0,0 +1,42 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from graph_analyzer import GraphAnalyzer
+
+
+def _write_network(directory, num_nodes=300, num_groups=6, seed=7):
+    """Red sintética con grupos densos y algunas amistades lejanas entre grupos."""
+    rng = np.random.default_rng(seed)
+    group = rng.integers(0, num_groups, num_nodes)
+    centers = rng.uniform([-60, -170], [60, 170], size=(num_groups, 2))
+    coords = centers[group] + rng.normal(0, 1.5, size=(num_nodes, 2))
+    location_path = directory / "loc.txt"
+    location_path.write_text("".join(f"{lat:.6f},{lng:.6f}\n" for lat, lng in coords))
+    lines = [str(num_nodes)]
+    for node in range(num_nodes):
+        same_group = np.flatnonzero(group == group[node])
+        friends = set(rng.choice(same_group, 6).tolist()) | set(rng.integers(0, num_nodes, 1).tolist())
+        friends.discard(node)
+        lines.append(",".join(str(friend) for friend in sorted(friends)))
+    user_path = directory / "user.txt"
+    user_path.write_text("\n".join(lines) + "\n")
+    return str(location_path), str(user_path)
+
+
+@pytest.mark.parametrize("backend", ["dict", "csr"])
+@pytest.mark.parametrize("algorithm", ["louvain", "louvain_csr"])
+def test_partition_does_not_depend_on_edge_weights(tmp_path, backend, algorithm):
+    location_path, user_path = _write_network(tmp_path)
+    partitions = {}
+    for edge_weights in ("hops", "haversine"):
+        analyzer = GraphAnalyzer(graph_backend=backend, edge_weights=edge_weights)
+        analyzer.load_from_files(location_path, user_path, None, use_snapshot=False)
+        communities = analyzer.compute_communities(algorithm, random_state=0)
+        partitions[edge_weights] = sorted(sorted(info['nodes']) for info in communities.values())
+    assert len(partitions["hops"]) > 1
+    assert partitions["hops"] == partitions["haversine"]
@@ -0,0 +1,149 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Máximo de cuñas (pares de aristas orientadas con origen común) que se comprueban a la vez
+_WEDGE_BLOCK = 1 << 21
+# Por debajo de este número de cuñas el recuento se hace sin el pool de procesos
+_PARALLEL_MIN_WEDGES = 1 << 24
+
+def _edge_offsets(indptr, nodes):
+    """Posiciones en `indices` de las aristas de `nodes` (en ese orden) y número de aristas de cada nodo."""
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    return np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(int(counts.sum())), counts
+
+def _orient_by_degree(indptr, indices):
+    """
+    Orienta cada arista no dirigida del nodo de menor al de mayor (grado, índice), sin lazos.
+    Así cada triángulo aparece exactamente una vez y ningún nodo tiene más de O(√m) aristas salientes.
+    Devuelve (fwd_indptr, fwd_indices, degrees), con los vecinos de cada fila ordenados por índice.
+    """
+    n = len(indptr) - 1
+    src = np.repeat(np.arange(n, dtype=np.int64), np.diff(indptr))
+    dst = np.asarray(indices, dtype=np.int64)
+    not_loop = src != dst
+    degrees = np.bincount(src[not_loop], minlength=n)
+    rank = np.empty(n, dtype=np.int64)
+    rank[np.lexsort((np.arange(n), degrees))] = np.arange(n)
+    forward = not_loop & (rank[src] < rank[dst])
+    fwd_src, fwd_dst = src[forward], dst[forward] # Ya ordenadas por (origen, destino) al venir del CSR
+    fwd_indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(fwd_src, minlength=n), out=fwd_indptr[1:])
+    return fwd_indptr, fwd_dst, degrees
+
+def _forward_keys(fwd_indptr, fwd_indices):
+    """Claves ordenadas v*n + w de las aristas orientadas v -> w (para buscarlas con searchsorted)."""
+    n = len(fwd_indptr) - 1
+    return np.repeat(np.arange(n, dtype=np.int64), np.diff(fwd_indptr)) * n + fwd_indices
+
+def _count_node_range(fwd_indptr, fwd_indices, keys, lo, hi, triangles):
+    """
+    Suma en `triangles` (array int64 de longitud n) los triángulos cerrados desde los nodos lo..hi-1.
+    Para cada nodo u y cada par ordenado (v, w) de sus vecinos orientados se busca la arista v -> w en
+    las claves ordenadas `keys` (intersección de listas ordenadas con searchsorted). Los vértices v y w
+    pueden quedar fuera del rango, así que se acumula sobre el array completo con np.add.at, que solo
+    toca los nodos de los triángulos encontrados.
+    """
+    n = len(fwd_indptr) - 1
+    wedges_per_node = np.diff(fwd_indptr[lo:hi + 1]) ** 2
+    block_start = lo
+    while block_start < hi:
+        # Bloque de nodos con a lo sumo _WEDGE_BLOCK cuñas (al menos un nodo)
+        cumulative = np.cumsum(wedges_per_node[block_start - lo:])
+        block_end = block_start + max(1, int(np.searchsorted(cumulative, _WEDGE_BLOCK, side='right')))
+        nodes = np.arange(block_start, block_end, dtype=np.int64)
+        block_start = block_end
+        # Aristas u -> v del bloque; cada una se empareja con todas las aristas u -> w del mismo origen
+        edge_pos, edge_counts = _edge_offsets(fwd_indptr, nodes)
+        if len(edge_pos) == 0:
+            continue
+        first_pos, pair_counts = _edge_offsets(fwd_indptr, np.repeat(nodes, edge_counts))
+        v = np.repeat(fwd_indices[edge_pos], pair_counts)
+        w = fwd_indices[first_pos]
+        u = np.repeat(np.repeat(nodes, edge_counts), pair_counts)
+        query = v * n + w
+        found = np.searchsorted(keys, query)
+        found[found == len(keys)] = 0
+        closed = keys[found] == query
+        if closed.any():
+            for corner in (u[closed], v[closed], w[closed]):
+                np.add.at(triangles, corner, 1)
+    return triangles
+
+_triangle_worker_state = None # (fwd_indptr, fwd_indices, keys) compartidos por cada proceso del pool
+
+def _init_triangle_worker(fwd_indptr, fwd_indices):
+    """Inicializa un proceso del pool: las claves de las aristas se construyen una vez por proceso."""
+    global _triangle_worker_state
+    _triangle_worker_state = (fwd_indptr, fwd_indices, _forward_keys(fwd_indptr, fwd_indices))
+
+def _count_node_range_task(node_range):
+    """
+    Tarea del pool: triángulos cerrados desde un rango contiguo de nodos.
+    Devuelve solo los nodos tocados, (nodos, triángulos), en lugar de un array de longitud n.
+    """
+    fwd_indptr, fwd_indices, keys = _triangle_worker_state
+    triangles = _count_node_range(fwd_indptr, fwd_indices, keys, *node_range,
+                                  np.zeros(len(fwd_indptr) - 1, dtype=np.int64))
+    touched = np.flatnonzero(triangles)
+    return touched, triangles[touched]
+
+def _balanced_node_ranges(fwd_indptr, num_ranges):
+    """Parte 0..n-1 en rangos contiguos con un número parecido de cuñas (el trabajo de cada rango)."""
+    n = len(fwd_indptr) - 1
+    cumulative = np.cumsum(np.diff(fwd_indptr) ** 2)
+    total = int(cumulative[-1]) if n else 0
+    cuts = np.searchsorted(cumulative, np.arange(1, num_ranges) * total / num_ranges, side='right')
+    bounds = np.unique(np.concatenate([[0], cuts, [n]]))
+    return [(int(lo), int(hi)) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+def triangle_counts(indptr, indices, n_workers=1):
+    """
+    Número de triángulos de cada nodo de un grafo no dirigido (simétrico) en CSR con nodos 0..n-1.
+    Con n_workers > 1 los nodos se reparten por rangos equilibrados en un pool de procesos.
+    Devuelve (triangles, degrees): arrays int64 con los triángulos de cada nodo y su grado sin lazos.
+    """
+    fwd_indptr, fwd_indices, degrees = _orient_by_degree(np.asarray(indptr, dtype=np.int64), indices)
+    n = len(degrees)
+    total_wedges = int((np.diff(fwd_indptr) ** 2).sum())
+    if n_workers and n_workers > 1 and total_wedges >= _PARALLEL_MIN_WEDGES:
+        node_ranges = _balanced_node_ranges(fwd_indptr, n_workers * 4)
+        triangles = np.zeros(n, dtype=np.int64)
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_triangle_worker,
+                                 initargs=(fwd_indptr, fwd_indices)) as executor:
+            for touched, partial in executor.map(_count_node_range_task, node_ranges):
+                triangles[touched] += partial
+    else:
+        triangles = _count_node_range(fwd_indptr, fwd_indices, _forward_keys(fwd_indptr, fwd_indices), 0, n,
+                                      np.zeros(n, dtype=np.int64))
+    logging.info(f"Triángulos: {int(triangles.sum()) // 3} en {n} nodos ({total_wedges} cuñas comprobadas)")
+    return triangles, degrees
+
+def local_clustering(triangles, degrees):
+    """Coeficiente de clustering local de cada nodo: 2T / (d(d-1)), 0 si el grado es menor que 2."""
+    possible = degrees * (degrees - 1)
+    coefficients = np.zeros(len(degrees), dtype=np.float64)
+    np.divide(2.0 * triangles, possible, out=coefficients, where=possible > 0)
+    return coefficients
+
+def transitivity(triangles, degrees):
+    """Transitividad global: 3 * nº de triángulos / nº de tripletas conectadas."""
+    connected_triples = int((degrees * (degrees - 1) // 2).sum())
+    return float(triangles.sum()) / connected_triples if connected_triples else 0.0
+
+def clustering_csr(csr, n_workers=1):
+    """
+    Estadísticas de clustering de un CSRGraph (se usa su versión no dirigida).
+    Devuelve {'triangles', 'local_clustering', 'average_clustering', 'transitivity'}; los arrays van
+    alineados con csr.node_ids.
+    """
+    undirected = csr.undirected_view()
+    triangles, degrees = triangle_counts(undirected.indptr, undirected.indices, n_workers=n_workers)
+    coefficients = local_clustering(triangles, degrees)
+    return {
+        'triangles': triangles,
+        'local_clustering': coefficients,
+        'average_clustering': float(coefficients.mean()) if len(coefficients) else 0.0,
+        'transitivity': transitivity(triangles, degrees),
+    }